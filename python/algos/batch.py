@@ -0,0 +1,243 @@
+# standard imports
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# third party imports
+import numpy as np
+
+# custom imports
+from algos.deferred_acceptance import DA_ENGINES
+from algos.preference_table import PreferenceTable, compile_preferences
+from algos.top_trading_cycle import TTC_ENGINES
+
+ENGINES = {"da": DA_ENGINES, "ttc": TTC_ENGINES}
+# instances with fewer preference list entries (both sides together) than this are matched
+# in the calling process, where handing them to a worker would cost more than matching them
+SERIAL_THRESHOLD: int = 20_000
+
+
+class BatchResult(object):
+    """
+    Result of one instance of a batch: its position in the input (index),
+    the two-sided and one-sided matches (as returned by da() and ttc()),
+    and where the time went. compile_seconds is spent compiling the instance
+    and copying it to shared memory, match_seconds running the engine, and
+    seconds is the wall time from the instance being picked up to its result
+    being decoded (including any wait for a free worker). worker is the pid
+    of the process that ran the engine, None when it ran in the caller's.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        two_sided_match: Dict[str, str],
+        one_sided_match: Dict[str, str],
+        compile_seconds: float,
+        match_seconds: float,
+        seconds: float,
+        worker: int | None,
+    ):
+        self.index: int = index
+        self.two_sided_match: Dict[str, str] = two_sided_match
+        self.one_sided_match: Dict[str, str] = one_sided_match
+        self.compile_seconds: float = compile_seconds
+        self.match_seconds: float = match_seconds
+        self.seconds: float = seconds
+        self.worker: int | None = worker
+
+    def __repr__(self):
+        return (
+            f"BatchResult(index={self.index}, seconds={self.seconds:.6f}, "
+            f"match_seconds={self.match_seconds:.6f}, worker={self.worker})"
+        )
+
+
+def _sections(table_shape: Sequence[int]) -> List[Tuple[int, type, int]]:
+    # (byte offset, dtype, length) of employee_offsets, employee_targets, job_offsets and
+    # job_targets in a shared memory block, each starting on an 8 byte boundary
+    number_of_employees, number_of_jobs, employee_entries, job_entries = table_shape
+    sections = []
+    position = 0
+    for dtype, length in (
+        (np.int64, number_of_employees + 1),
+        (np.int32, employee_entries),
+        (np.int64, number_of_jobs + 1),
+        (np.int32, job_entries),
+    ):
+        sections.append((position, dtype, length))
+        position = (position + np.dtype(dtype).itemsize * length + 7) // 8 * 8
+    return sections
+
+
+def _share_table(table: PreferenceTable) -> Tuple[SharedMemory, Tuple[int, int, int, int]]:
+    """Copy the preference arrays of table (not the names) to a new shared memory block."""
+    table_shape = (
+        table.number_of_employees,
+        table.number_of_jobs,
+        len(table.employee_targets),
+        len(table.job_targets),
+    )
+    sections = _sections(table_shape)
+    offset, dtype, length = sections[-1]
+    # a shared memory block can't be empty
+    shared_memory = SharedMemory(create=True, size=max(offset + np.dtype(dtype).itemsize * length, 1))
+    arrays = (table.employee_offsets, table.employee_targets, table.job_offsets, table.job_targets)
+    for (offset, dtype, length), values in zip(sections, arrays):
+        np.frombuffer(shared_memory.buf, dtype=dtype, count=length, offset=offset)[:] = values
+    # the block lives on until it is unlinked, the caller doesn't need it mapped
+    shared_memory.close()
+    return shared_memory, table_shape
+
+
+def _match_shared_table(
+    name: str, table_shape: Tuple[int, int, int, int], algorithm: str, engine: str
+) -> Tuple[bytes, float, int]:
+    """
+    Worker side of run_batch: attach to the shared memory block name, run the
+    engine on the table in it, and return (employee_match as int64 bytes,
+    seconds spent matching, pid).
+    """
+    shared_memory = SharedMemory(name=name)
+    try:
+        # copy the arrays out, so that no view of the block outlives it (memoryviews index to plain ints)
+        employee_offsets, employee_targets, job_offsets, job_targets = (
+            memoryview(np.frombuffer(shared_memory.buf, dtype=dtype, count=length, offset=offset).copy())
+            for offset, dtype, length in _sections(table_shape)
+        )
+    finally:
+        shared_memory.close()
+    number_of_employees, number_of_jobs, _, _ = table_shape
+    # the engines only work with ids, the names stay with the caller
+    table = PreferenceTable(
+        range(number_of_employees),
+        range(number_of_jobs),
+        employee_offsets,
+        employee_targets,
+        job_offsets,
+        job_targets,
+    )
+    start = time.perf_counter()
+    employee_match = ENGINES[algorithm][engine](table)
+    match_seconds = time.perf_counter() - start
+    return np.asarray(employee_match, dtype=np.int64).tobytes(), match_seconds, os.getpid()
+
+
+def _compile_instance(
+    instance: Tuple[Dict[str, List[str]], Dict[str, List[str]]] | PreferenceTable,
+) -> PreferenceTable:
+    """A batch instance as a PreferenceTable: a table as is, any pair of preference dictionaries compiled."""
+    if isinstance(instance, PreferenceTable):
+        return instance
+    if not isinstance(instance, dict):
+        try:
+            employee_preferences, job_preferences = instance
+        except (TypeError, ValueError):
+            pass
+        else:
+            return compile_preferences(employee_preferences, job_preferences)
+    raise TypeError(
+        "Expected every instance to be a PreferenceTable or a pair (employee_preferences, "
+        f"job_preferences) of preference dictionaries, got {type(instance).__name__}"
+    )
+
+
+def run_batch(
+    instances: Iterable[Tuple[Dict[str, List[str]], Dict[str, List[str]]] | PreferenceTable],
+    algorithm: str = "da",
+    engine: str = "fast",
+    processes: int | None = None,
+    serial_threshold: int = SERIAL_THRESHOLD,
+) -> Iterator[BatchResult]:
+    """
+    Match many independent instances (each one a pair of employee and job
+    preference dictionaries, or a compiled PreferenceTable) with da() or
+    ttc() (algorithm) and engine, over a pool of processes (os.cpu_count()
+    by default), yielding a BatchResult for each one as soon as it is done,
+    so in completion order rather than input order (see BatchResult.index).
+
+    Instances are compiled in the calling process, and only their preference
+    arrays are handed to workers, through shared memory, instead of pickling
+    the dictionaries; workers send back the match as an array of ids, decoded
+    to names by the caller. Instances with fewer than serial_threshold list
+    entries are matched in the calling process, as is everything when
+    processes is 1. Instances are read from the iterable as workers free up
+    (at most two per worker are in flight), so it can be a generator of
+    instances that don't all fit in memory at once.
+    """
+    if algorithm not in ENGINES:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(ENGINES)}")
+    if engine not in ENGINES[algorithm]:
+        raise ValueError(
+            f"Unknown {algorithm.upper()} engine {engine!r}, expected one of {sorted(ENGINES[algorithm])}"
+        )
+    processes = processes or os.cpu_count() or 1
+
+    pool: ProcessPoolExecutor | None = None
+    # future -> (index, table, shared memory block, start time, compile seconds)
+    pending: Dict[Future, Tuple[int, PreferenceTable, SharedMemory, float, float]] = {}
+
+    def finish(future: Future) -> BatchResult:
+        index, table, shared_memory, start, compile_seconds = pending.pop(future)
+        shared_memory.unlink()
+        employee_match, match_seconds, worker = future.result()
+        employee_match = np.frombuffer(employee_match, dtype=np.int64).tolist()
+        two_sided_match, one_sided_match = table.decode_matches(employee_match)
+        return BatchResult(
+            index,
+            two_sided_match,
+            one_sided_match,
+            compile_seconds,
+            match_seconds,
+            time.perf_counter() - start,
+            worker,
+        )
+
+    try:
+        for index, instance in enumerate(instances):
+            start = time.perf_counter()
+            table = _compile_instance(instance)
+
+            if processes == 1 or len(table.employee_targets) + len(table.job_targets) < serial_threshold:
+                compile_seconds = time.perf_counter() - start
+                match_start = time.perf_counter()
+                employee_match = ENGINES[algorithm][engine](table)
+                match_seconds = time.perf_counter() - match_start
+                two_sided_match, one_sided_match = table.decode_matches(employee_match)
+                yield BatchResult(
+                    index,
+                    two_sided_match,
+                    one_sided_match,
+                    compile_seconds,
+                    match_seconds,
+                    time.perf_counter() - start,
+                    None,
+                )
+                continue
+
+            if pool is None:
+                pool = ProcessPoolExecutor(processes)
+            shared_memory, table_shape = _share_table(table)
+            compile_seconds = time.perf_counter() - start
+            future = pool.submit(_match_shared_table, shared_memory.name, table_shape, algorithm, engine)
+            pending[future] = (index, table, shared_memory, start, compile_seconds)
+
+            # keep every worker busy, with one instance queued behind it, without reading ahead any further
+            while len(pending) >= 2 * processes:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield finish(future)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finish(future)
+    finally:
+        # on an error, or if the caller stops early, cancel what is left and release its shared memory
+        for future, (_, _, shared_memory, _, _) in pending.items():
+            future.cancel()
+            shared_memory.unlink()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,143 @@
+# standard imports
+import heapq
+import time
+from typing import Dict, List, Sequence, Tuple
+
+# custom imports
+from algos.instrumentation import MatchStats, Observer
+from algos.preference_table import (
+    PreferenceTable,
+    UNMATCHED,
+    UNRANKED,
+    compile_preferences,
+)
+
+
+def capacitated_da(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    capacities: Dict[str, int] | None = None,
+    instrument: bool = False,
+    observer: Observer | None = None,
+) -> (
+    Tuple[Dict[str, str | List[str]], Dict[str, str]]
+    | Tuple[Dict[str, str | List[str]], Dict[str, str], MatchStats]
+):
+    """
+    Many-to-one (hospitals/residents) deferred acceptance, where job j can
+    tentatively hold up to capacities[j] employees at once (jobs missing from
+    capacities have a single opening). Employees propose exactly as in da():
+    a job with a free opening accepts any proposal, and a full job replaces
+    its worst ranked employee when it ranks the proposer higher. Each job
+    keeps the employees it ranks in a max-heap keyed by rank, bounded by its
+    capacity, so a proposal is only ever compared against the worst one in
+    O(log capacity), instead of cloning the job into capacity pseudo-jobs.
+    With every capacity 1 the result is exactly that of da().
+
+    Returns the two-sided match (employee to job, and each filled job to the
+    list of its employees, in employee order) and the one-sided match
+    (employee to job), unmatched employees being matched with themselves.
+    See find_all_blocking_pairs / is_stable (with capacities) for the
+    matching stability check. instrument and observer are as for da().
+    """
+    if not instrument and observer is None:
+        table = compile_preferences(employee_preferences, job_preferences)
+        job_capacities = table.job_capacities(capacities).tolist()
+        return decode_capacitated_matches(table, _capacitated_da(table, job_capacities))
+
+    stats = MatchStats(observer)
+    start = time.perf_counter()
+    table = compile_preferences(employee_preferences, job_preferences)
+    job_capacities = table.job_capacities(capacities).tolist()
+    stats.add_time("compile", time.perf_counter() - start)
+    start = time.perf_counter()
+    employee_match = _capacitated_da(table, job_capacities, stats)
+    stats.add_time("match", time.perf_counter() - start)
+    two_sided_match, one_sided_match = decode_capacitated_matches(table, employee_match)
+    if instrument:
+        return two_sided_match, one_sided_match, stats
+    return two_sided_match, one_sided_match
+
+
+def _capacitated_da(
+    table: PreferenceTable,
+    capacities: Sequence[int],
+    stats: MatchStats | None = None,
+) -> List[int]:
+    """
+    Run capacitated DA on a compiled PreferenceTable, returning employee id ->
+    job id (or UNMATCHED). Free employees propose lowest id first, as in
+    _da_fast, so that with unit capacities the proposal order (and so the
+    result) is the same as the reference engine.
+    """
+    offsets, targets = table.employee_offsets, table.employee_targets
+    job_ranks = table.job_ranks
+    next_proposal: List[int] = list(offsets[:-1])
+    employee_match: List[int] = [UNMATCHED] * table.number_of_employees
+    # number of openings each job has left
+    openings: List[int] = list(capacities)
+    # held[job] is a max-heap (of (-rank, employee)) of the employees job holds and ranks,
+    # employees a job does not rank can never be compared, so they are never replaced
+    held: List[List[Tuple[int, int]]] = [[] for _ in range(table.number_of_jobs)]
+    free_employees: List[int] = list(range(table.number_of_employees))
+
+    while free_employees:
+        employee = heapq.heappop(free_employees)
+        position, end = next_proposal[employee], offsets[employee + 1]
+
+        # propose down the preference list until a job accepts, or the list is exhausted
+        while position < end:
+            job = targets[position]
+            position += 1
+            if stats is not None:
+                stats.record("proposal", employee=employee, job=job)
+            rank = job_ranks[job][employee]
+
+            # job has an opening, tentatively accept
+            if openings[job]:
+                openings[job] -= 1
+                if rank != UNRANKED:
+                    heapq.heappush(held[job], (-rank, employee))
+                employee_match[employee] = job
+                break
+
+            # job is full, replace its worst ranked employee if it prefers the proposer
+            heap = held[job]
+            if rank != UNRANKED and heap and rank < -heap[0][0]:
+                _, prev_employee = heapq.heapreplace(heap, (-rank, employee))
+                employee_match[employee] = job
+                employee_match[prev_employee] = UNMATCHED
+                heapq.heappush(free_employees, prev_employee)
+                if stats is not None:
+                    stats.record("bump", employee=prev_employee, job=job, by=employee)
+                break
+
+            if stats is not None:
+                stats.record("rejection", employee=employee, job=job)
+
+        next_proposal[employee] = position
+
+    return employee_match
+
+
+def decode_capacitated_matches(
+    table: PreferenceTable, employee_match: Sequence[int]
+) -> Tuple[Dict[str, str | List[str]], Dict[str, str]]:
+    """
+    Same as PreferenceTable.decode_matches, except that each filled job is
+    mapped to the list of its employees (in employee order) in the two-sided
+    match.
+    """
+    two_sided_match: Dict[str, str | List[str]] = {}
+    one_sided_match: Dict[str, str] = {}
+    for employee, job in enumerate(employee_match):
+        name = table.employees[employee]
+        if job == UNMATCHED:
+            two_sided_match[name] = name
+            one_sided_match[name] = name
+        else:
+            job_name = table.jobs[job]
+            two_sided_match[name] = job_name
+            two_sided_match.setdefault(job_name, []).append(name)
+            one_sided_match[name] = job_name
+    return two_sided_match, one_sided_match
@@ -0,0 +1,54 @@
+# standard imports
+import time
+from typing import Dict, List, Tuple
+
+# custom imports
+from algos.capacitated_da import decode_capacitated_matches
+from algos.instrumentation import MatchStats, Observer
+from algos.preference_table import PreferenceTable, compile_preferences
+from algos.top_trading_cycle import _ttc_fast
+
+
+def capacitated_ttc(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    capacities: Dict[str, int] | None = None,
+    instrument: bool = False,
+    observer: Observer | None = None,
+) -> (
+    Tuple[Dict[str, str | List[str]], Dict[str, str]]
+    | Tuple[Dict[str, str | List[str]], Dict[str, str], MatchStats]
+):
+    """
+    School choice style top trading cycles, where job j has capacities[j]
+    openings (jobs missing from capacities have a single opening). Employees
+    point at their most preferred job that still has an opening, and jobs
+    point at their highest priority employee still unassigned. Every
+    employee in a cycle is assigned the job they point at, and every job in
+    it fills one opening. Each job is a single node with a counter of its
+    remaining openings, and only leaves the pointer graph when full, so the
+    graph never grows with capacity and cycles are cleared in place (see
+    _ttc_fast). With every capacity 1 the result is exactly that of ttc().
+
+    Returns the two-sided match (employee to job, and each filled job to the
+    list of its employees, in employee order) and the one-sided match
+    (employee to job), as capacitated_da does. instrument and observer are
+    as for ttc().
+    """
+    if not instrument and observer is None:
+        table = compile_preferences(employee_preferences, job_preferences)
+        job_capacities = table.job_capacities(capacities).tolist()
+        return decode_capacitated_matches(table, _ttc_fast(table, None, job_capacities))
+
+    stats = MatchStats(observer)
+    start = time.perf_counter()
+    table = compile_preferences(employee_preferences, job_preferences)
+    job_capacities = table.job_capacities(capacities).tolist()
+    stats.add_time("compile", time.perf_counter() - start)
+    start = time.perf_counter()
+    employee_match = _ttc_fast(table, stats, job_capacities)
+    stats.add_time("match", time.perf_counter() - start)
+    two_sided_match, one_sided_match = decode_capacitated_matches(table, employee_match)
+    if instrument:
+        return two_sided_match, one_sided_match, stats
+    return two_sided_match, one_sided_match
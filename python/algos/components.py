@@ -0,0 +1,193 @@
+# standard imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+# third party imports
+import numpy as np
+
+# custom imports
+from algos.batch import ENGINES, SERIAL_THRESHOLD, _match_shared_table, _share_table
+from algos.match_result import MatchResult
+from algos.preference_table import PreferenceTable, UNMATCHED, compile_preferences
+
+
+def _find_roots(parent: np.ndarray) -> np.ndarray:
+    """Point every node of the union-find forest parent straight at its root (full path compression)."""
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def find_components(table: PreferenceTable) -> Tuple[np.ndarray, int]:
+    """
+    Split the acceptability graph of table into connected components.
+    Employee e is node e and job j is node number_of_employees + j, and
+    every preference list entry (on either side) is an edge. Returns
+    (component, number_of_components), component[node] being the
+    component of each node, numbered in order of their lowest node.
+
+    Employees in different components never rank the same job, and jobs in
+    different components never rank the same employee, so DA and TTC can
+    match every component on its own.
+
+    The union-find runs on all edges at once: the roots of the endpoints
+    of every edge still joining two trees are found (with full path
+    compression), and the larger root of each is hooked under the smaller
+    one, until every edge is inside a tree. Hooking always points at a
+    smaller node, so the forest stays acyclic.
+    """
+    n = table.number_of_employees
+    number_of_nodes = n + table.number_of_jobs
+    employee_offsets = np.asarray(table.employee_offsets, dtype=np.int64)
+    job_offsets = np.asarray(table.job_offsets, dtype=np.int64)
+    sources = np.concatenate(
+        (
+            np.repeat(np.arange(n, dtype=np.int64), np.diff(employee_offsets)),
+            n + np.repeat(np.arange(table.number_of_jobs, dtype=np.int64), np.diff(job_offsets)),
+        )
+    )
+    targets = np.concatenate(
+        (
+            n + np.asarray(table.employee_targets, dtype=np.int64),
+            np.asarray(table.job_targets, dtype=np.int64),
+        )
+    )
+
+    parent = np.arange(number_of_nodes, dtype=np.int64)
+    while len(sources):
+        source_roots, target_roots = parent[sources], parent[targets]
+        crossing = source_roots != target_roots
+        # edges inside a tree stay inside it, they are dropped for good
+        sources, targets = sources[crossing], targets[crossing]
+        source_roots, target_roots = source_roots[crossing], target_roots[crossing]
+        np.minimum.at(
+            parent,
+            np.maximum(source_roots, target_roots),
+            np.minimum(source_roots, target_roots),
+        )
+        parent = _find_roots(parent)
+    # every root is the lowest node of its component, so roots sort in order of their lowest node
+    roots, component = np.unique(parent, return_inverse=True)
+    return component, len(roots)
+
+
+def _split(
+    table: PreferenceTable, component: np.ndarray, number_of_components: int
+) -> List[Tuple[np.ndarray, np.ndarray, PreferenceTable]]:
+    """
+    (employee ids, job ids, table) of every component with an employee
+    and a job, the table of a component numbering its employees and jobs
+    0, 1, ... in the order of their ids in table, so that every engine
+    runs the same steps on it as it does on that component of table.
+    """
+    n = table.number_of_employees
+    employee_component, job_component = component[:n], component[n:]
+    employee_order = np.argsort(employee_component, kind="stable")
+    job_order = np.argsort(job_component, kind="stable")
+    employee_starts = np.searchsorted(employee_component[employee_order], np.arange(number_of_components + 1))
+    job_starts = np.searchsorted(job_component[job_order], np.arange(number_of_components + 1))
+    # id of every participant within its component
+    local_id = np.empty(len(component), dtype=np.int32)
+    local_id[employee_order] = np.arange(n) - np.repeat(employee_starts[:-1], np.diff(employee_starts))
+    local_id[n + job_order] = np.arange(table.number_of_jobs) - np.repeat(job_starts[:-1], np.diff(job_starts))
+
+    def regroup(
+        offsets: Sequence[int], targets: Sequence[int], order: np.ndarray, target_base: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # one side's lists in component order (lists of a component end up contiguous), as local ids
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)[order]
+        entries = np.repeat(offsets[:-1][order] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.concatenate(([0], np.cumsum(lengths))), local_id[target_base + np.asarray(targets)[entries]]
+
+    employee_offsets, employee_targets = regroup(table.employee_offsets, table.employee_targets, employee_order, n)
+    job_offsets, job_targets = regroup(table.job_offsets, table.job_targets, job_order, 0)
+
+    components: List[Tuple[np.ndarray, np.ndarray, PreferenceTable]] = []
+    for c in range(number_of_components):
+        first_employee, last_employee = employee_starts[c], employee_starts[c + 1]
+        first_job, last_job = job_starts[c], job_starts[c + 1]
+        # a lone employee or job has nothing to match with
+        if first_employee == last_employee or first_job == last_job:
+            continue
+        employee_entries = employee_offsets[first_employee], employee_offsets[last_employee]
+        job_entries = job_offsets[first_job], job_offsets[last_job]
+        # memoryviews index to plain ints, which keeps the Python engines fast
+        sub_table = PreferenceTable(
+            range(last_employee - first_employee),
+            range(last_job - first_job),
+            memoryview(employee_offsets[first_employee : last_employee + 1] - employee_entries[0]),
+            memoryview(employee_targets[employee_entries[0] : employee_entries[1]]),
+            memoryview(job_offsets[first_job : last_job + 1] - job_entries[0]),
+            memoryview(job_targets[job_entries[0] : job_entries[1]]),
+        )
+        components.append(
+            (employee_order[first_employee:last_employee], job_order[first_job:last_job], sub_table)
+        )
+    return components
+
+
+def match_components(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    algorithm: str = "da",
+    engine: str = "fast",
+    processes: int | None = None,
+    serial_threshold: int = SERIAL_THRESHOLD,
+) -> MatchResult:
+    """
+    Run da() or ttc() (algorithm) with engine one connected component of
+    the market at a time (see find_components), and merge the results into
+    a MatchResult for the whole market. Markets that are unions of
+    disconnected sub-markets (regions, say) are matched in parallel: like
+    run_batch, components with at least serial_threshold list entries are
+    handed to a pool of processes (os.cpu_count() by default) through
+    shared memory, largest first, while smaller ones are matched in the
+    calling process.
+
+    The result is identical to the one of the whole market: every engine
+    takes the same steps on a component, numbered in the same order, as
+    it does within the whole market (the DA engines let the lowest
+    numbered free employee propose next, and an employee's proposals only
+    ever reach jobs in their own component).
+    """
+    if algorithm not in ENGINES:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(ENGINES)}")
+    if engine not in ENGINES[algorithm]:
+        raise ValueError(
+            f"Unknown {algorithm.upper()} engine {engine!r}, expected one of {sorted(ENGINES[algorithm])}"
+        )
+    table = compile_preferences(employee_preferences, job_preferences)
+    processes = processes or os.cpu_count() or 1
+    components = _split(table, *find_components(table))
+    employee_match = np.full(table.number_of_employees, UNMATCHED, dtype=np.int64)
+
+    def merge(employees: np.ndarray, jobs: np.ndarray, local_match: np.ndarray) -> None:
+        matched = local_match != UNMATCHED
+        employee_match[employees[matched]] = jobs[local_match[matched]]
+
+    size = [len(sub_table.employee_targets) + len(sub_table.job_targets) for _, _, sub_table in components]
+    large = [c for c in range(len(components)) if processes > 1 and size[c] >= serial_threshold]
+    pool = ProcessPoolExecutor(processes) if large else None
+    pending = []
+    try:
+        for c in sorted(large, key=size.__getitem__, reverse=True):
+            shared_memory, table_shape = _share_table(components[c][2])
+            future = pool.submit(_match_shared_table, shared_memory.name, table_shape, algorithm, engine)
+            pending.append((c, shared_memory, future))
+        for c in sorted(set(range(len(components))).difference(large)):
+            employees, jobs, sub_table = components[c]
+            merge(employees, jobs, np.asarray(ENGINES[algorithm][engine](sub_table), dtype=np.int64))
+        for c, _, future in pending:
+            employees, jobs, _ = components[c]
+            merge(employees, jobs, np.frombuffer(future.result()[0], dtype=np.int64))
+    finally:
+        for _, shared_memory, future in pending:
+            future.cancel()
+            shared_memory.unlink()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return MatchResult(table, employee_match.tolist())
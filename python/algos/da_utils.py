@@ -1,39 +1,197 @@
-from typing import List, Dict
+from typing import List, Dict, Sequence, Tuple
+
+import numpy as np
+
+from algos.preference_table import (
+    PreferenceTable,
+    UNMATCHED,
+    UNRANKED,
+    compile_preferences,
+)
+
 
 def find_blocking_pairs(
     one_sided_match: Dict[str, str],
     two_sided_match: Dict[str, str],
-    employee_preferences: Dict[str, str],
-    job_preferences: Dict[str, str]
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
 ) -> Dict[str, str]:
     """Return a dictionary of all blocking pairs in final matching, if any exist. A blocking pair in this conext is
     an employee and a job that should've been matched together, because the employee prefers that job more than their 
     current job, and they are more qualified than the employee that was actually assigned. No blocking pairs should
-    exist (assuming the algorithm is implemented correctly); this is primarily used for debugging."""
+    exist (assuming the algorithm is implemented correctly); this is primarily used for debugging. Accepts either the
+    preference dictionaries or a compiled PreferenceTable (job_preferences is then omitted)."""
+    table = compile_preferences(employee_preferences, job_preferences)
+    job_ranks = table.job_ranks
     blocking_pairs = dict()
     for current_employee, job in one_sided_match.items():
         # employee matched with themselves means unmatched, skip to next entry
         if current_employee == job:
             continue
-        current_employee_job_rank: int = employee_preferences.get(current_employee).index(job) + 1
-        current_employee_prefs: List = employee_preferences.get(current_employee, [])
-        # current employee got their number one choice, can't be better off, skip to next entry
-        if current_employee_job_rank == 1:
-            continue
-        else:
-            for i in range(0, current_employee_job_rank - 1):
-                preferred_job = current_employee_prefs[i]
-
-                # if there is a job ranked higher on current_employee's list that they were unassigned to,
-                # and current_employee is qualified, then someone else must have been assigned to that job
-                other_employee: str = two_sided_match[preferred_job]
-
-                if (
-                    current_employee in job_preferences.get(preferred_job)
-                    and other_employee in job_preferences.get(preferred_job)
-                    and job_preferences.get(preferred_job).index(current_employee) < job_preferences.get(preferred_job).index(other_employee)
-                ):
-                    # current_employee should've been assigned over other_employee, something went wrong...
-                    blocking_pairs[current_employee] = other_employee
-                
-    return blocking_pairs
\ No newline at end of file
+        employee_id: int = table.employee_ids[current_employee]
+        job_id: int = table.job_ids[job]
+        # walk every job ranked higher on current_employee's list than the job they were assigned
+        # (if they got their number one choice, the loop ends immediately, they can't be better off)
+        for preferred_job in table.employee_preferences(employee_id):
+            if preferred_job == job_id:
+                break
+
+            # if there is a job ranked higher on current_employee's list that they were unassigned to,
+            # and current_employee is qualified, then someone else must have been assigned to that job
+            other_employee: str | None = two_sided_match.get(table.jobs[preferred_job])
+            if other_employee is None:
+                continue
+
+            ranks = job_ranks[preferred_job]
+            rank: int = ranks[employee_id]
+            other_rank: int = ranks[table.employee_ids[other_employee]]
+            if rank != UNRANKED and other_rank != UNRANKED and rank < other_rank:
+                # current_employee should've been assigned over other_employee, something went wrong...
+                blocking_pairs[current_employee] = other_employee
+
+    return blocking_pairs
+
+
+def find_blocking_pair_ids(
+    table: PreferenceTable,
+    employee_match: Sequence[int],
+    capacities: Sequence[int] | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the (employee ids, job ids) of every blocking pair of employee_match
+    (employee id -> job id, or UNMATCHED). A pair (e, j) is blocking when j is on
+    e's list above e's match (any listed job is better than being unmatched), j
+    ranks e, and j is either unfilled or ranks its own match below e. As in
+    find_blocking_pairs, a job's match that the job does not rank cannot be
+    compared, so it never loses to a blocking employee.
+    Vectorized, in one pass over the employees' preference lists.
+
+    capacities (job id -> number of openings, see PreferenceTable.job_capacities)
+    checks a many-to-one matching instead: j is unfilled while it holds fewer
+    employees than its capacity, and otherwise blocks with e when it ranks its
+    worst ranked employee below e. Every job has capacity 1 by default.
+    """
+    state = _StabilityState(table, employee_match, capacities)
+    return state.blocking_pair_ids(0, table.number_of_employees)
+
+
+class _StabilityState(object):
+    """Per-participant facts about a matching needed to check any range of employees for blocking pairs."""
+
+    def __init__(
+        self,
+        table: PreferenceTable,
+        employee_match: Sequence[int],
+        capacities: Sequence[int] | None = None,
+    ):
+        self.table = table
+        self.offsets = np.asarray(table.employee_offsets, dtype=np.int64)
+        self.targets = np.asarray(table.employee_targets, dtype=np.int64)
+        self.ranks = table.proposal_ranks
+        employee_match = np.asarray(employee_match, dtype=np.int64)
+        matched = np.flatnonzero(employee_match != UNMATCHED)
+
+        # position of each employee's match on their own list (first listing),
+        # list length when unmatched (or matched to a job they did not list)
+        self.match_position = np.diff(self.offsets)
+        employees = np.repeat(
+            np.arange(table.number_of_employees), self.match_position
+        )
+        entries = np.flatnonzero(self.targets == employee_match[employees])
+        np.minimum.at(
+            self.match_position,
+            employees[entries],
+            entries - self.offsets[employees[entries]],
+        )
+
+        # for each filled job, the rank the job gives its (worst ranked) match
+        if capacities is None:
+            capacities = np.ones(table.number_of_jobs, dtype=np.int64)
+        self.job_filled = np.bincount(
+            employee_match[matched], minlength=table.number_of_jobs
+        ) >= np.asarray(capacities)
+        self.job_match_rank = np.full(table.number_of_jobs, UNRANKED, dtype=np.int64)
+        match_entries = self.offsets[matched] + self.match_position[matched]
+        listed = match_entries < self.offsets[matched + 1]
+        # UNRANKED is below every rank, so unranked matches never count as the worst
+        np.maximum.at(
+            self.job_match_rank,
+            employee_match[matched[listed]],
+            self.ranks[match_entries[listed]],
+        )
+
+    def blocking_pair_ids(
+        self, first_employee: int, last_employee: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Blocking pairs (employee ids, job ids) of the employees first_employee..last_employee-1."""
+        start, stop = self.offsets[first_employee], self.offsets[last_employee]
+        employees = np.repeat(
+            np.arange(first_employee, last_employee, dtype=np.int64),
+            np.diff(self.offsets[first_employee : last_employee + 1]),
+        )
+        jobs = self.targets[start:stop]
+        rank = self.ranks[start:stop]
+        position = np.arange(start, stop) - self.offsets[employees]
+
+        blocking = (
+            (position < self.match_position[employees])
+            & (rank != UNRANKED)
+            & (
+                ~self.job_filled[jobs]
+                | (
+                    (self.job_match_rank[jobs] != UNRANKED)
+                    & (rank < self.job_match_rank[jobs])
+                )
+            )
+        )
+        return employees[blocking], jobs[blocking]
+
+
+def find_all_blocking_pairs(
+    one_sided_match: Dict[str, str],
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    capacities: Dict[str, int] | None = None,
+) -> List[Tuple[str, str]]:
+    """
+    Return every blocking pair (employee, job) of a one-sided match (see
+    find_blocking_pair_ids for the definition). Unlike find_blocking_pairs,
+    every blocking pair is reported, not just the last one per employee, and
+    unmatched employees and unfilled jobs are checked too. Accepts either the
+    preference dictionaries or a compiled PreferenceTable. capacities (job
+    name -> number of openings) checks a many-to-one matching, as returned by
+    capacitated_da; jobs missing from it have a single opening.
+    """
+    table = compile_preferences(employee_preferences, job_preferences)
+    employees, jobs = find_blocking_pair_ids(
+        table, table.encode_matches(one_sided_match), table.job_capacities(capacities)
+    )
+    return [
+        (table.employees[employee], table.jobs[job])
+        for employee, job in zip(employees.tolist(), jobs.tolist())
+    ]
+
+
+def is_stable(
+    one_sided_match: Dict[str, str],
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    chunk_size: int = 65536,
+    capacities: Dict[str, int] | None = None,
+) -> bool:
+    """
+    Return True if a one-sided match has no blocking pairs. Checks chunk_size
+    employees at a time, and stops at the first chunk with a blocking pair, so
+    unstable matchings are rejected without checking every preference list.
+    capacities checks a many-to-one matching, as in find_all_blocking_pairs.
+    """
+    table = compile_preferences(employee_preferences, job_preferences)
+    state = _StabilityState(
+        table, table.encode_matches(one_sided_match), table.job_capacities(capacities)
+    )
+    for first_employee in range(0, table.number_of_employees, chunk_size):
+        last_employee = min(first_employee + chunk_size, table.number_of_employees)
+        employees, _ = state.blocking_pair_ids(first_employee, last_employee)
+        if len(employees):
+            return False
+    return True
@@ -1,25 +1,39 @@
-from collections import defaultdict
-from typing import Dict, Set, Tuple, List
+import heapq
+import time
+from typing import Callable, Dict, List, Sequence
 
+from algos.instrumentation import MatchStats, Observer
+from algos.match_result import MatchResult
+from algos.preference_table import (
+    PreferenceTable,
+    UNMATCHED,
+    UNRANKED,
+    compile_preferences,
+)
 
-def employee_without_match(matches: Dict[str, str], employees: Set[str]) -> str:
+
+def employee_without_match(employee_match: Sequence[int | None]) -> int | None:
     """
     Helper function to determine if employee is unmatched.
     Returns the first employee encountered that is not
     yet matched. employees can be matched with a job, or
-    themselves. If matched to themselves, this means that the
+    UNMATCHED. If UNMATCHED, this means that the
     matching algorithm has exhausted their entire preference
     list. If all employees are matched, this function will
     return None, and we will break from deferred acceptance algorithm.
     """
-    for employee in employees:
-        if employee not in matches:
+    for employee, job in enumerate(employee_match):
+        if job is None:
             return employee
 
 
 def da(
-    employee_preferences: Dict[str, List[str]], job_preferences: Dict[str, List[str]]
-) -> Tuple[Dict[str, str], Dict[str, str]]:
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    engine: str = "reference",
+    instrument: bool = False,
+    observer: Observer | None = None,
+) -> MatchResult:
     """
     Implementation of the deferred acceptance (DA) algorithm (also
     (also as Gale-Shapley algorithm), first published in 1962.
@@ -34,59 +48,184 @@ def da(
     list as possible. Algorithm terminates when either (1) all
     employees have been assigned, or (2) all employees have
     exhausted their preference lists (no more jobs available).
+
+    Accepts either the employee and job preference dictionaries,
+    or an already compiled PreferenceTable (job_preferences is then
+    omitted); the dictionaries are compiled to a PreferenceTable first.
+
+    engine selects the implementation (see DA_ENGINES): "reference"
+    looks up the next unmatched employee with a scan over all employees
+    before every proposal, while "fast" keeps a min-heap of free
+    employee ids, so that the lowest numbered free employee proposes
+    next as in "reference", for O(L log n) total work (L the total
+    preference length, n the number of employees), and "parallel" runs
+    round based DA with NumPy (see parallel_da). "fast"
+    always returns exactly the same matching as "reference"; "parallel"
+    does whenever every job ranks every employee that proposes to it.
+
+    Returns a MatchResult, which unpacks to the two-sided match (employee
+    to job and job to employee) and one-sided match (employee to job),
+    unmatched employees being matched with themselves, as dictionaries
+    built on first use (see MatchResult for array lookups and exports).
+
+    With instrument=True, the engine counts proposals, rejections, bumps
+    (and rounds, for "parallel") and times the compile and match phases,
+    and the result unpacks to (two_sided_match, one_sided_match, stats),
+    stats being a MatchStats (also MatchResult.stats). observer, if
+    given, is called with every event as it happens (see
+    algos.instrumentation). Without either, nothing is recorded.
     """
-    job_queue: Dict = defaultdict(int)
-    employees: Set[str] = set(employee_preferences.keys())
-    matches: Dict = {}
+    if engine not in DA_ENGINES:
+        raise ValueError(
+            f"Unknown DA engine {engine!r}, expected one of {sorted(DA_ENGINES)}"
+        )
+    if not instrument and observer is None:
+        table = compile_preferences(employee_preferences, job_preferences)
+        return MatchResult(table, DA_ENGINES[engine](table))
+
+    stats = MatchStats(observer)
+    start = time.perf_counter()
+    table = compile_preferences(employee_preferences, job_preferences)
+    stats.add_time("compile", time.perf_counter() - start)
+    start = time.perf_counter()
+    employee_match = DA_ENGINES[engine](table, stats)
+    stats.add_time("match", time.perf_counter() - start)
+    return MatchResult(table, employee_match, stats if instrument else None)
+
+
+def _da(table: PreferenceTable, stats: MatchStats | None = None) -> List[int]:
+    """Run DA on a compiled PreferenceTable, returning employee id -> job id (or UNMATCHED)."""
+    offsets, targets = table.employee_offsets, table.employee_targets
+    job_ranks = table.job_ranks
+    # queue (counter) to track which job we are currently considering for each employee
+    # i.e., if job_queue[employee] is 2, then we are considering the 3rd job on the given
+    # employee's preference list (0-indexing)
+    job_queue: List[int] = [0] * table.number_of_employees
+    # None means the employee still has to propose, UNMATCHED means they exhausted their list
+    employee_match: List[int | None] = [None] * table.number_of_employees
+    job_match: List[int] = [UNMATCHED] * table.number_of_jobs
 
     while True:
         # get the next available employee that is still unmatched to a job
-        employee = employee_without_match(matches, employees)
-        # once all employees have been matched (to a job or themselves), employee_without_match function will return
-        # a None type object, and we will break from while loop. If an employee is matched to themself it means the
+        employee = employee_without_match(employee_match)
+        # once all employees have been matched (to a job or UNMATCHED), employee_without_match function will return
+        # None, and we will break from while loop. If an employee is UNMATCHED it means the
         # algorithm exhausted their preference list (e-Resume), and was not able to match them with any job
-        if not employee:
+        if employee is None:
             break
 
-        # queue (counter) to track which job we are currently considering for the current employee
-        # i.e., if job_index is 2, then we are considering the 3rd job on the given
-        # employee's preference list (0-indexing)
-        job_index = job_queue[employee]
+        job_index = offsets[employee] + job_queue[employee]
         # increment counter so that next time through loop, we consider the next job on the preference list
-        # since this is a defaultdict, new entries automatically start at 0
         job_queue[employee] += 1
 
         # Try to match the current employee with the next available job on their rank ordered list, if available
-        if job_index < len(employee_preferences[employee]):
-            job = employee_preferences[employee][job_index]
-        # if we've gone through the employee's entire list, assign employee to themself to indicate unmatched
+        if job_index < offsets[employee + 1]:
+            job = targets[job_index]
+        # if we've gone through the employee's entire list, mark employee UNMATCHED
         else:
-            matches[employee] = employee
+            employee_match[employee] = UNMATCHED
             continue
 
-        prev_employee: str | None = matches.get(
-            job, None
-        )  # check if someone was already assigned to this job
+        if stats is not None:
+            stats.record("proposal", employee=employee, job=job)
+        # check if someone was already assigned to this job
+        prev_employee = job_match[job]
 
-        # if prev_employee is None, then no one has been assigned this job yet,
-        # so go ahead and assign to current employee. No swap needs to be made.
-        if prev_employee is None:
-            matches[employee] = job
-            matches[job] = employee
+        # if no one has been assigned this job yet, go ahead and assign to current employee.
+        # No swap needs to be made.
+        if prev_employee == UNMATCHED:
+            employee_match[employee] = job
+            job_match[job] = employee
+            continue
 
-        # otherwise, if prev_employee is not None, then someone is already assigned to that job,
-        # check and see who has priority. If the current employee has a higher priority
-        # than the previous employee assigned to this job, make the new job assignment.
+        # otherwise, someone is already assigned to that job, check and see who has priority.
+        # If the current employee has a higher priority than the previous employee assigned
+        # to this job (both must be ranked by the job), make the new job assignment.
         # This is the primary tiebreaker.
-        elif (
-            employee in job_preferences[job]
-            and prev_employee in job_preferences[job]
-            and job_preferences[job].index(employee)
-            < job_preferences[job].index(prev_employee)
-        ):
-            matches[employee] = job
-            matches[job] = employee
-            del matches[prev_employee]
-
-    # return two-sided match (employee to job and job to employee), and one-sided match (employee to job)
-    return matches, {employee: matches[employee] for employee in employees}
+        ranks = job_ranks[job]
+        rank, prev_rank = ranks[employee], ranks[prev_employee]
+        if rank != UNRANKED and prev_rank != UNRANKED and rank < prev_rank:
+            employee_match[employee] = job
+            job_match[job] = employee
+            employee_match[prev_employee] = None
+            if stats is not None:
+                stats.record("bump", employee=prev_employee, job=job, by=employee)
+        elif stats is not None:
+            stats.record("rejection", employee=employee, job=job)
+
+    return employee_match
+
+
+def _da_fast(table: PreferenceTable, stats: MatchStats | None = None) -> List[int]:
+    """
+    Run DA on a compiled PreferenceTable using a worklist of free employees,
+    returning employee id -> job id (or UNMATCHED). The worklist is a min-heap
+    of employee ids: the reference engine always lets the lowest numbered free
+    employee propose next, and an employee stays the lowest free employee until
+    one of their proposals is accepted, so popping the smallest id and letting
+    them propose down their list reproduces the reference proposal order exactly.
+    Each preference list entry is proposed to at most once, and each bump costs
+    one O(log n) heap push.
+    """
+    offsets, targets = table.employee_offsets, table.employee_targets
+    job_ranks = table.job_ranks
+    # position (in targets) of the next job each employee will propose to
+    next_proposal: List[int] = list(offsets[:-1])
+    employee_match: List[int] = [UNMATCHED] * table.number_of_employees
+    job_match: List[int] = [UNMATCHED] * table.number_of_jobs
+    # employee ids are already in increasing order, so this list is a valid heap
+    free_employees: List[int] = list(range(table.number_of_employees))
+
+    while free_employees:
+        employee = heapq.heappop(free_employees)
+        position, end = next_proposal[employee], offsets[employee + 1]
+
+        # propose down the preference list until a job accepts, or the list is exhausted
+        while position < end:
+            job = targets[position]
+            position += 1
+            if stats is not None:
+                stats.record("proposal", employee=employee, job=job)
+            prev_employee = job_match[job]
+
+            # vacant job, tentatively accept
+            if prev_employee == UNMATCHED:
+                employee_match[employee] = job
+                job_match[job] = employee
+                break
+
+            # job prefers the new proposal, bump the previous employee back onto the worklist
+            ranks = job_ranks[job]
+            rank, prev_rank = ranks[employee], ranks[prev_employee]
+            if rank != UNRANKED and prev_rank != UNRANKED and rank < prev_rank:
+                employee_match[employee] = job
+                job_match[job] = employee
+                employee_match[prev_employee] = UNMATCHED
+                heapq.heappush(free_employees, prev_employee)
+                if stats is not None:
+                    stats.record("bump", employee=prev_employee, job=job, by=employee)
+                break
+
+            if stats is not None:
+                stats.record("rejection", employee=employee, job=job)
+
+        next_proposal[employee] = position
+
+    return employee_match
+
+
+def _da_parallel(table: PreferenceTable, stats: MatchStats | None = None) -> List[int]:
+    """Run round based DA on a compiled PreferenceTable, see parallel_da."""
+    # imported here, like NumPy, which only this engine needs
+    from algos.parallel_da import _parallel_da
+
+    employee_match, _ = _parallel_da(table, stats)
+    return employee_match.tolist()
+
+
+# available implementations of DA, selected with da(..., engine=...)
+DA_ENGINES: Dict[str, Callable[[PreferenceTable, MatchStats | None], List[int]]] = {
+    "reference": _da,
+    "fast": _da_fast,
+    "parallel": _da_parallel,
+}
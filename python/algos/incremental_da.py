@@ -0,0 +1,318 @@
+# standard imports
+from typing import Dict, Iterable, List, Set, Tuple
+
+# outcome of a logged proposal: accepted by a vacant job, accepted in place of the job's
+# previous match, or rejected
+ACCEPTED, DISPLACED, REJECTED = 0, 1, 2
+
+
+class IncrementalDA(object):
+    """
+    Deferred acceptance that can be repaired after a small change to the
+    market instead of being rerun from scratch. Every proposal is logged in
+    the order it was made, both per employee (time, job, position on the
+    employee's list) and per job (time, employee, outcome, displaced
+    employee).
+
+    update() applies a delta (new, edited or removed employees and jobs) by
+    undoing only the proposals that no longer hold, and letting the
+    employees they free propose again. The proposals of a removed employee,
+    to a removed job, or past the unchanged start of an edited list are
+    undone, along with everything their employee proposed afterwards, and so
+    is everything an employee proposed after skipping a removed job that
+    comes back. The
+    log of every job that lost a proposal, or whose list changed, is then
+    replayed without the undone proposals, and any proposal the job now
+    answers differently (accepts instead of rejects, or the other way
+    around) is undone too, as is whatever an employee who now keeps a job,
+    or loses it at a different time, proposed afterwards. Once nothing more
+    is undone, the proposals left are a valid DA run of the new market, and
+    since the outcome of DA does not depend on the order of proposals,
+    continuing it gives the same employee-optimal stable matching as a cold
+    run of da() on the new market, whenever jobs rank every employee that
+    proposes to them (with partial lists, da() is order dependent, as for
+    the parallel engine). Only the chains of proposals the delta actually
+    changes are replayed.
+    """
+
+    def __init__(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ):
+        """Match the market with DA, logging every proposal (a previous da() result can't be reused)."""
+        self.employee_preferences: Dict[str, List[str]] = dict(employee_preferences)
+        # job name -> (employee name -> rank), jobs that are only named on employees' lists
+        # have no entry, and accept anyone while vacant (as in da())
+        self.job_ranks: Dict[str, Dict[str, int]] = {}
+        for job, employees in job_preferences.items():
+            self._set_job_preferences(job, employees)
+        self.removed_jobs: Set[str] = set()
+
+        self.employee_match: Dict[str, str | None] = dict.fromkeys(self.employee_preferences)
+        self.job_match: Dict[str, str] = {}
+        # position on each employee's list of the next job they will propose to
+        self.next_proposal: Dict[str, int] = dict.fromkeys(self.employee_preferences, 0)
+        self.employee_log: Dict[str, List[Tuple[int, str, int]]] = {
+            employee: [] for employee in self.employee_preferences
+        }
+        self.job_log: Dict[str, List[Tuple[int, str, int, str | None]]] = {}
+        # number of proposals logged so far, the time of the next one
+        self.time: int = 0
+        self._propose(list(self.employee_preferences), set())
+
+    def _set_job_preferences(self, job: str, employees: List[str]) -> None:
+        ranks: Dict[str, int] = {}
+        # walk the list backwards, so that a duplicated employee keeps their first position
+        for rank in range(len(employees) - 1, -1, -1):
+            ranks[employees[rank]] = rank
+        self.job_ranks[job] = ranks
+
+    @property
+    def one_sided_match(self) -> Dict[str, str]:
+        """Employee to job, unmatched employees are matched with themselves (as returned by da())."""
+        return {
+            employee: employee if job is None else job
+            for employee, job in self.employee_match.items()
+        }
+
+    @property
+    def two_sided_match(self) -> Dict[str, str]:
+        """Employee to job and job to employee, unmatched employees are matched with themselves."""
+        two_sided_match = self.one_sided_match
+        two_sided_match.update(self.job_match)
+        return two_sided_match
+
+    def update(
+        self,
+        employee_preferences: Dict[str, List[str]] | None = None,
+        job_preferences: Dict[str, List[str]] | None = None,
+        removed_employees: Iterable[str] = (),
+        removed_jobs: Iterable[str] = (),
+    ) -> Dict[str, str]:
+        """
+        Apply a change to the market and repair the matching. employee_preferences
+        and job_preferences hold the lists of new participants, and the new lists
+        of participants whose lists were edited. Removed jobs are skipped
+        wherever they appear on employees' lists. Returns the new match of every
+        employee whose proposals were undone or replayed (employee to job, or to
+        themselves when unmatched); removed employees are left out.
+        """
+        employee_preferences = employee_preferences or {}
+        job_preferences = job_preferences or {}
+        removed_employees = set(removed_employees)
+        removed_jobs = set(removed_jobs)
+
+        # the employees whose proposals may no longer hold, from the time of the first one
+        undone: Dict[str, int] = {}
+        # length of the part of each edited employee's list that did not change
+        unchanged: Dict[str, int] = {}
+        for employee in removed_employees:
+            if employee in self.employee_log:
+                undone[employee] = 0
+        for employee, jobs in employee_preferences.items():
+            if employee in self.employee_log:
+                # proposals down the part of the list that did not change still hold
+                old_jobs = self.employee_preferences[employee]
+                length = 0
+                while length < min(len(jobs), len(old_jobs)) and jobs[length] == old_jobs[length]:
+                    length += 1
+                unchanged[employee] = length
+                for time, _, position in self.employee_log[employee]:
+                    if position >= length:
+                        undone[employee] = time
+                        break
+
+        # position of a removed job that comes back on the list of every employee who skipped past it
+        rewound = self._skipped(set(job_preferences) & self.removed_jobs)
+        for employee, skipped in rewound.items():
+            # everything proposed after the skip is undone, the employee proposes to the job again
+            for time, _, position in self.employee_log[employee]:
+                if position > skipped:
+                    undone[employee] = min(time, undone.get(employee, time))
+                    break
+
+        for job in removed_jobs:
+            self.removed_jobs.add(job)
+            self.job_ranks.pop(job, None)
+        for job, employees in job_preferences.items():
+            self.removed_jobs.discard(job)
+            self._set_job_preferences(job, employees)
+        freed = self._undo(undone, [job for job in (*job_preferences, *removed_jobs) if job in self.job_log])
+
+        for employee in removed_employees:
+            self.employee_preferences.pop(employee, None)
+            self.employee_match.pop(employee, None)
+            self.next_proposal.pop(employee, None)
+            self.employee_log.pop(employee, None)
+        for employee, jobs in employee_preferences.items():
+            self.employee_preferences[employee] = jobs
+            if employee in unchanged:
+                # removed jobs are skipped without a proposal, the employee may have skipped past the edit
+                self.next_proposal[employee] = min(self.next_proposal[employee], unchanged[employee])
+            else:
+                self.employee_match[employee] = None
+                self.next_proposal[employee] = 0
+                self.employee_log[employee] = []
+
+        for employee, skipped in rewound.items():
+            if employee not in removed_employees:
+                # left with no proposal after the skip (unmatched), nothing was undone
+                self.next_proposal[employee] = min(self.next_proposal[employee], skipped)
+
+        changed = (freed | set(rewound)) - removed_employees | set(employee_preferences)
+        self._propose(list(changed), changed)
+        return {
+            employee: employee if self.employee_match[employee] is None else self.employee_match[employee]
+            for employee in changed
+        }
+
+    def _skipped(self, jobs: Set[str]) -> Dict[str, int]:
+        """
+        Position of the first of jobs (removed jobs, about to come back) on the
+        list of every employee who skipped past it while it was removed. Skipped
+        jobs are not logged, so this scans every employee's list, only when a
+        removed job comes back.
+        """
+        skipped: Dict[str, int] = {}
+        if not jobs:
+            return skipped
+        for employee, employee_jobs in self.employee_preferences.items():
+            for position in range(self.next_proposal[employee]):
+                if employee_jobs[position] in jobs:
+                    skipped[employee] = position
+                    break
+        return skipped
+
+    def _undo(self, undone: Dict[str, int], jobs: List[str]) -> Set[str]:
+        """
+        Undo the proposals of each employee in undone from the given time on,
+        and every proposal to a removed job in jobs, replay the logs of jobs
+        and of every job that lost a proposal until no job answers a proposal
+        left differently, then rebuild the matches from the proposals left.
+        Returns the employees that had a proposal undone.
+        """
+        employee_log, job_log, job_ranks = self.employee_log, self.job_log, self.job_ranks
+        # time of the earliest undone proposal of each employee, all of their later ones are undone too
+        cutoff: Dict[str, int] = {}
+        # jobs whose log has to be replayed, because one of their proposals was undone
+        dirty: Set[str] = set(jobs)
+
+        def undo(employee: str, time: int) -> None:
+            previous_cutoff = cutoff.get(employee, self.time)
+            if time >= previous_cutoff:
+                return
+            cutoff[employee] = time
+            for proposal_time, job, _ in reversed(employee_log[employee]):
+                if proposal_time < time:
+                    break
+                if proposal_time < previous_cutoff:
+                    dirty.add(job)
+
+        for employee, time in undone.items():
+            undo(employee, time)
+        for job in jobs:
+            if job in self.removed_jobs:
+                for time, employee, _, _ in job_log[job]:
+                    undo(employee, time)
+
+        # replay the proposals left to each dirty job, until every one of them gets the answer it got before
+        replayed: Dict[str, str | None] = {}
+        while dirty:
+            job = dirty.pop()
+            ranks = job_ranks.get(job, {})
+            holder = None
+            log = job_log[job]
+            for index, (time, employee, outcome, displaced) in enumerate(log):
+                if time >= cutoff.get(employee, self.time):
+                    # the proposal is undone: had it displaced someone, they keep the job, and what they did next is undone
+                    if outcome == DISPLACED:
+                        undo(displaced, time)
+                    continue
+                if holder is None:
+                    answer = ACCEPTED
+                else:
+                    rank, holder_rank = ranks.get(employee), ranks.get(holder)
+                    answer = DISPLACED if rank is not None and holder_rank is not None and rank < holder_rank else REJECTED
+                if (answer == REJECTED) != (outcome == REJECTED):
+                    undo(employee, time)
+                    if outcome == DISPLACED:
+                        undo(displaced, time)
+                    continue
+                # still accepted, but maybe in place of someone else, who is now free from this proposal on
+                if answer != REJECTED:
+                    if answer != outcome or (answer == DISPLACED and displaced != holder):
+                        log[index] = (time, employee, answer, holder)
+                        if holder is not None:
+                            undo(holder, time)
+                    holder = employee
+            replayed[job] = holder
+
+        for job, holder in replayed.items():
+            job_log[job] = [
+                proposal
+                for proposal in job_log[job]
+                if proposal[0] < cutoff.get(proposal[1], self.time)
+            ]
+            self.job_match.pop(job, None)
+            if holder is not None:
+                self.job_match[job] = holder
+        for employee, time in cutoff.items():
+            log = employee_log[employee]
+            while log and log[-1][0] >= time:
+                log.pop()
+            self.next_proposal[employee] = log[-1][2] + 1 if log else 0
+            self.employee_match[employee] = None
+            if log and self.job_match.get(log[-1][1]) == employee:
+                self.employee_match[employee] = log[-1][1]
+        return set(cutoff)
+
+    def _propose(self, free_employees: List[str], changed: Set[str]) -> None:
+        """
+        Continue DA from the current state, logging every proposal, until no
+        employee in free_employees is free and has jobs left to propose to.
+        Employees displaced on the way are added to changed.
+        """
+        employee_preferences, job_ranks = self.employee_preferences, self.job_ranks
+        employee_match, job_match = self.employee_match, self.job_match
+        removed_jobs, employee_log, job_log = self.removed_jobs, self.employee_log, self.job_log
+        while free_employees:
+            employee = free_employees.pop()
+            if employee_match[employee] is not None:
+                continue
+            jobs = employee_preferences[employee]
+            position = self.next_proposal[employee]
+
+            # propose down the preference list until a job accepts, or the list is exhausted
+            while position < len(jobs):
+                job = jobs[position]
+                position += 1
+                if job in removed_jobs:
+                    continue
+                time = self.time
+                self.time += 1
+                employee_log[employee].append((time, job, position - 1))
+                prev_employee = job_match.get(job)
+
+                # vacant job, tentatively accept
+                if prev_employee is None:
+                    job_log.setdefault(job, []).append((time, employee, ACCEPTED, None))
+                    employee_match[employee] = job
+                    job_match[job] = employee
+                    break
+
+                # job prefers the new proposal, the previous employee proposes again
+                ranks = job_ranks.get(job, {})
+                rank, prev_rank = ranks.get(employee), ranks.get(prev_employee)
+                if rank is not None and prev_rank is not None and rank < prev_rank:
+                    job_log[job].append((time, employee, DISPLACED, prev_employee))
+                    employee_match[employee] = job
+                    job_match[job] = employee
+                    employee_match[prev_employee] = None
+                    free_employees.append(prev_employee)
+                    changed.add(prev_employee)
+                    break
+
+                job_log[job].append((time, employee, REJECTED, None))
+
+            self.next_proposal[employee] = position
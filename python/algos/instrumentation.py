@@ -0,0 +1,86 @@
+# standard imports
+from typing import Callable, Dict, List
+
+# events reported by the DA and TTC engines, each one also counted in MatchStats.counts:
+# DA: "proposal" (employee proposes to job), "rejection" (job keeps its current match),
+#     "bump" (job accepts and its previous match becomes free), "round" (parallel engine only)
+# TTC: "cycle" (a trading cycle is found and removed), "repoint" (a node whose target left
+#     the graph is pointed at its next choice)
+EVENTS = ("proposal", "rejection", "bump", "round", "cycle", "repoint")
+
+# observer callback, called as observer(event, data) with one of EVENTS and the event's details
+Observer = Callable[[str, Dict], None]
+
+
+class MatchStats(object):
+    """
+    Counters and per-phase timers collected by da() and ttc() when
+    instrumentation is requested. Engines only touch a MatchStats when one
+    is passed in (every hook is guarded by a "stats is not None" check), so
+    runs without instrumentation pay nothing but that check.
+
+    counts[event] is the number of times each of EVENTS happened,
+    cycle_lengths holds the number of employees trading in each TTC cycle
+    in the order the cycles were found, and timers[phase] is the number of
+    seconds spent in each phase ("compile" and "match", and for TTC the
+    "find_cycle" and "update_graph" parts of "match"). If an observer is
+    given, it is called with every event as it happens. The parallel DA
+    engine works a round at a time, so it only reports "round" events, its
+    proposals, rejections and bumps are counted without being observed.
+    """
+
+    def __init__(self, observer: Observer | None = None):
+        self.observer: Observer | None = observer
+        self.counts: Dict[str, int] = dict.fromkeys(EVENTS, 0)
+        self.cycle_lengths: List[int] = []
+        self.timers: Dict[str, float] = {}
+
+    def __repr__(self):
+        counts = ", ".join(f"{event}={count}" for event, count in self.counts.items())
+        timers = ", ".join(f"{phase}={seconds:.6f}s" for phase, seconds in self.timers.items())
+        return f"MatchStats({counts}; {timers})"
+
+    def record(self, event: str, **data) -> None:
+        """Count one event, and pass it on to the observer, if any."""
+        self.counts[event] += 1
+        if self.observer is not None:
+            self.observer(event, data)
+
+    def count(self, event: str, number: int) -> None:
+        """Count number events at once, without notifying the observer."""
+        self.counts[event] += number
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    @property
+    def proposals(self) -> int:
+        return self.counts["proposal"]
+
+    @property
+    def rejections(self) -> int:
+        return self.counts["rejection"]
+
+    @property
+    def bumps(self) -> int:
+        return self.counts["bump"]
+
+    @property
+    def rounds(self) -> int:
+        return self.counts["round"]
+
+    @property
+    def cycles(self) -> int:
+        return self.counts["cycle"]
+
+    @property
+    def repointed_edges(self) -> int:
+        return self.counts["repoint"]
+
+    def as_dict(self) -> Dict:
+        """Plain dictionary form, e.g. for logging or JSON."""
+        return {
+            "counts": dict(self.counts),
+            "cycle_lengths": list(self.cycle_lengths),
+            "timers": dict(self.timers),
+        }
@@ -0,0 +1,242 @@
+# standard imports
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# third party imports
+import numpy as np
+from numpy.random import default_rng
+
+# custom imports
+from algos.capacitated_da import _capacitated_da
+from algos.preference_table import PreferenceTable, UNMATCHED
+
+# single tie-breaking: one lottery number per employee, shared by every job
+SINGLE: str = "single"
+# multiple tie-breaking: every job draws its own lottery over the employees it ranks
+MULTIPLE: str = "multiple"
+TIE_BREAKING = (SINGLE, MULTIPLE)
+
+
+class LotteryResult(object):
+    """
+    Assignments aggregated over the draws of a TieBreakingLottery.
+    assignment_counts[k] is the number of draws in which the employee
+    whose preference list holds position k (of table.employee_targets)
+    was assigned that job, and unassigned_counts[employee] the number of
+    draws in which employee was left unmatched.
+    """
+
+    def __init__(
+        self,
+        table: PreferenceTable,
+        draws: int,
+        assignment_counts: np.ndarray,
+        unassigned_counts: np.ndarray,
+    ):
+        self.table: PreferenceTable = table
+        self.draws: int = draws
+        self.assignment_counts: np.ndarray = assignment_counts
+        self.unassigned_counts: np.ndarray = unassigned_counts
+
+    def __repr__(self):
+        return f"LotteryResult(draws={self.draws}, employees={self.table.number_of_employees})"
+
+    def assignment_probabilities(self) -> Dict[str, Dict[str, float]]:
+        """
+        Employee -> {job: fraction of draws in which employee was assigned
+        job}, jobs in the employee's preference order, and the employee
+        themselves for the fraction of draws they were left unmatched (same
+        convention as the one-sided match). Jobs never assigned are left out.
+        """
+        table = self.table
+        offsets, targets = table.employee_offsets, table.employee_targets
+        counts = self.assignment_counts.tolist()
+        unassigned_counts = self.unassigned_counts.tolist()
+        probabilities: Dict[str, Dict[str, float]] = {}
+        for employee, name in enumerate(table.employees):
+            row = {
+                table.jobs[targets[position]]: counts[position] / self.draws
+                for position in range(offsets[employee], offsets[employee + 1])
+                if counts[position]
+            }
+            if unassigned_counts[employee]:
+                row[name] = unassigned_counts[employee] / self.draws
+            probabilities[name] = row
+        return probabilities
+
+    def rank_distribution(self) -> np.ndarray:
+        """
+        distribution[k] is the average number of employees (per draw)
+        assigned the k-th (0-indexed) choice on their preference list, the
+        usual yardstick when comparing single and multiple tie-breaking.
+        """
+        offsets = np.asarray(self.table.employee_offsets, dtype=np.int64)
+        choice = np.arange(offsets[-1]) - np.repeat(offsets[:-1], np.diff(offsets))
+        distribution = np.bincount(
+            choice, weights=self.assignment_counts, minlength=int(np.diff(offsets).max(initial=0))
+        )
+        return distribution / self.draws
+
+
+class TieBreakingLottery(object):
+    """
+    Deferred acceptance with coarse job priorities, where ties are broken
+    at random. job_priorities maps each job to its priority classes, best
+    first, each class being a list of employees the job is indifferent
+    between (school choice style priorities: siblings, walk zone, everyone
+    else). Employees have strict preference lists, as for da(). capacities
+    are as for capacitated_da() (one opening per job by default).
+
+    The profile is compiled once: every draw shares the employee side of
+    the PreferenceTable, and only re-ranks the job side, by sorting the
+    job list entries on (job, priority class, lottery number) with NumPy.
+    With single tie-breaking every employee draws one lottery number used
+    by every job, with multiple tie-breaking every job list entry draws
+    its own. Each draw is then matched with capacitated DA, so with unit
+    capacities it is exactly da() on the drawn strict profile.
+
+    An employee listed in more than one class of a job has the best of
+    them, and (as in PreferenceTable.from_dicts) employees without a
+    preference list of their own are dropped from the priorities.
+    """
+
+    def __init__(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_priorities: Dict[str, List[List[str]]],
+        capacities: Dict[str, int] | None = None,
+    ):
+        self.table: PreferenceTable = PreferenceTable.from_dicts(
+            employee_preferences,
+            {
+                job: [employee for priority_class in classes for employee in priority_class]
+                for job, classes in job_priorities.items()
+            },
+        )
+        table = self.table
+        self.capacities: List[int] = table.job_capacities(capacities).tolist()
+
+        # priority class of every job list entry, aligned with table.job_targets
+        employee_ids = table.employee_ids
+        classes = array("i")
+        for job in table.jobs:
+            for priority_class, employees in enumerate(job_priorities.get(job, ())):
+                classes.extend(priority_class for employee in employees if employee in employee_ids)
+        job_classes = np.frombuffer(classes, dtype=np.int32)
+        job_offsets = np.asarray(table.job_offsets, dtype=np.int64)
+        job_of_entry = np.repeat(np.arange(table.number_of_jobs), np.diff(job_offsets))
+        self.job_targets: np.ndarray = np.asarray(table.job_targets, dtype=np.int32)
+        # entries are numbered by tie, a run of entries of one job in the same priority class
+        # (entries of a job are in priority order, so tie numbers never decrease along the list)
+        new_tie = np.ones(len(job_classes), dtype=bool)
+        new_tie[1:] = (job_of_entry[1:] != job_of_entry[:-1]) | (job_classes[1:] != job_classes[:-1])
+        self.ties: np.ndarray = np.cumsum(new_tie) - 1
+
+        # (employee, job) keys of every employee list entry, sorted, to find where on their
+        # list an employee's assigned job is (a stable sort, so the first listing wins)
+        employee_offsets = np.asarray(table.employee_offsets, dtype=np.int64)
+        entry_keys = np.repeat(
+            np.arange(table.number_of_employees, dtype=np.int64), np.diff(employee_offsets)
+        ) * table.number_of_jobs + np.asarray(table.employee_targets, dtype=np.int64)
+        self._entry_order: np.ndarray = np.argsort(entry_keys, kind="stable")
+        self._entry_keys: np.ndarray = entry_keys[self._entry_order]
+
+    def __repr__(self):
+        return (
+            f"TieBreakingLottery(employees={self.table.number_of_employees}, "
+            f"jobs={self.table.number_of_jobs})"
+        )
+
+    def draw(self, seed: int, tie_breaking: str = SINGLE) -> PreferenceTable:
+        """
+        Break the ties with the lottery drawn from seed, returning the strict
+        profile as a PreferenceTable that shares its employee side (and the
+        names) with self.table. The same seed always draws the same lottery.
+        """
+        if tie_breaking not in TIE_BREAKING:
+            raise ValueError(f"Unknown tie-breaking {tie_breaking!r}, expected one of {TIE_BREAKING}")
+        generator = default_rng(seed)
+        if tie_breaking == SINGLE:
+            tickets = self.table.number_of_employees
+            lottery = generator.permutation(tickets)[self.job_targets]
+        else:
+            tickets = len(self.job_targets)
+            lottery = generator.permutation(tickets)
+        # a single int key per entry, (tie, lottery number), sorts every job's list in one pass
+        order = np.argsort(self.ties * tickets + lottery)
+        table = self.table
+        # memoryviews index to plain ints, which keeps the Python engines fast
+        return PreferenceTable(
+            table.employees,
+            table.jobs,
+            table.employee_offsets,
+            table.employee_targets,
+            table.job_offsets,
+            memoryview(self.job_targets[order]),
+        )
+
+    def match(self, seed: int, tie_breaking: str = SINGLE) -> List[int]:
+        """
+        Run DA on the draw for seed, returning employee id -> job id (or
+        UNMATCHED). See decode_capacitated_matches for the dictionary form.
+        """
+        return _capacitated_da(self.draw(seed, tie_breaking), self.capacities)
+
+    def run(
+        self, seeds: Iterable[int], tie_breaking: str = SINGLE, processes: int = 1
+    ) -> LotteryResult:
+        """
+        Run DA once per seed in seeds, aggregating the assignments in a
+        LotteryResult. Draws are independent, so with processes > 1 the seeds
+        are split in chunks over a pool of processes (each one receiving the
+        compiled lottery once), which only send back their assignment counts.
+        """
+        if tie_breaking not in TIE_BREAKING:
+            raise ValueError(f"Unknown tie-breaking {tie_breaking!r}, expected one of {TIE_BREAKING}")
+        seeds = list(seeds)
+        if processes == 1 or len(seeds) < 2:
+            assignment_counts, unassigned_counts = self._count(seeds, tie_breaking)
+            return LotteryResult(self.table, len(seeds), assignment_counts, unassigned_counts)
+
+        # a few chunks per process, so that a slow chunk doesn't leave the others idle
+        chunks = [seeds[first::4 * processes] for first in range(min(4 * processes, len(seeds)))]
+        assignment_counts = np.zeros(len(self._entry_keys), dtype=np.int64)
+        unassigned_counts = np.zeros(self.table.number_of_employees, dtype=np.int64)
+        with ProcessPoolExecutor(processes, initializer=_set_worker_lottery, initargs=(self,)) as pool:
+            for chunk_assignment_counts, chunk_unassigned_counts in pool.map(
+                _count_worker_draws, chunks, [tie_breaking] * len(chunks)
+            ):
+                assignment_counts += chunk_assignment_counts
+                unassigned_counts += chunk_unassigned_counts
+        return LotteryResult(self.table, len(seeds), assignment_counts, unassigned_counts)
+
+    def _count(self, seeds: Iterable[int], tie_breaking: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Assignment and unassigned counts (as in LotteryResult) over the draws for seeds."""
+        assignment_counts = np.zeros(len(self._entry_keys), dtype=np.int64)
+        unassigned_counts = np.zeros(self.table.number_of_employees, dtype=np.int64)
+        for seed in seeds:
+            employee_match = np.asarray(self.match(seed, tie_breaking), dtype=np.int64)
+            matched = np.flatnonzero(employee_match != UNMATCHED)
+            # every employee is assigned at most one job, so no position is counted twice in a draw
+            assignment_counts[self._entry_positions(matched, employee_match[matched])] += 1
+            unassigned_counts[employee_match == UNMATCHED] += 1
+        return assignment_counts, unassigned_counts
+
+    def _entry_positions(self, employees: np.ndarray, jobs: Sequence[int]) -> np.ndarray:
+        """Position (in table.employee_targets) of each job on the matching employee's list."""
+        keys = employees * self.table.number_of_jobs + jobs
+        return self._entry_order[np.searchsorted(self._entry_keys, keys)]
+
+
+# the lottery a worker process of TieBreakingLottery.run draws from, set once when the worker starts
+_worker_lottery: TieBreakingLottery | None = None
+
+
+def _set_worker_lottery(lottery: TieBreakingLottery) -> None:
+    global _worker_lottery
+    _worker_lottery = lottery
+
+
+def _count_worker_draws(seeds: List[int], tie_breaking: str) -> Tuple[np.ndarray, np.ndarray]:
+    return _worker_lottery._count(seeds, tie_breaking)
@@ -0,0 +1,208 @@
+# standard imports
+import csv
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Tuple
+
+# third party imports
+if TYPE_CHECKING:
+    import numpy as np
+
+# custom imports
+from algos.instrumentation import MatchStats
+from algos.preference_table import PreferenceTable, UNMATCHED
+
+
+class MatchResult(Sequence):
+    """
+    Result of da() or ttc(), backed by two int64 arrays (array.array, so
+    that a run that doesn't ask for NumPy never imports it): employee_match
+    (employee id -> job id) and job_match (job id -> employee id), UNMATCHED
+    for participants left without a partner, with the names in table.
+    job(employee) and employee(job) are O(1) name lookups, returning None
+    when unmatched, and one_sided and two_sided are read-only Mapping views
+    with the same contents as the dictionaries da() has always returned,
+    looked up in the arrays instead of stored.
+
+    For backward compatibility, a MatchResult is also the pair
+    (two_sided_match, one_sided_match) of dictionaries (or the triple
+    (two_sided_match, one_sided_match, stats) when instrumented), built on
+    first use and kept, so that
+        two_sided_match, one_sided_match = da(employee_preferences, job_preferences)
+    works as before. Callers that only need lookups or an export never pay
+    for the dictionaries.
+    """
+
+    def __init__(
+        self,
+        table: PreferenceTable,
+        employee_match: Sequence[int],
+        stats: MatchStats | None = None,
+    ):
+        self.table: PreferenceTable = table
+        self.employee_match: array = array("q", employee_match)
+        self.job_match: array = array("q", [UNMATCHED]) * table.number_of_jobs
+        for employee, job in enumerate(self.employee_match):
+            if job != UNMATCHED:
+                self.job_match[job] = employee
+        self.stats: MatchStats | None = stats
+        self._matches: Tuple[Dict[str, str], Dict[str, str]] | None = None
+
+    def _shared_with(self, table: PreferenceTable) -> "MatchResult":
+        """
+        A MatchResult on table (a table holding the same profile), sharing the
+        arrays of this one instead of copying them (as served by ResultCache).
+        The dictionaries are decoded again, on first use.
+        """
+        result = MatchResult.__new__(MatchResult)
+        result.table, result.employee_match, result.job_match = table, self.employee_match, self.job_match
+        result.stats, result._matches = None, None
+        return result
+
+    def __repr__(self):
+        return (
+            f"MatchResult(employees={self.table.number_of_employees}, "
+            f"jobs={self.table.number_of_jobs}, matched={self.number_matched})"
+        )
+
+    def __len__(self):
+        return 2 if self.stats is None else 3
+
+    def __getitem__(self, index: int) -> Any:
+        return (*self._decoded(), self.stats)[: len(self)][index]
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self.two_sided_match
+        yield self.one_sided_match
+        if self.stats is not None:
+            yield self.stats
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MatchResult):
+            return (
+                self.employee_match == other.employee_match
+                and self.table.digest() == other.table.digest()
+            )
+        if isinstance(other, (tuple, list)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    @property
+    def number_matched(self) -> int:
+        return len(self.employee_match) - self.employee_match.count(UNMATCHED)
+
+    def job(self, employee: str) -> str | None:
+        """Name of the job employee is matched with, None if unmatched."""
+        job = self.employee_match[self.table.employee_ids[employee]]
+        return None if job == UNMATCHED else self.table.jobs[job]
+
+    def employee(self, job: str) -> str | None:
+        """Name of the employee job is matched with, None if unmatched."""
+        employee = self.job_match[self.table.job_ids[job]]
+        return None if employee == UNMATCHED else self.table.employees[employee]
+
+    @property
+    def one_sided(self) -> "OneSidedView":
+        """Read-only view of the one-sided match (employee to job, or to themselves when unmatched)."""
+        return OneSidedView(self)
+
+    @property
+    def two_sided(self) -> "TwoSidedView":
+        """Read-only view of the two-sided match (employee to job and job to employee)."""
+        return TwoSidedView(self)
+
+    @property
+    def two_sided_match(self) -> Dict[str, str]:
+        return self._decoded()[0]
+
+    @property
+    def one_sided_match(self) -> Dict[str, str]:
+        return self._decoded()[1]
+
+    def _decoded(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        if self._matches is None:
+            self._matches = self.table.decode_matches(self.employee_match)
+        return self._matches
+
+    def to_numpy(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(employee_match, job_match) as int64 NumPy arrays (copies)."""
+        import numpy as np
+
+        return (
+            np.frombuffer(self.employee_match, dtype=np.int64).copy(),
+            np.frombuffer(self.job_match, dtype=np.int64).copy(),
+        )
+
+    def to_csv(self, path: str) -> None:
+        """
+        Write the match as CSV, one "employee,job" row per employee in id
+        order (after an "employee,job" header), the job cell empty when the
+        employee is unmatched.
+        """
+        employees, jobs = self.table.employees, self.table.jobs
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("employee", "job"))
+            writer.writerows(
+                (employees[employee], "" if job == UNMATCHED else jobs[job])
+                for employee, job in enumerate(self.employee_match)
+            )
+
+
+class OneSidedView(Mapping):
+    """Employee to job (or to themselves when unmatched), looked up in a MatchResult's arrays."""
+
+    def __init__(self, result: MatchResult):
+        self._result: MatchResult = result
+
+    def __repr__(self):
+        return f"OneSidedView({self._result!r})"
+
+    def __getitem__(self, employee: str) -> str:
+        job = self._result.job(employee)
+        return employee if job is None else job
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._result.table.employees)
+
+    def __len__(self):
+        return self._result.table.number_of_employees
+
+
+class TwoSidedView(Mapping):
+    """
+    Employee to job and job to employee (unmatched employees to themselves,
+    unmatched jobs left out), looked up in a MatchResult's arrays. Keys come
+    in the order of the two-sided dictionary: each employee, followed by
+    their job when matched.
+    """
+
+    def __init__(self, result: MatchResult):
+        self._result: MatchResult = result
+
+    def __repr__(self):
+        return f"TwoSidedView({self._result!r})"
+
+    def __getitem__(self, name: str) -> str:
+        result = self._result
+        # a name shared by an employee and a job is looked up as the employee
+        if name in result.table.employee_ids:
+            job = result.job(name)
+            return name if job is None else job
+        if name in result.table.job_ids:
+            employee = result.employee(name)
+            if employee is not None:
+                return employee
+        raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        employees, jobs = self._result.table.employees, self._result.table.jobs
+        for employee, job in enumerate(self._result.employee_match):
+            yield employees[employee]
+            if job != UNMATCHED:
+                yield jobs[job]
+
+    def __len__(self):
+        return self._result.table.number_of_employees + self._result.number_matched
@@ -0,0 +1,105 @@
+# standard imports
+from typing import Dict, List, Tuple
+
+# third party imports
+import numpy as np
+
+# custom imports
+from algos.instrumentation import MatchStats
+from algos.preference_table import (
+    PreferenceTable,
+    UNMATCHED,
+    UNRANKED,
+    compile_preferences,
+)
+
+
+def parallel_da(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+) -> Tuple[Dict[str, str], Dict[str, str], int]:
+    """
+    Round based (parallel proposal) deferred acceptance. In each round,
+    every currently free employee proposes to the next job on their list
+    at the same time, and every job keeps the best of its tentative match
+    and the new proposals, rejecting everyone else. Each round is a handful
+    of NumPy array operations over all proposals made in that round, rather
+    than one Python loop iteration per proposal.
+
+    Returns the two-sided match, the one-sided match (same as da), and the
+    number of rounds it took. Whenever every job ranks every employee that
+    proposes to it, the result is the employee-optimal stable matching, and
+    so identical to da(). Jobs always accept a proposal when vacant; an
+    unranked proposer loses to any ranked one (ties between unranked
+    proposers go to the lowest employee id).
+    """
+    table = compile_preferences(employee_preferences, job_preferences)
+    employee_match, rounds = _parallel_da(table)
+    two_sided_match, one_sided_match = table.decode_matches(employee_match.tolist())
+    return two_sided_match, one_sided_match, rounds
+
+
+def _parallel_da(
+    table: PreferenceTable, stats: MatchStats | None = None
+) -> Tuple[np.ndarray, int]:
+    """Run round based DA on a compiled PreferenceTable, returning employee id -> job id (or UNMATCHED) and the number of rounds."""
+    number_of_employees = table.number_of_employees
+    offsets = np.asarray(table.employee_offsets, dtype=np.int64)
+    targets = np.asarray(table.employee_targets, dtype=np.int64)
+
+    # every proposal is scored by a single int key, rank * number_of_employees + employee,
+    # so that a smaller key is a better proposal, and keys never tie
+    ranks = table.proposal_ranks
+    worst_rank = int(ranks.max(initial=0)) + 1
+    proposal_keys = (
+        np.where(ranks == UNRANKED, worst_rank, ranks) * number_of_employees
+        + np.repeat(np.arange(number_of_employees, dtype=np.int64), np.diff(offsets))
+    )
+
+    # position (in targets) of the next job each employee will propose to
+    next_proposal = offsets[:-1].copy()
+    end = offsets[1:]
+    employee_match = np.full(number_of_employees, UNMATCHED, dtype=np.int64)
+    job_match = np.full(table.number_of_jobs, UNMATCHED, dtype=np.int64)
+    job_match_key = np.full(table.number_of_jobs, np.iinfo(np.int64).max)
+
+    # employees with an empty preference list never propose
+    free_employees = np.flatnonzero(next_proposal < end)
+    rounds = 0
+    while free_employees.size:
+        rounds += 1
+        # every free employee proposes to the next job on their list
+        positions = next_proposal[free_employees]
+        next_proposal[free_employees] += 1
+        jobs, keys = targets[positions], proposal_keys[positions]
+
+        # group proposals by job, best key first, and keep the best proposal to each job
+        order = np.lexsort((keys, jobs))
+        jobs, keys, proposers = jobs[order], keys[order], free_employees[order]
+        best = np.ones(len(jobs), dtype=bool)
+        best[1:] = jobs[1:] != jobs[:-1]
+        jobs, keys, proposers = jobs[best], keys[best], proposers[best]
+
+        # the best proposal only wins if the job prefers it to its tentative match
+        accepted = keys < job_match_key[jobs]
+        jobs, keys, proposers = jobs[accepted], keys[accepted], proposers[accepted]
+        bumped = job_match[jobs]
+        bumped = bumped[bumped != UNMATCHED]
+        employee_match[bumped] = UNMATCHED
+        employee_match[proposers] = jobs
+        job_match[jobs] = proposers
+        job_match_key[jobs] = keys
+
+        # rejected and bumped employees propose again next round, unless their list is exhausted
+        rejected = free_employees[employee_match[free_employees] == UNMATCHED]
+        if stats is not None:
+            stats.count("proposal", len(free_employees))
+            stats.count("rejection", len(rejected))
+            stats.count("bump", len(bumped))
+            stats.record(
+                "round", round=rounds, proposals=len(free_employees), accepted=len(proposers)
+            )
+        free_employees = np.concatenate((rejected, bumped))
+        free_employees = free_employees[next_proposal[free_employees] < end[free_employees]]
+
+    return employee_match, rounds
@@ -0,0 +1,348 @@
+# standard imports
+import hashlib
+import json
+import sys
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+# third party imports
+if TYPE_CHECKING:
+    import numpy as np
+
+# rank reported for a participant that does not appear on a preference list
+UNRANKED: int = -1
+# match recorded for a participant that ends the algorithm without a partner
+UNMATCHED: int = -1
+# a job ranking at least 1/DENSE_RANK_FACTOR of all employees gets a dense rank row,
+# shorter lists get a sparse (dict based) rank row so memory stays proportional to list length
+DENSE_RANK_FACTOR: int = 16
+# dense rank rows of lists at least this long are built with NumPy, shorter ones in Python
+# unless NumPy is already imported. NumPy is imported by the functions that need it, rather
+# than by this module, so that compiling and matching small markets (a command line run, say)
+# starts without importing it: below this length, building rows in Python costs less than that
+NUMPY_ROW_LENGTH: int = 4096
+
+
+class SparseRanks(dict):
+    """Rank lookup for a short preference list. Participants not on the list are UNRANKED."""
+
+    __slots__ = ()
+
+    def __missing__(self, key: int) -> int:
+        return UNRANKED
+
+
+def rank_row(choices: Sequence[int], number_of_candidates: int) -> Sequence[int]:
+    """
+    Build a rank lookup for one preference list, such that
+    row[candidate] is the (0-indexed) position of candidate on the
+    list, or UNRANKED if candidate is not on the list. Long lists are
+    stored as a dense int array, short lists as a SparseRanks dict;
+    both support the same row[candidate] lookup in O(1).
+    """
+    # assign ranks walking the list backwards, so that if a candidate is listed twice
+    # its first position wins (same as list.index)
+    if len(choices) * DENSE_RANK_FACTOR >= number_of_candidates:
+        if len(choices) < NUMPY_ROW_LENGTH and "numpy" not in sys.modules:
+            row = array("i", [UNRANKED]) * number_of_candidates
+            for rank in range(len(choices) - 1, -1, -1):
+                row[choices[rank]] = rank
+            return row
+        import numpy as np
+
+        row = np.full(number_of_candidates, UNRANKED, dtype=np.int32)
+        row[np.asarray(choices, dtype=np.int32)[::-1]] = np.arange(
+            len(choices) - 1, -1, -1, dtype=np.int32
+        )
+        # indexing a memoryview returns plain ints, which is much faster than indexing numpy scalars
+        return memoryview(row)
+    return SparseRanks(zip(reversed(choices), range(len(choices) - 1, -1, -1)))
+
+
+class PreferenceTable(object):
+    """
+    Compiled, integer-indexed form of a two-sided preference profile.
+    Employee and job names are interned once to dense ids (employees
+    are 0..number_of_employees-1, jobs are 0..number_of_jobs-1), and
+    each side's preference lists are stored as flat int arrays in CSR
+    form: the preference list of employee e is
+    employee_targets[employee_offsets[e]:employee_offsets[e + 1]].
+    Rank rows (see rank_row) are built lazily on first use, so that
+    questions like "does job j prefer employee a over employee b" are
+    O(1) instead of a list.index scan.
+    """
+
+    def __init__(
+        self,
+        employees: List[str],
+        jobs: List[str],
+        employee_offsets: Sequence[int],
+        employee_targets: Sequence[int],
+        job_offsets: Sequence[int],
+        job_targets: Sequence[int],
+    ):
+        self.employees: List[str] = employees
+        self.jobs: List[str] = jobs
+        self._employee_ids: Dict[str, int] | None = None
+        self._job_ids: Dict[str, int] | None = None
+        self.employee_offsets: Sequence[int] = employee_offsets
+        self.employee_targets: Sequence[int] = employee_targets
+        self.job_offsets: Sequence[int] = job_offsets
+        self.job_targets: Sequence[int] = job_targets
+        self._job_ranks: List[Sequence[int]] | None = None
+        self._employee_ranks: List[Sequence[int]] | None = None
+        self._proposal_ranks: "np.ndarray | None" = None
+        self._digest: str | None = None
+
+    def __repr__(self):
+        return f"PreferenceTable(employees={self.number_of_employees}, jobs={self.number_of_jobs})"
+
+    @classmethod
+    def from_dicts(
+        cls,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> "PreferenceTable":
+        """
+        Compile the dictionary form of a preference profile. Jobs that
+        appear on an employee's list but have no preference list of
+        their own are interned with an empty list. Employees that
+        appear on a job's list but have no preference list of their own
+        can never propose or be matched, so they are dropped from the
+        job's list (relative order of everyone else is unchanged).
+        """
+        employees: List[str] = list(employee_preferences.keys())
+        jobs: List[str] = list(job_preferences.keys())
+        employee_ids: Dict[str, int] = {name: i for i, name in enumerate(employees)}
+        job_ids: Dict[str, int] = {name: i for i, name in enumerate(jobs)}
+
+        employee_offsets = array("q", [0])
+        employee_targets = array("i")
+        for employee in employees:
+            ids = list(map(job_ids.get, employee_preferences[employee]))
+            if None in ids:
+                for i, job in enumerate(employee_preferences[employee]):
+                    if job not in job_ids:
+                        job_ids[job] = len(jobs)
+                        jobs.append(job)
+                    ids[i] = job_ids[job]
+            employee_targets.extend(ids)
+            employee_offsets.append(len(employee_targets))
+
+        job_offsets = array("q", [0])
+        job_targets = array("i")
+        for job in jobs:
+            ids = list(map(employee_ids.get, job_preferences.get(job, ())))
+            if None in ids:
+                ids = [employee for employee in ids if employee is not None]
+            job_targets.extend(ids)
+            job_offsets.append(len(job_targets))
+
+        table = cls(
+            employees, jobs, employee_offsets, employee_targets, job_offsets, job_targets
+        )
+        # the id lookups were built while interning, no need to build them again
+        table._employee_ids, table._job_ids = employee_ids, job_ids
+        return table
+
+    @property
+    def employee_ids(self) -> Dict[str, int]:
+        """Employee name -> employee id, built on first use."""
+        if self._employee_ids is None:
+            self._employee_ids = {name: i for i, name in enumerate(self.employees)}
+        return self._employee_ids
+
+    @property
+    def job_ids(self) -> Dict[str, int]:
+        """Job name -> job id, built on first use."""
+        if self._job_ids is None:
+            self._job_ids = {name: i for i, name in enumerate(self.jobs)}
+        return self._job_ids
+
+    @property
+    def number_of_employees(self) -> int:
+        return len(self.employees)
+
+    @property
+    def number_of_jobs(self) -> int:
+        return len(self.jobs)
+
+    def employee_preferences(self, employee: int) -> Sequence[int]:
+        """Return the preference list (job ids) of employee, without copying."""
+        return memoryview(self.employee_targets)[
+            self.employee_offsets[employee] : self.employee_offsets[employee + 1]
+        ]
+
+    def job_preferences(self, job: int) -> Sequence[int]:
+        """Return the preference list (employee ids) of job, without copying."""
+        return memoryview(self.job_targets)[
+            self.job_offsets[job] : self.job_offsets[job + 1]
+        ]
+
+    @property
+    def job_ranks(self) -> List[Sequence[int]]:
+        """job_ranks[job][employee] is the rank of employee on job's list, or UNRANKED."""
+        if self._job_ranks is None:
+            self._job_ranks = [
+                rank_row(self.job_preferences(job), self.number_of_employees)
+                for job in range(self.number_of_jobs)
+            ]
+        return self._job_ranks
+
+    @property
+    def employee_ranks(self) -> List[Sequence[int]]:
+        """employee_ranks[employee][job] is the rank of job on employee's list, or UNRANKED."""
+        if self._employee_ranks is None:
+            self._employee_ranks = [
+                rank_row(self.employee_preferences(employee), self.number_of_jobs)
+                for employee in range(self.number_of_employees)
+            ]
+        return self._employee_ranks
+
+    @property
+    def proposal_ranks(self) -> "np.ndarray":
+        """
+        proposal_ranks[k] is the rank that job employee_targets[k] gives
+        to the employee whose preference list holds position k, or
+        UNRANKED, i.e. the job-side rank of every possible proposal,
+        aligned with employee_targets. Computed once with a vectorized
+        sort/search over (job, employee) keys.
+        """
+        if self._proposal_ranks is None:
+            import numpy as np
+
+            number_of_employees = self.number_of_employees
+            employee_offsets = np.asarray(self.employee_offsets, dtype=np.int64)
+            job_offsets = np.asarray(self.job_offsets, dtype=np.int64)
+            job_targets = np.asarray(self.job_targets, dtype=np.int64)
+
+            # key every job list entry by (job, employee), remembering its rank on the job's list
+            job_of_entry = np.repeat(
+                np.arange(self.number_of_jobs, dtype=np.int64), np.diff(job_offsets)
+            )
+            rank_of_entry = np.arange(len(job_targets)) - job_offsets[job_of_entry]
+            job_keys = job_of_entry * number_of_employees + job_targets
+            # stable sort, so that searchsorted finds the first listing of a duplicated employee
+            order = np.argsort(job_keys, kind="stable")
+            job_keys, rank_of_entry = job_keys[order], rank_of_entry[order]
+
+            # look up the (job, employee) key of every employee list entry
+            proposer = np.repeat(
+                np.arange(number_of_employees, dtype=np.int64),
+                np.diff(employee_offsets),
+            )
+            keys = (
+                np.asarray(self.employee_targets, dtype=np.int64) * number_of_employees
+                + proposer
+            )
+            if len(job_keys) == 0:
+                self._proposal_ranks = np.full(len(keys), UNRANKED, dtype=np.int64)
+                return self._proposal_ranks
+            position = np.minimum(np.searchsorted(job_keys, keys), len(job_keys) - 1)
+            self._proposal_ranks = np.where(
+                job_keys[position] == keys, rank_of_entry[position], UNRANKED
+            ).astype(np.int64)
+        return self._proposal_ranks
+
+    def digest(self) -> str:
+        """
+        Content hash (hex) of the profile: the names, in id order, and every
+        preference list. Tables holding the same profile hash alike however
+        their arrays are stored (array, NumPy, memmap). Computed once, the
+        table is not expected to change after it is compiled.
+        """
+        if self._digest is None:
+            import numpy as np
+
+            digest = hashlib.blake2b(digest_size=16)
+            for names in (self.employees, self.jobs):
+                digest.update(json.dumps(list(names)).encode("utf-8"))
+            for values, dtype in (
+                (self.employee_offsets, "<i8"),
+                (self.employee_targets, "<i4"),
+                (self.job_offsets, "<i8"),
+                (self.job_targets, "<i4"),
+            ):
+                digest.update(np.asarray(values, dtype=dtype).tobytes())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def prefers(self, job: int, employee: int, other_employee: int) -> bool:
+        """Return True if job ranks both employees, and ranks employee above other_employee."""
+        ranks = self.job_ranks[job]
+        rank, other_rank = ranks[employee], ranks[other_employee]
+        return rank != UNRANKED and other_rank != UNRANKED and rank < other_rank
+
+    def to_dicts(self) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """Decode back to the (employee_preferences, job_preferences) dictionary form."""
+        employee_preferences: Dict[str, List[str]] = {
+            name: [self.jobs[job] for job in self.employee_preferences(employee)]
+            for employee, name in enumerate(self.employees)
+        }
+        job_preferences: Dict[str, List[str]] = {
+            name: [self.employees[employee] for employee in self.job_preferences(job)]
+            for job, name in enumerate(self.jobs)
+        }
+        return employee_preferences, job_preferences
+
+    def decode_matches(
+        self, employee_match: Sequence[int]
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Convert employee_match (employee id -> job id, or UNMATCHED) to the
+        two-sided match (employee to job and job to employee) and one-sided
+        match (employee to job) returned by da and ttc. Unmatched employees
+        are matched with themselves.
+        """
+        two_sided_match: Dict[str, str] = {}
+        one_sided_match: Dict[str, str] = {}
+        for employee, job in enumerate(employee_match):
+            name = self.employees[employee]
+            if job == UNMATCHED:
+                two_sided_match[name] = name
+                one_sided_match[name] = name
+            else:
+                job_name = self.jobs[job]
+                two_sided_match[name] = job_name
+                two_sided_match[job_name] = name
+                one_sided_match[name] = job_name
+        return two_sided_match, one_sided_match
+
+    def encode_matches(self, one_sided_match: Dict[str, str]) -> "np.ndarray":
+        """
+        Inverse of decode_matches: convert a one-sided match (employee to job,
+        or to themselves when unmatched) to an array of employee id -> job id,
+        or UNMATCHED. Employees missing from one_sided_match are UNMATCHED.
+        """
+        import numpy as np
+
+        employee_match = np.full(self.number_of_employees, UNMATCHED, dtype=np.int64)
+        for employee, job in one_sided_match.items():
+            if employee != job:
+                employee_match[self.employee_ids[employee]] = self.job_ids[job]
+        return employee_match
+
+    def job_capacities(self, capacities: Dict[str, int] | None = None) -> "np.ndarray":
+        """
+        Convert capacities (job name -> number of openings) to an array of
+        job id -> capacity. Jobs missing from capacities (or every job, when
+        capacities is None) have a single opening.
+        """
+        import numpy as np
+
+        job_capacities = np.ones(self.number_of_jobs, dtype=np.int64)
+        for job, capacity in (capacities or {}).items():
+            if capacity < 0:
+                raise ValueError(f"Capacity of job {job!r} must not be negative, got {capacity}")
+            job_capacities[self.job_ids[job]] = capacity
+        return job_capacities
+
+
+def compile_preferences(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+) -> PreferenceTable:
+    """Return employee_preferences if it is already compiled, otherwise compile the two dictionaries."""
+    if isinstance(employee_preferences, PreferenceTable):
+        return employee_preferences
+    return PreferenceTable.from_dicts(employee_preferences, job_preferences)
@@ -0,0 +1,168 @@
+# standard imports
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# custom imports
+from algos.da_utils import find_blocking_pair_ids
+from algos.deferred_acceptance import da
+from algos.match_result import MatchResult
+from algos.preference_table import PreferenceTable, compile_preferences
+from algos.top_trading_cycle import ttc
+
+ALGORITHMS = {"da": da, "ttc": ttc}
+# events counted in ResultCache.stats: "hit" (found in memory), "disk_hit" (found on disk
+# and loaded back into memory), "miss" (matched from scratch), "eviction" (dropped from memory)
+CACHE_EVENTS = ("hit", "disk_hit", "miss", "eviction")
+# results kept in memory, the least recently used one is evicted beyond this
+MAX_ENTRIES: int = 256
+
+
+class ResultCache(object):
+    """
+    Content addressed cache of da() and ttc() results. A result is keyed
+    by a hash of the compiled profile (see PreferenceTable.digest), the
+    algorithm and the engine, so resubmitting the same profile, as
+    dictionaries or as a table, finds the result of the first run. Results
+    are kept as the employee_match and job_match arrays of a MatchResult,
+    and a hit returns a new MatchResult sharing them, so it costs no more
+    than a lookup: a PreferenceTable remembers its digest, so matching the
+    same table again is O(1), while dictionaries are compiled (and hashed)
+    on every call.
+
+    The order of the participants is part of a profile's identity: ids are
+    given in dictionary order, and the digest covers the names in id order,
+    so the same market with its keys in another order is a different key.
+    This is deliberate, not a missed hit: DA lets the lowest numbered free
+    employee propose next, so when jobs leave applicants unranked the
+    matching depends on that order, and the result dictionaries follow it.
+
+    Up to max_entries results are kept in memory, least recently used
+    evicted first. With a directory, every result is also written there
+    (as JSON, employee id -> job id, one file per key), and a result evicted from memory, or
+    computed by an earlier process, is read back from it. stats counts
+    every CACHE_EVENTS event.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, directory: str | None = None):
+        self.max_entries: int = max_entries
+        self.directory: str | None = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.stats: Dict[str, int] = dict.fromkeys(CACHE_EVENTS, 0)
+        # key -> result ("result", a MatchResult, and "blocking_pairs" once audited)
+        self._entries: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+    def __repr__(self):
+        stats = ", ".join(f"{event}={count}" for event, count in self.stats.items())
+        return f"ResultCache(entries={len(self._entries)}, {stats})"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, algorithm: str, table: PreferenceTable, engine: str = "reference") -> str:
+        """Cache key of the result of algorithm with engine on table."""
+        return hashlib.blake2b(
+            f"{algorithm}:{engine}:{table.digest()}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def match(
+        self,
+        algorithm: str,
+        employee_preferences: Dict[str, List[str]] | PreferenceTable,
+        job_preferences: Dict[str, List[str]] | None = None,
+        engine: str = "reference",
+        audit: bool = False,
+    ) -> MatchResult | Tuple[MatchResult, List[Tuple[str, str]]]:
+        """
+        Return da() or ttc() (algorithm) of the profile with engine, a
+        MatchResult, from the cache when it holds it. With audit=True, return
+        (result, every blocking pair of the match), as find_all_blocking_pairs
+        finds them, audited once and cached with the match. The arrays of the
+        result are shared with the cache, and must not be changed; its
+        dictionaries are its own, so changing them doesn't change the cache.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(ALGORITHMS)}")
+        table = compile_preferences(employee_preferences, job_preferences)
+        key = self.key(algorithm, table, engine)
+        entry = self._get(key, table)
+        if entry is None:
+            self.stats["miss"] += 1
+            entry = {"result": ALGORITHMS[algorithm](table, engine=engine)}
+            if audit:
+                entry["blocking_pairs"] = self._audit(entry["result"])
+            self._put(key, entry)
+        elif audit and "blocking_pairs" not in entry:
+            entry["blocking_pairs"] = self._audit(entry["result"])
+            self._write(key, entry)
+
+        result = entry["result"]._shared_with(table)
+        if audit:
+            return result, list(entry["blocking_pairs"])
+        return result
+
+    @staticmethod
+    def _audit(result: MatchResult) -> List[Tuple[str, str]]:
+        table = result.table
+        employees, jobs = find_blocking_pair_ids(table, result.employee_match)
+        return [
+            (table.employees[employee], table.jobs[job])
+            for employee, job in zip(employees.tolist(), jobs.tolist())
+        ]
+
+    def clear(self) -> None:
+        """Drop every result from memory (results on disk are kept)."""
+        self._entries.clear()
+
+    def _get(self, key: str, table: PreferenceTable) -> Dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["hit"] += 1
+            return entry
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if "employee_match" not in entry:
+            # written before results were kept as arrays, matched again and overwritten
+            return None
+        entry["result"] = MatchResult(table, entry.pop("employee_match"))
+        if "blocking_pairs" in entry:
+            entry["blocking_pairs"] = [tuple(pair) for pair in entry["blocking_pairs"]]
+        self.stats["disk_hit"] += 1
+        self._remember(key, entry)
+        return entry
+
+    def _put(self, key: str, entry: Dict[str, Any]) -> None:
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["eviction"] += 1
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.directory is None:
+            return
+        # write to a temporary file first, so that a reader never sees half a result
+        descriptor, path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        contents = {"employee_match": entry["result"].employee_match.tolist()}
+        if "blocking_pairs" in entry:
+            contents["blocking_pairs"] = entry["blocking_pairs"]
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(contents, f, separators=(",", ":"))
+        os.replace(path, self._path(key))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
@@ -0,0 +1,473 @@
+# standard imports
+from collections import deque
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+# custom imports
+from algos.deferred_acceptance import _da_fast
+from algos.preference_table import (
+    PreferenceTable,
+    UNMATCHED,
+    UNRANKED,
+    compile_preferences,
+)
+
+
+class RotationPoset(object):
+    """
+    The lattice of all stable matchings of a market, represented by its
+    rotations. Starting from the employee-optimal stable matching (the
+    result of da()), a rotation is a cycle of matched pairs (e0, j0), ...,
+    (ek, jk) where each job j(i+1) is the next job down e(i)'s list that
+    would take e(i) over its current match; eliminating it moves every
+    e(i) to j(i+1), which gives another stable matching, worse for those
+    employees and better for those jobs. Eliminating every rotation, in any
+    order their precedence allows, ends at the job-optimal stable matching,
+    and the stable matchings are exactly the sets of rotations closed under
+    precedence (every rotation preceding one in the set is in it too).
+
+    Rotations are found in O(total preference length) (O(n^2) for complete
+    lists) with the minimal differences algorithm of Gusfield and Irving,
+    on the lists reduced to the pairs that are in some stable matching, and
+    their precedence is built from the same walk. A pair is acceptable when
+    both list each other, as in find_all_blocking_pairs, so the lattice is
+    that of da()'s market whenever jobs rank every employee that proposes
+    to them; every pair of the employee-optimal matching must be ranked by
+    its job.
+    """
+
+    def __init__(
+        self,
+        employee_preferences: Dict[str, List[str]] | PreferenceTable,
+        job_preferences: Dict[str, List[str]] | None = None,
+        one_sided_match: Dict[str, str] | None = None,
+    ):
+        """
+        Build the rotation poset of the market, from one_sided_match (the
+        employee-optimal matching returned by da()) if it has already been
+        computed.
+        """
+        self.table: PreferenceTable = compile_preferences(employee_preferences, job_preferences)
+        table = self.table
+        if one_sided_match is None:
+            employee_match = _da_fast(table)
+        else:
+            employee_match = table.encode_matches(one_sided_match).tolist()
+        job_ranks = table.job_ranks
+        for employee, job in enumerate(employee_match):
+            if job != UNMATCHED and job_ranks[job][employee] == UNRANKED:
+                raise ValueError(
+                    f"Job {table.jobs[job]!r} does not rank its match {table.employees[employee]!r}, "
+                    "the stable matchings are only defined over pairs that list each other"
+                )
+        self._employee_optimal: List[int] = list(employee_match)
+        self._job_optimal: List[int] = _job_proposing_da(table)
+
+        # rotations, in the order they were eliminated (a topological order of the poset),
+        # each one a list of (employee, job before, job after)
+        self._rotations: List[List[Tuple[int, int, int]]] = []
+        # predecessors[i] is the set of rotations that have to be eliminated before rotation i
+        self.predecessors: List[Set[int]] = []
+        self._find_rotations()
+        self.successors: List[Set[int]] = [set() for _ in self._rotations]
+        for rotation, predecessors in enumerate(self.predecessors):
+            for predecessor in predecessors:
+                self.successors[predecessor].add(rotation)
+
+    def __repr__(self):
+        return f"RotationPoset(employees={self.table.number_of_employees}, rotations={len(self._rotations)})"
+
+    @property
+    def rotations(self) -> List[List[Tuple[str, str]]]:
+        """Each rotation as its (employee, job) pairs, in the matching it is eliminated from."""
+        table = self.table
+        return [
+            [(table.employees[employee], table.jobs[job]) for employee, job, _ in rotation]
+            for rotation in self._rotations
+        ]
+
+    def employee_optimal_match(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """The employee-optimal stable matching (two-sided, one-sided), as returned by da()."""
+        return self.table.decode_matches(self._employee_optimal)
+
+    def job_optimal_match(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """The job-optimal stable matching (two-sided, one-sided): every rotation eliminated."""
+        return self.table.decode_matches(self._job_optimal)
+
+    def match_after(self, rotations: Sequence[int]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        The stable matching (two-sided, one-sided) reached by eliminating the
+        given rotations (indices into rotations) from the employee-optimal one.
+        rotations must be closed under precedence.
+        """
+        rotations = set(rotations)
+        for rotation in rotations:
+            if not self.predecessors[rotation] <= rotations:
+                raise ValueError(f"Rotation {rotation} is eliminated without all of its predecessors")
+        return self.table.decode_matches(self._employee_match_after(rotations))
+
+    def _employee_match_after(self, rotations: Set[int]) -> List[int]:
+        employee_match = list(self._employee_optimal)
+        # rotations are numbered in elimination order, so applying them in order is always valid
+        for rotation in sorted(rotations):
+            for employee, _, job in self._rotations[rotation]:
+                employee_match[employee] = job
+        return employee_match
+
+    def stable_matchings(self) -> Iterator[Tuple[Dict[str, str], Dict[str, str]]]:
+        """
+        Lazily generate every stable matching (two-sided, one-sided) once,
+        starting with the employee-optimal one. Each closed set of rotations
+        is reached by deciding, in elimination order, whether each rotation is
+        eliminated (only allowed once all of its predecessors are), so no
+        branch is ever a dead end and the work between two matchings is
+        polynomial.
+        """
+        number_of_rotations = len(self._rotations)
+        employee_match = list(self._employee_optimal)
+        eliminated = bytearray(number_of_rotations)
+        # decision made for each of the first rotations: eliminated or not
+        decisions: List[bool] = []
+        while True:
+            if len(decisions) < number_of_rotations:
+                decisions.append(False)
+                continue
+            yield self.table.decode_matches(employee_match)
+
+            # backtrack to the last rotation left in place that could have been eliminated
+            while decisions:
+                rotation = len(decisions) - 1
+                if decisions.pop():
+                    eliminated[rotation] = 0
+                    for employee, job, _ in self._rotations[rotation]:
+                        employee_match[employee] = job
+                elif all(eliminated[predecessor] for predecessor in self.predecessors[rotation]):
+                    eliminated[rotation] = 1
+                    for employee, _, job in self._rotations[rotation]:
+                        employee_match[employee] = job
+                    decisions.append(True)
+                    break
+            else:
+                return
+
+    def rotation_weights(self) -> List[int]:
+        """
+        The change in the total rank of all matched participants (both sides,
+        0 being each participant's first choice) caused by eliminating each
+        rotation.
+        """
+        employee_ranks, job_ranks = self.table.employee_ranks, self.table.job_ranks
+        weights: List[int] = []
+        for rotation in self._rotations:
+            weight = 0
+            for employee, job_before, job_after in rotation:
+                weight += employee_ranks[employee][job_after] - employee_ranks[employee][job_before]
+                # the jobs of a rotation are its employees' jobs before it, so summing over the employees,
+                # this adds every job's new match's rank and takes away its old one's
+                weight += job_ranks[job_after][employee] - job_ranks[job_before][employee]
+            weights.append(weight)
+        return weights
+
+    def egalitarian_match(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        The stable matching (two-sided, one-sided) with the lowest total rank
+        over all matched participants, found as a minimum weight closed set of
+        rotations with a maximum flow (Irving, Leather and Gusfield).
+        """
+        weights = self.rotation_weights()
+        number_of_rotations = len(weights)
+        source, sink = number_of_rotations, number_of_rotations + 1
+        flow = _FlowNetwork(number_of_rotations + 2)
+        infinity = sum(abs(weight) for weight in weights) + 1
+        for rotation, weight in enumerate(weights):
+            # a rotation that lowers the total rank is worth eliminating, one that raises it costs
+            if weight < 0:
+                flow.add_edge(source, rotation, -weight)
+            elif weight > 0:
+                flow.add_edge(rotation, sink, weight)
+            for predecessor in self.predecessors[rotation]:
+                flow.add_edge(rotation, predecessor, infinity)
+        flow.max_flow(source, sink)
+        rotations = flow.reachable(source) - {source}
+        return self.table.decode_matches(self._employee_match_after(rotations))
+
+    def minimum_regret_match(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        The stable matching (two-sided, one-sided) whose worst off matched
+        participant, on either side, is as well off as possible (the lowest
+        maximum rank); of those, the one best for employees. Binary searches
+        the regret, checking each bound in O(number of rotations + precedence
+        edges).
+        """
+        table = self.table
+        employee_ranks, job_ranks = table.employee_ranks, table.job_ranks
+
+        # rank each job has in the employee-optimal matching, and (rotation, rank after it) for each later move
+        job_start: Dict[int, int] = {}
+        job_moves: Dict[int, List[Tuple[int, int]]] = {}
+        for employee, job in enumerate(self._employee_optimal):
+            if job != UNMATCHED:
+                job_start[job] = job_ranks[job][employee]
+        # highest rank each rotation moves an employee to
+        rotation_regret: List[int] = []
+        for rotation, moves in enumerate(self._rotations):
+            regret = 0
+            for employee, _, job in moves:
+                regret = max(regret, employee_ranks[employee][job])
+                job_moves.setdefault(job, []).append((rotation, job_ranks[job][employee]))
+            rotation_regret.append(regret)
+        start_regret = max(
+            [employee_ranks[employee][job] for employee, job in enumerate(self._employee_optimal) if job != UNMATCHED],
+            default=0,
+        )
+
+        def closed_rotations(regret: int) -> Set[int] | None:
+            # rotations every matching with at most this regret eliminates, or None if there is no such matching
+            if start_regret > regret:
+                return None
+            required: List[int] = []
+            for job, rank in job_start.items():
+                if rank > regret:
+                    rotation = next((r for r, after in job_moves.get(job, ()) if after <= regret), None)
+                    if rotation is None:
+                        return None
+                    required.append(rotation)
+            forbidden = _closure([r for r, moved in enumerate(rotation_regret) if moved > regret], self.successors)
+            rotations = _closure(required, self.predecessors)
+            return None if rotations & forbidden else rotations
+
+        # employees are worst off once every rotation is eliminated, and jobs before any is
+        low, high = 0, max([start_regret, *rotation_regret, *job_start.values()])
+        while low < high:
+            middle = (low + high) // 2
+            if closed_rotations(middle) is None:
+                low = middle + 1
+            else:
+                high = middle
+        return table.decode_matches(self._employee_match_after(closed_rotations(low) or set()))
+
+    def _find_rotations(self) -> None:
+        """
+        Eliminate rotations from the employee-optimal matching until the
+        job-optimal one is reached, recording each rotation and its precedence.
+        """
+        table = self.table
+        offsets, targets = table.employee_offsets, table.employee_targets
+        employee_ranks, job_ranks = table.employee_ranks, table.job_ranks
+        number_of_employees = table.number_of_employees
+
+        employee_match = list(self._employee_optimal)
+        job_match = [UNMATCHED] * table.number_of_jobs
+        for employee, job in enumerate(employee_match):
+            if job != UNMATCHED:
+                job_match[job] = employee
+        # rank of each job's match in the job-optimal matching, no job can do better in a stable matching
+        best_rank = [UNRANKED] * table.number_of_jobs
+        # position of each employee's job-optimal match, no employee can do worse in a stable matching
+        last_position = [-1] * number_of_employees
+        for employee, job in enumerate(self._job_optimal):
+            if job != UNMATCHED:
+                best_rank[job] = job_ranks[job][employee]
+                last_position[employee] = offsets[employee] + employee_ranks[employee][job]
+        # where to resume looking for each employee's next job, everything before it never qualifies again
+        scan = [
+            offsets[employee] + employee_ranks[employee][job] + 1 if job != UNMATCHED else 0
+            for employee, job in enumerate(employee_match)
+        ]
+
+        def next_position(employee: int) -> int | None:
+            # next job down the employee's reduced list: one that would take them over its match
+            position, last = scan[employee], last_position[employee]
+            while position <= last:
+                job = targets[position]
+                rank = job_ranks[job][employee]
+                if job_match[job] != UNMATCHED and best_rank[job] <= rank < job_ranks[job][job_match[job]]:
+                    break
+                position += 1
+            scan[employee] = position
+            return position if position <= last else None
+
+        # (rotation, job before, job after) of each rotation that moved each employee, in order, and the
+        # rotation that moved each job past each (employee, job) pair, from below the employee to above them
+        employee_rotations: List[List[Tuple[int, int, int]]] = [[] for _ in range(number_of_employees)]
+        passed_by: Dict[Tuple[int, int], int] = {}
+
+        stack: List[int] = []
+        on_stack = bytearray(number_of_employees)
+        candidate = 0
+        while True:
+            if not stack:
+                while candidate < number_of_employees and (
+                    employee_match[candidate] == UNMATCHED or next_position(candidate) is None
+                ):
+                    candidate += 1
+                if candidate == number_of_employees:
+                    break
+                stack.append(candidate)
+                on_stack[candidate] = 1
+
+            # follow the employee to the one they would displace, until the walk closes a cycle
+            employee = stack[-1]
+            next_employee = job_match[targets[next_position(employee)]]
+            if not on_stack[next_employee]:
+                stack.append(next_employee)
+                on_stack[next_employee] = 1
+                continue
+
+            start = len(stack) - 1
+            while stack[start] != next_employee:
+                start -= 1
+            members = stack[start:]
+            del stack[start:]
+            rotation = len(self._rotations)
+            moves = [
+                (member, employee_match[member], targets[next_position(member)]) for member in members
+            ]
+            for member, job_before, job_after in moves:
+                on_stack[member] = 0
+                employee_rotations[member].append((rotation, job_before, job_after))
+                # job_after trades its match for member, passing everyone it ranks in between
+                job_rank_range = range(job_ranks[job_after][member] + 1, job_ranks[job_after][job_match[job_after]])
+                job_list = table.job_preferences(job_after)
+                for rank in job_rank_range:
+                    passed_by[(job_list[rank], job_after)] = rotation
+            for member, _, job_after in moves:
+                employee_match[member] = job_after
+                job_match[job_after] = member
+                scan[member] = offsets[member] + employee_ranks[member][job_after] + 1
+            self._rotations.append(moves)
+            self.predecessors.append(set())
+
+        # a rotation that moves an employee comes after the one that moved them before (type 1), and after
+        # the rotation that moved each job they skip past to a match it prefers to them (type 2)
+        for employee, moves in enumerate(employee_rotations):
+            for index, (rotation, job_before, job_after) in enumerate(moves):
+                if index:
+                    self.predecessors[rotation].add(moves[index - 1][0])
+                for position in range(
+                    offsets[employee] + employee_ranks[employee][job_before] + 1,
+                    offsets[employee] + employee_ranks[employee][job_after],
+                ):
+                    predecessor = passed_by.get((employee, targets[position]))
+                    if predecessor is not None and predecessor != rotation:
+                        self.predecessors[rotation].add(predecessor)
+
+
+def _job_proposing_da(table: PreferenceTable) -> List[int]:
+    """
+    Job-proposing deferred acceptance over the pairs that list each other,
+    returning employee id -> job id (or UNMATCHED) of the job-optimal stable
+    matching.
+    """
+    offsets, targets = table.job_offsets, table.job_targets
+    employee_ranks = table.employee_ranks
+    next_proposal: List[int] = list(offsets[:-1])
+    employee_match: List[int] = [UNMATCHED] * table.number_of_employees
+    free_jobs: List[int] = list(range(table.number_of_jobs - 1, -1, -1))
+    while free_jobs:
+        job = free_jobs.pop()
+        position, end = next_proposal[job], offsets[job + 1]
+        while position < end:
+            employee = targets[position]
+            position += 1
+            ranks = employee_ranks[employee]
+            rank = ranks[job]
+            if rank == UNRANKED:
+                continue
+            prev_job = employee_match[employee]
+            if prev_job == UNMATCHED:
+                employee_match[employee] = job
+                break
+            if rank < ranks[prev_job]:
+                employee_match[employee] = job
+                free_jobs.append(prev_job)
+                break
+        next_proposal[job] = position
+    return employee_match
+
+
+def _closure(rotations: List[int], edges: List[Set[int]]) -> Set[int]:
+    """rotations, and every rotation reachable from them along edges."""
+    closure = set(rotations)
+    stack = list(closure)
+    while stack:
+        for other in edges[stack.pop()]:
+            if other not in closure:
+                closure.add(other)
+                stack.append(other)
+    return closure
+
+
+class _FlowNetwork(object):
+    """Directed graph with edge capacities, for Dinic's maximum flow."""
+
+    def __init__(self, number_of_nodes: int):
+        self.edges: List[List[int]] = [[] for _ in range(number_of_nodes)]
+        # flat edge arrays: edge i goes to heads[i] with capacities[i] left, and edge i ^ 1 is its reverse
+        self.heads: List[int] = []
+        self.capacities: List[int] = []
+
+    def add_edge(self, tail: int, head: int, capacity: int) -> None:
+        self.edges[tail].append(len(self.heads))
+        self.heads.append(head)
+        self.capacities.append(capacity)
+        self.edges[head].append(len(self.heads))
+        self.heads.append(tail)
+        self.capacities.append(0)
+
+    def max_flow(self, source: int, sink: int) -> int:
+        heads, capacities, edges = self.heads, self.capacities, self.edges
+        total = 0
+        while True:
+            # breadth first search for the level graph
+            level = [-1] * len(edges)
+            level[source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                for edge in edges[node]:
+                    if capacities[edge] and level[heads[edge]] < 0:
+                        level[heads[edge]] = level[node] + 1
+                        queue.append(heads[edge])
+            if level[sink] < 0:
+                return total
+
+            # push blocking flow along shortest paths, with an explicit stack of (node, edge index)
+            next_edge = [0] * len(edges)
+            while True:
+                path: List[int] = []
+                node = source
+                while node != sink:
+                    while next_edge[node] < len(edges[node]):
+                        edge = edges[node][next_edge[node]]
+                        if capacities[edge] and level[heads[edge]] == level[node] + 1:
+                            break
+                        next_edge[node] += 1
+                    else:
+                        # dead end, never try this node again in this phase
+                        if not path:
+                            break
+                        level[node] = -1
+                        node = heads[path.pop() ^ 1]
+                        next_edge[node] += 1
+                        continue
+                    path.append(edge)
+                    node = heads[edge]
+                if node != sink:
+                    break
+                pushed = min(capacities[edge] for edge in path)
+                for edge in path:
+                    capacities[edge] -= pushed
+                    capacities[edge ^ 1] += pushed
+                total += pushed
+
+    def reachable(self, source: int) -> Set[int]:
+        """Nodes reachable from source through edges with capacity left (the source side of a minimum cut)."""
+        reached = {source}
+        stack = [source]
+        while stack:
+            node = stack.pop()
+            for edge in self.edges[node]:
+                if self.capacities[edge] and self.heads[edge] not in reached:
+                    reached.add(self.heads[edge])
+                    stack.append(self.heads[edge])
+        return reached
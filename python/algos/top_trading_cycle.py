@@ -1,54 +1,388 @@
 # standard imports
-from typing import List, Dict, Tuple
-from collections import defaultdict
+import sys
+import time
+from array import array
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
 
 # custom imports
 from graph import Graph
-from algos.ttc_utils import find_cycle, update_graph
+from pointer_graph import NO_EDGE
+from algos.instrumentation import MatchStats, Observer
+from algos.match_result import MatchResult
+from algos.preference_table import NUMPY_ROW_LENGTH, PreferenceTable, UNMATCHED, compile_preferences
+from algos.ttc_utils import (
+    build_pointer_graph,
+    find_cycle,
+    update_graph,
+    update_compiled_graph,
+)
 
 
 def ttc(
-    employee_preferences: Dict[str, List[str]], job_preferences: Dict[str, List[str]]
-) -> Tuple[Dict[str, str], Dict[str, str]]:
-    matches: Dict[str, str] = {}
-    employees = set(employee_preferences.keys())
-    jobs = set(job_preferences.keys())
-    all_nodes = employees | jobs
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    engine: str = "reference",
+    instrument: bool = False,
+    observer: Observer | None = None,
+) -> MatchResult:
+    """
+    Implementation of the top trading cycle (TTC) algorithm. Accepts
+    either the employee and job preference dictionaries, or an already
+    compiled PreferenceTable (job_preferences is then omitted). Returns a
+    MatchResult, which unpacks to the two-sided and one-sided matches as
+    for da().
+
+    engine selects the implementation (see TTC_ENGINES): "reference"
+    restarts the cycle search from scratch and rescans every node after
+    each trade, while "fast" resumes the search where it left off and
+    only repoints nodes whose target was removed, for O(number of
+    participants + total preference length) work. Both return exactly
+    the same matching.
+
+    With instrument=True, the engine counts the cycles found (and their
+    lengths) and the edges repointed, and times the compile and match
+    phases, splitting match into find_cycle and update_graph, and the
+    result unpacks to (two_sided_match, one_sided_match, stats), stats
+    being a MatchStats (also MatchResult.stats). observer, if given, is
+    called with every event as it happens (see algos.instrumentation).
+    Without either, nothing is recorded. iter_ttc yields the trades cycle
+    by cycle instead, as they are found.
+    """
+    if engine not in TTC_ENGINES:
+        raise ValueError(
+            f"Unknown TTC engine {engine!r}, expected one of {sorted(TTC_ENGINES)}"
+        )
+    if not instrument and observer is None:
+        table = compile_preferences(employee_preferences, job_preferences)
+        return MatchResult(table, TTC_ENGINES[engine](table))
+
+    stats = MatchStats(observer)
+    start = time.perf_counter()
+    table = compile_preferences(employee_preferences, job_preferences)
+    stats.add_time("compile", time.perf_counter() - start)
+    start = time.perf_counter()
+    employee_match = TTC_ENGINES[engine](table, stats)
+    stats.add_time("match", time.perf_counter() - start)
+    return MatchResult(table, employee_match, stats if instrument else None)
+
+
+def iter_ttc(
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+    engine: str = "fast",
+    max_trades: int | None = None,
+    time_budget: float | None = None,
+) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Streaming ttc(): yields the trades of every cycle, as a list of
+    (employee, job) pairs, as soon as the cycle is found. A trade is final
+    the moment its cycle is removed, so a downstream writer can start on
+    the first ones while the rest of the market is still being matched.
+    The "fast" engine (the default here) only points nodes as its walk
+    reaches them, so the first cycle comes without a pass over the whole
+    market.
+
+    Stops early once max_trades employees have traded (after the cycle
+    that gets there, cycles are never split), or once time_budget seconds
+    have passed since the iteration started (checked after every cycle).
+    Breaking out of the loop stops the algorithm as well. Run to the end,
+    the trades are exactly the matches of ttc(), employees who never trade
+    being unmatched.
+    """
+    if engine not in TTC_ITERATORS:
+        raise ValueError(
+            f"Unknown TTC engine {engine!r}, expected one of {sorted(TTC_ITERATORS)}"
+        )
+    start = time.perf_counter()
+    if max_trades is not None and max_trades <= 0:
+        return
+    table = compile_preferences(employee_preferences, job_preferences)
+    employees, jobs = table.employees, table.jobs
+    trades = 0
+    for cycle_employees, cycle_jobs in TTC_ITERATORS[engine](table):
+        yield [(employees[e], jobs[j]) for e, j in zip(cycle_employees, cycle_jobs)]
+        trades += len(cycle_employees)
+        if max_trades is not None and trades >= max_trades:
+            return
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            return
+
+
+def _ttc(table: PreferenceTable, stats: MatchStats | None = None) -> List[int]:
+    """Run TTC on a compiled PreferenceTable, returning employee id -> job id (or UNMATCHED)."""
+    return _collect_trades(table, _iter_ttc(table, stats))
+
+
+def _collect_trades(table: PreferenceTable, cycles: Iterator[Tuple[List[int], List[int]]]) -> List[int]:
+    """employee id -> job id (or UNMATCHED) from the (employee ids, job ids) of every cycle."""
+    employee_match: List[int] = [UNMATCHED] * table.number_of_employees
+    for employees, jobs in cycles:
+        for employee, job in zip(employees, jobs):
+            employee_match[employee] = job
+    return employee_match
+
+
+def _iter_ttc(
+    table: PreferenceTable, stats: MatchStats | None = None
+) -> Iterator[Tuple[List[int], List[int]]]:
+    """
+    Run TTC on a compiled PreferenceTable, yielding the (employee ids,
+    job ids) traded in every cycle as soon as the cycle is removed.
+    """
+    n = table.number_of_employees
+    employee_match: List[int] = [UNMATCHED] * n
 
     # instantiate a new Graph object with all employee and job nodes
+    # employee e is node e, and job j is node n + j
     # initially, this graph will only have nodes, no edges
-    G = Graph(all_nodes)
+    G = Graph(range(n + table.number_of_jobs))
 
     # queue (counter) to track which job we are currently considering for the current employee
     # i.e., if job_index is 2, then we are considering the 3rd job on the given
-    job_queue: Dict = defaultdict(int)
-    employee_queue: Dict = defaultdict(int)
+    job_queue: List[int] = [0] * n
+    employee_queue: List[int] = [0] * table.number_of_jobs
 
-    # add edges to build out graph
-    for e in employees:
-        job_index = job_queue[e]  # new entries start at 0 for defaultdict
-        G.add_edge(e, employee_preferences[e][job_index])
-    for j in jobs:
-        employee_index = employee_queue[j]  # new entries start at 0 for defaultdict
-        G.add_edge(j, job_preferences[j][employee_index])
+    # add edges to build out graph, pointing every node at the top of its preference list
+    for e in range(n):
+        if table.employee_offsets[e] < table.employee_offsets[e + 1]:
+            G.add_edge(e, n + table.employee_targets[table.employee_offsets[e]])
+    for j in range(table.number_of_jobs):
+        if table.job_offsets[j] < table.job_offsets[j + 1]:
+            G.add_edge(n + j, table.job_targets[table.job_offsets[j]])
+    # nodes with empty preference lists have no edge yet, and are removed from the graph here
+    G = update_compiled_graph(G, table, employee_match, employee_queue, job_queue, stats)
 
     # Remove top trading cycles until graph is empty
     while G.number_of_nodes_in_graph() > 0:
         # find an arbitrary cycle in the graph
+        if stats is not None:
+            start = time.perf_counter()
         cycle = find_cycle(G)
+        if stats is not None:
+            stats.add_time("find_cycle", time.perf_counter() - start)
 
         # make assignments of employees to job based on cycle that was found
+        traded: List[int] = []
         for node in cycle:
-            if node in employees:
-                job: str = G.nodes[node].get_next_node()
-                matches[node] = job
-                matches[job] = node
+            if node < n:
+                job: int = G.nodes[node].get_next_node()
+                employee_match[node] = job - n
+                traded.append(node)
                 G.delete_node(node)
                 G.delete_node(job)
+        jobs = [employee_match[e] for e in traded]
+        if stats is not None:
+            stats.cycle_lengths.append(len(traded))
+            stats.record("cycle", employees=traded, jobs=jobs)
+        # the trades are final, hand them out before the graph is updated
+        yield traded, jobs
+        if stats is not None:
+            start = time.perf_counter()
 
         # update the graph with new edges after cycle was found and matches were made
-        G, matches, employee_queue, job_queue = update_graph(
-            G, matches, employee_preferences, job_preferences, employee_queue, job_queue
-        )
+        G = update_compiled_graph(G, table, employee_match, employee_queue, job_queue, stats)
+        if stats is not None:
+            stats.add_time("update_graph", time.perf_counter() - start)
+
+
+def _ttc_fast(
+    table: PreferenceTable,
+    stats: MatchStats | None = None,
+    capacities: Sequence[int] | None = None,
+) -> List[int]:
+    """Run TTC on a compiled PreferenceTable by pointer chasing (see _iter_ttc_fast), returning employee id -> job id (or UNMATCHED)."""
+    return _collect_trades(table, _iter_ttc_fast(table, stats, capacities))
+
+
+def _iter_ttc_fast(
+    table: PreferenceTable,
+    stats: MatchStats | None = None,
+    capacities: Sequence[int] | None = None,
+) -> Iterator[Tuple[List[int], List[int]]]:
+    """
+    Run TTC on a compiled PreferenceTable by pointer chasing, yielding the
+    (employee ids, job ids) traded in every cycle as soon as the cycle is
+    removed. Employee e is node e, and job j is node number_of_employees
+    + j, in a PointerGraph. Every node points at the first node on its
+    preference list that is still in the graph, and keeps a cursor into
+    its list that only ever moves forward. Nodes are only pointed when the
+    walk first reaches them, so the first cycle is found without a pass
+    over the whole graph. The walk that finds a cycle is kept as a path
+    stack: a cycle is always a suffix of the path, so after it is removed
+    the walk resumes from the node just before it. When a node is removed,
+    only the nodes that were pointing at it (its in-edges) are repointed,
+    and those whose lists are exhausted are removed in turn.
+
+    capacities (job id -> number of openings) runs school choice TTC: a job
+    in a cycle fills one opening, and only leaves the graph once it is full,
+    otherwise it is repointed like any node whose target left. Every job has
+    a single opening by default.
+    """
+    n = table.number_of_employees
+    G = build_pointer_graph(table)
+    number_of_nodes = len(G.alive)
+    alive, pointer = G.alive, G.next
+    employee_offsets, employee_targets = table.employee_offsets, table.employee_targets
+    job_offsets, job_targets = table.job_offsets, table.job_targets
+    # cursor[node] is the position (in employee_targets or job_targets) of the node's current target,
+    # -1 until the node is first pointed (nothing is done per node before the walk starts)
+    cursor = array("q", [-1]) * number_of_nodes
+    on_path = bytearray(number_of_nodes)
+    # nodes that have been removed from the graph, whose in-edges still need repointing
+    removed: List[int] = []
+    openings: List[int] = [1] * table.number_of_jobs if capacities is None else list(capacities)
+    # views of the job lists and of the alive bitmap (sharing its memory), used to skip long
+    # runs of removed employees on a job's list, which happen when jobs have many openings,
+    # built on the first long run (so that small markets don't need NumPy at all)
+    views: List = []
+    if stats is not None:
+        start_walk = time.perf_counter()
+        update_seconds = 0.0
+
+    def skip_removed_employees(i: int, stop: int) -> int:
+        """Position of the first employee still in the graph in job_targets[i:stop], or stop, scanning in growing blocks."""
+        if not views:
+            if stop - i < NUMPY_ROW_LENGTH and "numpy" not in sys.modules:
+                # the rest of a short list is quicker to scan in Python than to import NumPy for
+                while i < stop and not alive[job_targets[i]]:
+                    i += 1
+                return i
+            import numpy as np
+
+            views.extend((np.asarray(job_targets), np.frombuffer(alive, dtype=np.bool_)))
+        job_targets_array, employee_alive = views
+        block_size = 64
+        while i < stop:
+            block = employee_alive[job_targets_array[i : min(i + block_size, stop)]]
+            first = int(block.argmax())
+            if block[first]:
+                return i + first
+            i += len(block)
+            block_size = min(2 * block_size, 65536)
+        return stop
+
+    def point(u: int) -> None:
+        """Point u at the first remaining node at or after its cursor, or remove u if there is none."""
+        i = cursor[u]
+        if u < n:
+            if i == -1:
+                i = employee_offsets[u]
+            stop = employee_offsets[u + 1]
+            while i < stop and not alive[n + employee_targets[i]]:
+                i += 1
+            v = n + employee_targets[i] if i < stop else -1
+        else:
+            if i == -1:
+                i = job_offsets[u - n]
+            stop = job_offsets[u - n + 1]
+            scan_stop = min(stop, i + 16)
+            while i < scan_stop and not alive[job_targets[i]]:
+                i += 1
+            if i == scan_stop and i < stop:
+                i = skip_removed_employees(i, stop)
+            v = job_targets[i] if i < stop else -1
+        cursor[u] = i
+        if v == -1:
+            # exhausted preference list, employee stays UNMATCHED / job stays unfilled
+            G.delete_node(u)
+            removed.append(u)
+        else:
+            G.add_edge(u, v)
+
+    def repoint_in_edges() -> None:
+        """Repoint every node that was pointing at a removed node, cascading through exhausted lists."""
+        while removed:
+            for u in G.pointed_at_by(removed.pop()):
+                point(u)
+                if stats is not None and alive[u]:
+                    stats.record("repoint", node=u, target=pointer[u])
+
+    # jobs without openings never join the graph
+    if capacities is not None:
+        for j, number_of_openings in enumerate(openings):
+            if not number_of_openings:
+                G.delete_node(n + j)
+
+    path: List[int] = []
+    start = 0
+    while True:
+        if not path:
+            # begin a new walk from the next node that is still in the graph
+            while start < number_of_nodes and not alive[start]:
+                start += 1
+            if start == number_of_nodes:
+                break
+            if pointer[start] == NO_EDGE:
+                point(start)
+                repoint_in_edges()
+                continue
+            path.append(start)
+            on_path[start] = 1
+
+        v = pointer[path[-1]]
+        if pointer[v] == NO_EDGE:
+            # first visit to v: point it, and if its list is exhausted, remove it and repoint its in-edges
+            point(v)
+            if not alive[v]:
+                repoint_in_edges()
+                while path and not alive[path[-1]]:
+                    on_path[path.pop()] = 0
+                continue
+        if not on_path[v]:
+            path.append(v)
+            on_path[v] = 1
+            continue
+
+        # found a cycle, the suffix of path starting at v: make assignments and remove it
+        employees: List[int] = []
+        jobs: List[int] = []
+        while True:
+            u = path.pop()
+            on_path[u] = 0
+            if u < n:
+                employees.append(u)
+                jobs.append(pointer[u] - n)
+            else:
+                openings[u - n] -= 1
+            # a job with openings left stays in the graph, and is repointed with the in-edges of its employee
+            if u < n or not openings[u - n]:
+                G.delete_node(u)
+                removed.append(u)
+            if u == v:
+                break
+        # in path order, the order the cycle was walked in
+        employees.reverse()
+        jobs.reverse()
+        if stats is not None:
+            stats.cycle_lengths.append(len(employees))
+            stats.record("cycle", employees=employees, jobs=jobs)
+        # the trades are final, hand them out before the in-edges are repointed
+        yield employees, jobs
+        if stats is None:
+            repoint_in_edges()
+        else:
+            update_start = time.perf_counter()
+            repoint_in_edges()
+            update_seconds += time.perf_counter() - update_start
+
+        # nodes removed while repointing can only be a suffix of the path, resume before them
+        while path and not alive[path[-1]]:
+            on_path[path.pop()] = 0
+
+    if stats is not None:
+        # the walk is interleaved with the updates, so its time is whatever the updates did not use
+        stats.add_time("update_graph", update_seconds)
+        stats.add_time("find_cycle", time.perf_counter() - start_walk - update_seconds)
+
+
+# available implementations of TTC, selected with ttc(..., engine=...)
+TTC_ENGINES: Dict[str, Callable[[PreferenceTable, MatchStats | None], List[int]]] = {
+    "reference": _ttc,
+    "fast": _ttc_fast,
+}
 
-    return matches, {employee: matches[employee] for employee in employees}
+# the same implementations, yielding the (employee ids, job ids) of every cycle, see iter_ttc
+TTC_ITERATORS: Dict[str, Callable[..., Iterator[Tuple[List[int], List[int]]]]] = {
+    "reference": _iter_ttc,
+    "fast": _iter_ttc_fast,
+}
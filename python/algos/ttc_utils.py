@@ -1,13 +1,18 @@
 # standard imports
-from typing import List, Set
+from typing import Dict, List, Set
 
 # custom imports
 from graph import Graph, Node
+from algos.instrumentation import MatchStats
+from pointer_graph import PointerGraph
+from algos.preference_table import PreferenceTable, UNMATCHED
 
 
-def find_cycle(G: Graph) -> List[str] | None:
-    if G.number_of_nodes_in_graph == 0:
+def find_cycle(G: Graph | PointerGraph) -> List[str] | List[int] | None:
+    if G.number_of_nodes_in_graph() == 0:
         return None
+    if isinstance(G, PointerGraph):
+        return _find_pointer_graph_cycle(G)
     visited_nodes: Set[str] = set()
     cycle: List[str] = list()
     # start at an arbitrary node in the graph to begin random walk
@@ -22,6 +27,27 @@ def find_cycle(G: Graph) -> List[str] | None:
     return cycle[start_of_cycle_index:]
 
 
+def _find_pointer_graph_cycle(G: PointerGraph) -> List[int]:
+    # same random walk as find_cycle, remembering where on the walk each node was visited
+    visited_nodes: Dict[int, int] = dict()
+    cycle: List[int] = list()
+    n: int = G.get_random_node()
+    while n not in visited_nodes:
+        visited_nodes[n] = len(cycle)
+        cycle.append(n)
+        n = G.get_next_node(n)
+
+    return cycle[visited_nodes[n] :]
+
+
+def build_pointer_graph(table: PreferenceTable) -> PointerGraph:
+    """
+    Build an (edgeless) PointerGraph for TTC on a compiled PreferenceTable,
+    where employee e is node e and job j is node number_of_employees + j.
+    """
+    return PointerGraph(table.number_of_employees + table.number_of_jobs)
+
+
 def update_graph(
     G, matches, employee_preferences, job_preferences, employee_queue, job_queue
 ):
@@ -73,3 +99,72 @@ def update_graph(
                     break
 
     return G, matches, employee_queue, job_queue
+
+
+def update_compiled_graph(
+    G: Graph,
+    table: PreferenceTable,
+    employee_match: List[int],
+    employee_queue: List[int],
+    job_queue: List[int],
+    stats: MatchStats | None = None,
+) -> Graph:
+    """
+    Same as update_graph, but for a graph built from a compiled PreferenceTable,
+    where employee e is node e and job j is node number_of_employees + j.
+    Nodes that have been removed from the graph are no longer available. Repeats
+    until every remaining node has an outgoing edge, since removing an exhausted
+    employee or job can leave nodes that pointed at it without an edge. Every
+    new edge is recorded as a "repoint" event in stats, if given.
+    """
+    n = table.number_of_employees
+    employee_offsets, employee_targets = table.employee_offsets, table.employee_targets
+    job_offsets, job_targets = table.job_offsets, table.job_targets
+
+    changed = True
+    while changed:
+        changed = False
+        for e in range(n):
+            # if the job that this employee was "pointing" at is no longer available,
+            # add an edge between this employee and their next highest job preference
+            if e in G.nodes and G.nodes[e].degree_outgoing() == 0:
+                changed = True
+                while True:
+                    job_queue[e] += 1
+                    job_index = employee_offsets[e] + job_queue[e]
+                    # if we've gone through the employee's entire list, mark employee UNMATCHED
+                    # and delete them from the graph
+                    if job_index >= employee_offsets[e + 1]:
+                        employee_match[e] = UNMATCHED
+                        G.delete_node(e)
+                        break
+                    # if this employee's next highest preference is still in the graph, add a directed edge
+                    next_job_preference = n + employee_targets[job_index]
+                    if next_job_preference in G.nodes:
+                        G.add_edge(e, next_job_preference)
+                        if stats is not None:
+                            stats.record("repoint", node=e, target=next_job_preference)
+                        break
+
+        for j in range(table.number_of_jobs):
+            # if the employee that this job was "pointing" at is no longer available,
+            # add an edge between this job and their next highest employee preference
+            if n + j in G.nodes and G.nodes[n + j].degree_outgoing() == 0:
+                changed = True
+                while True:
+                    employee_queue[j] += 1
+                    employee_index = job_offsets[j] + employee_queue[j]
+                    # if we've gone through the job's entire list, this job will be unfilled,
+                    # delete it from the graph
+                    if employee_index >= job_offsets[j + 1]:
+                        G.delete_node(n + j)
+                        break
+                    # if this job's next highest preference is still in the graph, add a directed edge
+                    next_employee_preference = job_targets[employee_index]
+                    if next_employee_preference in G.nodes:
+                        G.add_edge(n + j, next_employee_preference)
+                        if stats is not None:
+                            stats.record("repoint", node=n + j, target=next_employee_preference)
+                        break
+
+    return G
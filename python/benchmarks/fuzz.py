@@ -0,0 +1,401 @@
+"""
+Differential fuzzing of the DA and TTC engines against their reference
+implementations. Every iteration generates a random market with
+data_generator in a randomly chosen shape (balanced or unbalanced sides,
+full or truncated employee lists, jobs that rank every employee or leave
+applicants unranked, employees with empty lists or without a list at all,
+jobs without a list), and runs it through every engine of DA_ENGINES and
+TTC_ENGINES. Every engine must return a valid matching, identical to the
+one of the "reference" engine, and DA matchings must have no blocking
+pairs. A failing market is shrunk to a minimal counterexample, by removing
+participants and list entries for as long as it keeps failing the same
+way. The throughput of every engine is recorded along the way.
+
+Runs until the time budget is spent, so the same command serves as a quick
+CI check and as an overnight soak run, and exits with status 1 if anything
+failed. Run from the python/ directory:
+    python -m benchmarks.fuzz --budget 30
+    python -m benchmarks.fuzz --budget 28800 --max-size 200 --output failures.json
+"""
+
+# standard imports
+import argparse
+import json
+import random
+import sys
+import time
+from itertools import chain
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# custom imports
+import data_generator
+from algos.da_utils import find_all_blocking_pairs
+from algos.deferred_acceptance import DA_ENGINES
+from algos.instrumentation import MatchStats
+from algos.preference_table import PreferenceTable, UNMATCHED, UNRANKED
+from algos.top_trading_cycle import TTC_ENGINES
+
+# an engine, as registered in DA_ENGINES or TTC_ENGINES
+Engine = Callable[[PreferenceTable, MatchStats | None], List[int]]
+# a market, as employee and job preference dictionaries
+Market = Tuple[Dict[str, List[str]], Dict[str, List[str]]]
+# the engines exercised by default, by algorithm
+ENGINES: Dict[str, Dict[str, Engine]] = {"da": DA_ENGINES, "ttc": TTC_ENGINES}
+# kinds of failure: the engine raised, returned something that is not a matching of the market,
+# returned a different matching than the reference engine, or a DA matching with blocking pairs
+FAILURE_KINDS = ("error", "invalid", "mismatch", "unstable")
+# largest number of employees (and of jobs) in a generated market
+MAX_SIZE: int = 30
+# preference models the markets are drawn from (see data_generator)
+CORRELATIONS = (0.0, 0.5, 0.9)
+# shrinking stops after this many candidate markets, even if a smaller one might still fail
+MAX_SHRINK_ATTEMPTS: int = 20000
+
+
+def _proposals_ranked(table: PreferenceTable) -> bool:
+    return not (table.proposal_ranks == UNRANKED).any()
+
+
+# engines that only agree with the reference on some markets, checked on those only: the parallel
+# DA engine finds the employee optimal matching whenever every job ranks every employee proposing to it
+PRECONDITIONS: Dict[Tuple[str, str], Callable[[PreferenceTable], bool]] = {
+    ("da", "parallel"): _proposals_ranked,
+}
+
+
+class Failure(object):
+    """
+    A failure of engine (of algorithm) of the given kind (see
+    FAILURE_KINDS), first found on the market generated from seed (see
+    random_market), with the minimal market it was shrunk to.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        engine: str,
+        kind: str,
+        message: str,
+        seed: int,
+        shape: Dict,
+        market: Market,
+    ):
+        self.algorithm: str = algorithm
+        self.engine: str = engine
+        self.kind: str = kind
+        self.message: str = message
+        self.seed: int = seed
+        self.shape: Dict = shape
+        self.employee_preferences, self.job_preferences = market
+        # number of generated markets this failure was seen on
+        self.occurrences: int = 1
+
+    def __repr__(self):
+        return (
+            f"Failure({self.algorithm}/{self.engine} {self.kind}: {self.message}; "
+            f"seed={self.seed}, employees={len(self.employee_preferences)}, jobs={len(self.job_preferences)})"
+        )
+
+    def as_dict(self) -> Dict:
+        return {
+            "algorithm": self.algorithm,
+            "engine": self.engine,
+            "kind": self.kind,
+            "message": self.message,
+            "seed": self.seed,
+            "shape": self.shape,
+            "occurrences": self.occurrences,
+            "employee_preferences": self.employee_preferences,
+            "job_preferences": self.job_preferences,
+        }
+
+
+class FuzzReport(object):
+    """
+    Outcome of a fuzzing run: the number of markets generated, failures
+    (one per algorithm, engine and kind of failure, with the first
+    counterexample found), and throughput[(algorithm, engine)], the
+    markets run, seconds spent and preference list entries matched by
+    every engine.
+    """
+
+    def __init__(self):
+        self.markets: int = 0
+        self.seconds: float = 0.0
+        self.failures: Dict[Tuple[str, str, str], Failure] = {}
+        self.throughput: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def __repr__(self):
+        return f"FuzzReport(markets={self.markets}, failures={len(self.failures)}, seconds={self.seconds:.1f})"
+
+    def record(self, algorithm: str, engine: str, seconds: float, entries: int) -> None:
+        totals = self.throughput.setdefault((algorithm, engine), {"markets": 0, "seconds": 0.0, "entries": 0})
+        totals["markets"] += 1
+        totals["seconds"] += seconds
+        totals["entries"] += entries
+
+    def as_dict(self) -> Dict:
+        return {
+            "markets": self.markets,
+            "seconds": self.seconds,
+            "failures": [failure.as_dict() for failure in self.failures.values()],
+            "throughput": [
+                {"algorithm": algorithm, "engine": engine, **totals}
+                for (algorithm, engine), totals in self.throughput.items()
+            ],
+        }
+
+
+def random_market(seed: int, max_size: int = MAX_SIZE) -> Tuple[Market, Dict]:
+    """
+    A random market with up to max_size employees and jobs, and its shape
+    (the parameters it was drawn with). The same seed always gives the
+    same market.
+    """
+    rng = random.Random(seed)
+    number_of_employees = rng.randint(1, max_size)
+    number_of_jobs = rng.choice((number_of_employees, rng.randint(1, max_size)))
+    shape = {
+        "employees": number_of_employees,
+        "jobs": number_of_jobs,
+        "job_list_length": rng.choice((number_of_jobs, rng.randint(0, number_of_jobs))),
+        # None: every job ranks every employee, otherwise jobs leave some applicants unranked
+        "employee_list_length": rng.choice((None, rng.randint(0, number_of_employees))),
+        "correlation": rng.choice(CORRELATIONS),
+        # fractions of employees with an empty list, of employees without a list (only named on
+        # jobs' lists), and of jobs without a list (only named on employees' lists)
+        "empty_employee_lists": rng.choice((0.0, 0.2)),
+        "missing_employee_lists": rng.choice((0.0, 0.1)),
+        "missing_job_lists": rng.choice((0.0, 0.2)),
+    }
+    employee_preferences, job_preferences = data_generator.generate_preference_data(
+        number_of_jobs,
+        number_of_employees,
+        shape["job_list_length"],
+        shape["employee_list_length"],
+        shape["correlation"],
+        seed,
+    )
+    for employee in list(employee_preferences):
+        if rng.random() < shape["empty_employee_lists"]:
+            employee_preferences[employee] = []
+        elif rng.random() < shape["missing_employee_lists"]:
+            del employee_preferences[employee]
+    for job in list(job_preferences):
+        if rng.random() < shape["missing_job_lists"]:
+            del job_preferences[job]
+    return (employee_preferences, job_preferences), shape
+
+
+def _invalid(table: PreferenceTable, employee_match: List[int]) -> str | None:
+    """Why employee_match is not a matching of table (employees matched to jobs on their list, one per job), or None."""
+    if len(employee_match) != table.number_of_employees:
+        return f"{len(employee_match)} matches for {table.number_of_employees} employees"
+    taken: Dict[int, int] = {}
+    for employee, job in enumerate(employee_match):
+        if job == UNMATCHED:
+            continue
+        name = table.employees[employee]
+        if job not in table.employee_preferences(employee):
+            return f"{name} matched to job id {job}, which is not on their list"
+        if job in taken:
+            return f"{table.jobs[job]} matched to both {table.employees[taken[job]]} and {name}"
+        taken[job] = employee
+    return None
+
+
+def check_market(
+    market: Market,
+    algorithm: str,
+    engines: Dict[str, Engine],
+    report: FuzzReport | None = None,
+) -> List[Tuple[str, str, str]]:
+    """
+    Run every engine of algorithm on market, returning a (engine, kind,
+    message) triple for every failure (see FAILURE_KINDS), none if every
+    engine agrees with "reference". Every engine compiles its own table,
+    so that rank rows built by one engine don't speed up the next, and its
+    time is recorded in report.
+    """
+    failures: List[Tuple[str, str, str]] = []
+    results: Dict[str, Tuple[PreferenceTable, List[int]]] = {}
+    for engine, run in engines.items():
+        table = PreferenceTable.from_dicts(*market)
+        precondition = PRECONDITIONS.get((algorithm, engine))
+        if precondition is not None and not precondition(table):
+            continue
+        start = time.perf_counter()
+        try:
+            employee_match = list(run(table))
+        except Exception as error:
+            failures.append((engine, "error", f"{type(error).__name__}: {error}"))
+            continue
+        if report is not None:
+            report.record(algorithm, engine, time.perf_counter() - start, len(table.employee_targets))
+        reason = _invalid(table, employee_match)
+        if reason is not None:
+            failures.append((engine, "invalid", reason))
+        else:
+            results[engine] = (table, employee_match)
+
+    reference = results.get("reference")
+    for engine, (table, employee_match) in results.items():
+        if reference is not None and employee_match != reference[1]:
+            employee = next(e for e, job in enumerate(employee_match) if job != reference[1][e])
+            decoded = [
+                "unmatched" if match[employee] == UNMATCHED else table.jobs[match[employee]]
+                for match in (employee_match, reference[1])
+            ]
+            failures.append(
+                (engine, "mismatch", f"{table.employees[employee]} gets {decoded[0]}, reference {decoded[1]}")
+            )
+        elif algorithm == "da":
+            blocking_pairs = find_all_blocking_pairs(table.decode_matches(employee_match)[1], table)
+            if blocking_pairs:
+                failures.append((engine, "unstable", f"blocking pairs {blocking_pairs[:3]}"))
+    return failures
+
+
+def _participants(names: Iterator[str]) -> List[str]:
+    return list(dict.fromkeys(names))
+
+
+def _smaller_markets(market: Market) -> Iterator[Market]:
+    """
+    Markets one step smaller than market: without all, half, a quarter,
+    ... down to a single one of the employees (removed from every list,
+    and their own list), then of the jobs, then without a single list
+    entry.
+    """
+    employee_preferences, job_preferences = market
+    employees = _participants(chain(employee_preferences, *job_preferences.values()))
+    jobs = _participants(chain(job_preferences, *employee_preferences.values()))
+    for side, names in (("employees", employees), ("jobs", jobs)):
+        chunk = len(names)
+        while chunk >= 1:
+            for first in range(0, len(names), chunk):
+                removed = set(names[first : first + chunk])
+                if side == "employees":
+                    yield (
+                        {e: p for e, p in employee_preferences.items() if e not in removed},
+                        {j: [e for e in p if e not in removed] for j, p in job_preferences.items()},
+                    )
+                else:
+                    yield (
+                        {e: [j for j in p if j not in removed] for e, p in employee_preferences.items()},
+                        {j: p for j, p in job_preferences.items() if j not in removed},
+                    )
+            chunk //= 2
+    for employee, preferences in employee_preferences.items():
+        for k in range(len(preferences)):
+            yield {**employee_preferences, employee: preferences[:k] + preferences[k + 1 :]}, job_preferences
+    for job, preferences in job_preferences.items():
+        for k in range(len(preferences)):
+            yield employee_preferences, {**job_preferences, job: preferences[:k] + preferences[k + 1 :]}
+
+
+def shrink(
+    market: Market,
+    fails: Callable[[Market], bool],
+    max_attempts: int = MAX_SHRINK_ATTEMPTS,
+) -> Market:
+    """
+    Shrink market to a minimal one on which fails still holds: take the
+    first smaller market (see _smaller_markets) that still fails, and
+    start over from it, until none does (or max_attempts markets have
+    been tried). Removing large chunks first gets rid of most of a market
+    in a few steps, single entries are only removed at the end.
+    """
+    attempts = 0
+    shrunk = True
+    while shrunk and attempts < max_attempts:
+        shrunk = False
+        for candidate in _smaller_markets(market):
+            attempts += 1
+            if fails(candidate):
+                market, shrunk = candidate, True
+                break
+            if attempts >= max_attempts:
+                break
+    return market
+
+
+def fuzz(
+    budget: float,
+    seed: int = 0,
+    max_size: int = MAX_SIZE,
+    engines: Dict[str, Dict[str, Engine]] | None = None,
+) -> FuzzReport:
+    """
+    Check random markets (see random_market) against every engine in
+    engines (algorithm -> engine name -> engine, ENGINES by default) for
+    budget seconds, shrinking the first counterexample of every new kind
+    of failure. Market seeds are drawn from seed, so the same seed checks
+    the same markets, in the same order.
+    """
+    engines = ENGINES if engines is None else engines
+    report = FuzzReport()
+    seeds = random.Random(seed)
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget:
+        market_seed = seeds.getrandbits(32)
+        market, shape = random_market(market_seed, max_size)
+        report.markets += 1
+        for algorithm, algorithm_engines in engines.items():
+            for engine, kind, message in check_market(market, algorithm, algorithm_engines, report):
+                key = (algorithm, engine, kind)
+                if key in report.failures:
+                    report.failures[key].occurrences += 1
+                    continue
+
+                def fails(candidate: Market) -> bool:
+                    return any(
+                        failure[:2] == (engine, kind)
+                        for failure in check_market(candidate, algorithm, algorithm_engines)
+                    )
+
+                minimal = shrink(market, fails)
+                # report the message of the minimal market, which is the one worth reading
+                message = next(
+                    (m for e, k, m in check_market(minimal, algorithm, algorithm_engines) if (e, k) == (engine, kind)),
+                    message,
+                )
+                report.failures[key] = Failure(algorithm, engine, kind, message, market_seed, shape, minimal)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds to fuzz for (default 10)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-size", type=int, default=MAX_SIZE, help="largest number of employees and jobs")
+    parser.add_argument("--output", help="write failures and throughput to this JSON file")
+    args = parser.parse_args()
+
+    report = fuzz(args.budget, args.seed, args.max_size)
+    print(f"{report.markets} markets in {report.seconds:.1f}s")
+    print(f"{'algorithm':>10} {'engine':>10} {'markets':>8} {'markets/s':>10} {'entries/s':>12}")
+    for (algorithm, engine), totals in report.throughput.items():
+        seconds = totals["seconds"] or float("nan")
+        print(
+            f"{algorithm:>10} {engine:>10} {totals['markets']:>8} "
+            f"{totals['markets'] / seconds:>10.1f} {totals['entries'] / seconds:>12.0f}"
+        )
+    for failure in report.failures.values():
+        print(
+            f"FAILURE {failure.algorithm}/{failure.engine} {failure.kind} "
+            f"({failure.occurrences}x, seed {failure.seed}): {failure.message}"
+        )
+        print(f"  employee_preferences = {failure.employee_preferences}")
+        print(f"  job_preferences = {failure.job_preferences}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.as_dict(), f, indent=2)
+    if report.failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Memory and throughput comparison of the TTC graph structures: graph.Graph
+(Node objects with edge sets) against pointer_graph.PointerGraph (flat int
+arrays). Builds a TTC style bipartite graph where every node points at a
+random node on the other side, then finds a cycle and deletes every node.
+
+Run from the python/ directory:
+    python -m benchmarks.graph_memory --sizes 100000 1000000
+"""
+
+# standard imports
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Dict, List
+
+# third party imports
+import numpy as np
+
+# custom imports
+from graph import Graph
+from pointer_graph import PointerGraph
+from algos.ttc_utils import find_cycle
+
+
+def random_targets(number_of_nodes: int, seed: int = 0) -> List[int]:
+    """Every node in the first half points at a random node in the second half, and vice versa."""
+    rng = np.random.default_rng(seed)
+    half = number_of_nodes // 2
+    return np.concatenate(
+        (
+            rng.integers(half, number_of_nodes, half),
+            rng.integers(0, half, number_of_nodes - half),
+        )
+    ).tolist()
+
+
+def measure(graph_class: type, targets: List[int]) -> Dict[str, float]:
+    number_of_nodes = len(targets)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if graph_class is Graph:
+        G = Graph(range(number_of_nodes))
+    else:
+        G = PointerGraph(number_of_nodes)
+    for s, t in enumerate(targets):
+        G.add_edge(s, t)
+    build_seconds = time.perf_counter() - start
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    cycle = find_cycle(G)
+    cycle_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for node in range(number_of_nodes):
+        G.delete_node(node)
+    delete_seconds = time.perf_counter() - start
+
+    return {
+        "bytes_per_node": memory_bytes / number_of_nodes,
+        "build_seconds": build_seconds,
+        "cycle_length": len(cycle),
+        "find_cycle_seconds": cycle_seconds,
+        "delete_seconds": delete_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>10} {'structure':>12} {'bytes/node':>11} {'build s':>9} {'find_cycle s':>13} {'delete s':>9}"
+    )
+    for number_of_nodes in args.sizes:
+        targets = random_targets(number_of_nodes)
+        for graph_class in (Graph, PointerGraph):
+            result = measure(graph_class, targets)
+            print(
+                f"{number_of_nodes:>10} {graph_class.__name__:>12} {result['bytes_per_node']:>11.1f} "
+                f"{result['build_seconds']:>9.3f} {result['find_cycle_seconds']:>13.5f} {result['delete_seconds']:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
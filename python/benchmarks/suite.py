@@ -0,0 +1,214 @@
+"""
+Scaling benchmark for DA, TTC and the stability audit. Runs every algorithm
+(and engine) over a grid of market sizes, employee list lengths and
+preference models generated by data_generator, recording wall time (best of
+--repeats runs), peak traced memory, and the amount of work done (proposals
+for DA, cycles for TTC, blocking pairs for the audit). Results are written as
+JSON, and can be compared against a previously saved result file: any case
+slower than the baseline by more than --threshold is reported as a
+regression, and the command exits with status 1.
+
+Run from the python/ directory:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.25
+"""
+
+# standard imports
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# third party imports
+import numpy as np
+
+# custom imports
+import data_generator
+from algos.da_utils import find_blocking_pairs
+from algos.deferred_acceptance import DA_ENGINES, da
+from algos.top_trading_cycle import TTC_ENGINES, ttc
+
+# preference models, by name: the correlation passed to data_generator
+MODELS: Dict[str, float] = {"uniform": 0.0, "correlated": 0.5}
+# fields that identify a benchmark case, used to line results up with a baseline
+CASE_FIELDS: Tuple[str, ...] = ("algorithm", "engine", "size", "list_length", "model")
+
+
+def cases(
+    sizes: List[int],
+    list_lengths: List[int],
+    models: List[str],
+    algorithms: List[str],
+    seed: int,
+) -> Iterator[Tuple[Dict, Callable[[], None], Callable[[], int]]]:
+    """
+    Yield (case, run, work) for every point of the grid, where run() executes
+    the benchmarked call once, and work() executes it once with
+    instrumentation and returns its work count. Each market is square
+    (size employees, size jobs), every job ranks every employee, and every
+    employee ranks list_length jobs.
+    """
+    for size in sizes:
+        for list_length in list_lengths:
+            if list_length > size:
+                continue
+            for model in models:
+                employee_preferences, job_preferences = data_generator.generate_preference_data(
+                    size, size, list_length, correlation=MODELS[model], seed=seed
+                )
+                case = {"size": size, "list_length": list_length, "model": model}
+
+                if "da" in algorithms:
+                    for engine in DA_ENGINES:
+
+                        def run_da(engine: str = engine) -> None:
+                            da(employee_preferences, job_preferences, engine)
+
+                        def da_work(engine: str = engine) -> int:
+                            return da(employee_preferences, job_preferences, engine, instrument=True)[2].proposals
+
+                        yield {"algorithm": "da", "engine": engine, **case}, run_da, da_work
+
+                if "ttc" in algorithms:
+                    for engine in TTC_ENGINES:
+
+                        def run_ttc(engine: str = engine) -> None:
+                            ttc(employee_preferences, job_preferences, engine)
+
+                        def ttc_work(engine: str = engine) -> int:
+                            return ttc(employee_preferences, job_preferences, engine, instrument=True)[2].cycles
+
+                        yield {"algorithm": "ttc", "engine": engine, **case}, run_ttc, ttc_work
+
+                if "find_blocking_pairs" in algorithms:
+                    two_sided_match, one_sided_match = da(employee_preferences, job_preferences, "fast")
+
+                    def run_audit() -> int:
+                        return len(
+                            find_blocking_pairs(
+                                one_sided_match, two_sided_match, employee_preferences, job_preferences
+                            )
+                        )
+
+                    yield {"algorithm": "find_blocking_pairs", "engine": "reference", **case}, run_audit, run_audit
+
+
+def measure(run: Callable[[], None], work: Callable[[], int], repeats: int) -> Dict[str, float]:
+    """
+    Time run() repeats times, then run it once more under tracemalloc for its
+    peak memory, and once with instrumentation for its work count.
+    """
+    seconds: List[float] = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    # tracing slows Python code down a lot, so memory is measured in a separate, untimed run
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": min(seconds),
+        "median_seconds": float(np.median(seconds)),
+        "peak_bytes": peak_bytes,
+        "work": work(),
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def load_baseline(path: str) -> List[Dict]:
+    """Results of a run previously saved with --output."""
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def find_regressions(
+    results: List[Dict], baseline: List[Dict], threshold: float
+) -> List[Tuple[Dict, Dict]]:
+    """
+    Return (result, baseline result) for every case that is more than
+    threshold (a fraction, 0.25 = 25%) slower than the same case in the
+    baseline. Cases missing from the baseline are ignored.
+    """
+    baseline_cases = {tuple(result[field] for field in CASE_FIELDS): result for result in baseline}
+    regressions: List[Tuple[Dict, Dict]] = []
+    for result in results:
+        before = baseline_cases.get(tuple(result[field] for field in CASE_FIELDS))
+        if before is not None and result["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append((result, before))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--list-lengths", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument(
+        "--algorithms",
+        nargs="+",
+        choices=["da", "ttc", "find_blocking_pairs"],
+        default=["da", "ttc", "find_blocking_pairs"],
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results previously saved with --output")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fraction by which a case may be slower than the baseline (default 0.25)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'algorithm':>20} {'engine':>10} {'size':>7} {'list':>5} {'model':>11} "
+        f"{'seconds':>9} {'peak MiB':>9} {'work':>10}"
+    )
+    results: List[Dict] = []
+    for case, run, work in cases(args.sizes, args.list_lengths, args.models, args.algorithms, args.seed):
+        result = {**case, **measure(run, work, args.repeats)}
+        results.append(result)
+        print(
+            f"{result['algorithm']:>20} {result['engine']:>10} {result['size']:>7} "
+            f"{result['list_length']:>5} {result['model']:>11} {result['seconds']:>9.4f} "
+            f"{result['peak_bytes'] / 2**20:>9.1f} {result['work']:>10}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "arguments": vars(args), "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = find_regressions(results, load_baseline(args.baseline), args.threshold)
+        for result, before in regressions:
+            print(
+                f"REGRESSION {', '.join(f'{field}={result[field]}' for field in CASE_FIELDS)}: "
+                f"{before['seconds']:.4f}s -> {result['seconds']:.4f}s"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,354 @@
 # standard imports
-from typing import List, Dict, Tuple
-from numpy.random import default_rng
+from typing import Dict, Iterator, List, Tuple
 
-rng = default_rng()
+# third party imports
+import numpy as np
+from numpy.random import Generator, default_rng
 
+# custom imports
+from algos.preference_table import PreferenceTable
 
-def generate_preference_data(
-    number_of_jobs: int, number_of_employees: int, job_list_length: int
-) -> Tuple[Dict[str, List[str]], dict[str, List[str]]]:
-    make_random_list_of_jobs = lambda: [
-        "j" + str(job)
-        for job in rng.choice(
-            range(1, number_of_jobs + 1), job_list_length, replace=False
+# generator used when no seed is given, created on first use rather than when the module is imported
+rng: Generator | None = None
+
+# upper bound on the number of random keys drawn at once, bounds generator memory (8 bytes per key)
+CHUNK_ELEMENTS: int = 1 << 22
+# in a sparse market, a correlated list is the best of a random pool this many times its length
+SPARSE_POOL_FACTOR: int = 4
+
+
+def _generator(seed: int | None) -> Generator:
+    """A generator seeded with seed, or the module level rng (created on first use) without one."""
+    global rng
+    if seed is not None:
+        return default_rng(seed)
+    if rng is None:
+        rng = default_rng()
+    return rng
+
+
+def _ranked_choices(
+    generator: Generator,
+    number_of_rankers: int,
+    number_of_candidates: int,
+    list_length: int,
+    quality: np.ndarray | None,
+    correlation: float,
+) -> np.ndarray:
+    """
+    Return a (number_of_rankers, list_length) int32 array, row i being the ids of
+    the list_length candidates ranker i likes best, best first. With correlation 0
+    every row is an independent uniformly random ranking. Otherwise each ranker
+    scores candidate c as correlation * quality[c] + (1 - correlation) * noise,
+    so rankers agree more (common values) as correlation approaches 1.
+    """
+    if quality is None and list_length == number_of_candidates:
+        # uniform full-length rankings are just independent permutations of every row
+        return generator.permuted(
+            np.tile(np.arange(number_of_candidates, dtype=np.int32), (number_of_rankers, 1)),
+            axis=1,
         )
-    ]
-    make_random_list_of_employees = lambda: [
-        "e" + str(employee)
-        for employee in rng.choice(
-            range(1, number_of_employees + 1), number_of_employees, replace=False
+
+    keys = generator.random((number_of_rankers, number_of_candidates))
+    if quality is not None:
+        keys *= 1 - correlation
+        keys += correlation * quality
+    # higher score is better, so rank by the negated keys
+    keys = np.negative(keys, out=keys)
+    if list_length < number_of_candidates:
+        top = np.argpartition(keys, list_length - 1, axis=1)[:, :list_length]
+        order = np.argsort(np.take_along_axis(keys, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1).astype(np.int32)
+    return np.argsort(keys, axis=1).astype(np.int32)
+
+
+def generate_preference_chunks(
+    number_of_jobs: int,
+    number_of_employees: int,
+    job_list_length: int,
+    employee_list_length: int | None = None,
+    correlation: float = 0.0,
+    seed: int | None = None,
+    chunk_elements: int = CHUNK_ELEMENTS,
+) -> Iterator[Tuple[str, int, np.ndarray]]:
+    """
+    Generate a random market in chunks, so that markets larger than memory can
+    be streamed to disk (see write_generated_profile). Yields
+    ("employees", first_employee_id, choices) chunks, then ("jobs", first_job_id,
+    choices) chunks, where choices[i] is the ranked list (best first, as ids) of
+    participant first_id + i. Every employee ranks job_list_length jobs, and every
+    job ranks employee_list_length employees (all of them when None).
+
+    correlation (between 0 and 1) controls the preference model: 0 gives
+    independent uniformly random preferences, larger values mix in a common
+    quality score for every participant (see _ranked_choices), so that
+    preferences are correlated as in real markets. The same seed always gives
+    the same market; without a seed the module level rng is used.
+    """
+    if employee_list_length is None:
+        employee_list_length = number_of_employees
+    if not 0 <= job_list_length <= number_of_jobs:
+        raise ValueError(f"job_list_length must be between 0 and {number_of_jobs}")
+    if not 0 <= employee_list_length <= number_of_employees:
+        raise ValueError(f"employee_list_length must be between 0 and {number_of_employees}")
+    if not 0.0 <= correlation <= 1.0:
+        raise ValueError("correlation must be between 0 and 1")
+    generator = _generator(seed)
+
+    job_quality = employee_quality = None
+    if correlation > 0:
+        job_quality = generator.random(number_of_jobs)
+        employee_quality = generator.random(number_of_employees)
+
+    for side, number_of_rankers, number_of_candidates, list_length, quality in (
+        ("employees", number_of_employees, number_of_jobs, job_list_length, job_quality),
+        ("jobs", number_of_jobs, number_of_employees, employee_list_length, employee_quality),
+    ):
+        rows_per_chunk = max(1, chunk_elements // max(1, number_of_candidates))
+        for first in range(0, number_of_rankers, rows_per_chunk):
+            rows = min(rows_per_chunk, number_of_rankers - first)
+            yield side, first, _ranked_choices(
+                generator, rows, number_of_candidates, list_length, quality, correlation
+            )
+
+
+def _names(prefix: str, number: int) -> List[str]:
+    return [prefix + str(i) for i in range(1, number + 1)]
+
+
+def generate_preference_table(
+    number_of_jobs: int,
+    number_of_employees: int,
+    job_list_length: int,
+    employee_list_length: int | None = None,
+    correlation: float = 0.0,
+    seed: int | None = None,
+) -> PreferenceTable:
+    """
+    Generate a random market (see generate_preference_chunks) directly as a
+    compiled PreferenceTable, with employees e1..eN and jobs j1..jM.
+    """
+    if employee_list_length is None:
+        employee_list_length = number_of_employees
+    targets: Dict[str, List[np.ndarray]] = {"employees": [], "jobs": []}
+    for side, _, choices in generate_preference_chunks(
+        number_of_jobs,
+        number_of_employees,
+        job_list_length,
+        employee_list_length,
+        correlation,
+        seed,
+    ):
+        targets[side].append(choices.ravel())
+
+    def csr(chunks: List[np.ndarray], number_of_rankers: int, list_length: int):
+        offsets = np.arange(number_of_rankers + 1, dtype=np.int64) * list_length
+        flat = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+        # memoryviews index to plain ints, which keeps the Python engines fast
+        return memoryview(offsets), memoryview(flat.astype(np.int32))
+
+    employee_offsets, employee_targets = csr(
+        targets["employees"], number_of_employees, job_list_length
+    )
+    job_offsets, job_targets = csr(targets["jobs"], number_of_jobs, employee_list_length)
+    return PreferenceTable(
+        _names("e", number_of_employees),
+        _names("j", number_of_jobs),
+        employee_offsets,
+        employee_targets,
+        job_offsets,
+        job_targets,
+    )
+
+
+def _sample_distinct(
+    generator: Generator,
+    number_of_rankers: int,
+    number_of_candidates: int,
+    sample_size: int,
+) -> np.ndarray:
+    """
+    Return a (number_of_rankers, sample_size) int32 array, each row holding
+    sample_size distinct candidate ids, uniformly random and in uniformly
+    random order, in time proportional to the size of the array. Rows that
+    drew a candidate twice are drawn again, which is rare as long as
+    sample_size ** 2 is small next to number_of_candidates; otherwise the
+    rows are cut from random permutations instead.
+    """
+    if sample_size * sample_size > 2 * number_of_candidates:
+        return _ranked_choices(generator, number_of_rankers, number_of_candidates, sample_size, None, 0.0)
+    sample = generator.integers(0, number_of_candidates, (number_of_rankers, sample_size), dtype=np.int32)
+    while True:
+        ordered = np.sort(sample, axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not repeated.any():
+            return sample
+        sample[repeated] = generator.integers(
+            0, number_of_candidates, (int(repeated.sum()), sample_size), dtype=np.int32
         )
-    ]
-    employee_preferences: Dict[str, List[str]] = {
-        "e" + str(employee): make_random_list_of_jobs()
-        for employee in list(range(1, number_of_employees + 1))
-    }
-    job_preferences: Dict[str, List[str]] = {
-        "j" + str(job): make_random_list_of_employees()
-        for job in list(range(1, number_of_jobs + 1))
-    }
-
-    return employee_preferences, job_preferences
+
+
+def generate_sparse_preference_table(
+    number_of_jobs: int,
+    number_of_employees: int,
+    job_list_length: int,
+    employee_list_length: int | None = None,
+    correlation: float = 0.0,
+    seed: int | None = None,
+) -> PreferenceTable:
+    """
+    Generate a random market of short lists on a huge market, as a compiled
+    PreferenceTable (see PreferenceTable.to_dicts for the dictionary form),
+    in time and memory proportional to the number of listed pairs instead of
+    number_of_jobs * number_of_employees. Every employee ranks job_list_length
+    jobs, and every job ranks only the employees that listed it (the best
+    employee_list_length of them, all of them when None), so every proposal
+    is to a job that ranks the employee unless lists are cut short.
+
+    With correlation 0 an employee's list is a uniformly random ranking of
+    job_list_length jobs. Otherwise an employee ranks the best of a uniformly
+    random pool of SPARSE_POOL_FACTOR * job_list_length jobs (scored as in
+    _ranked_choices), rather than of every job, and jobs score their
+    applicants the same way. The same seed always gives the same market;
+    without a seed the module level rng is used.
+    """
+    if not 0 <= job_list_length <= number_of_jobs:
+        raise ValueError(f"job_list_length must be between 0 and {number_of_jobs}")
+    if employee_list_length is not None and employee_list_length < 0:
+        raise ValueError("employee_list_length must not be negative")
+    if not 0.0 <= correlation <= 1.0:
+        raise ValueError("correlation must be between 0 and 1")
+    generator = _generator(seed)
+
+    if correlation > 0:
+        job_quality = generator.random(number_of_jobs)
+        employee_quality = generator.random(number_of_employees)
+        pool_size = min(number_of_jobs, SPARSE_POOL_FACTOR * job_list_length)
+        choices = np.empty((number_of_employees, job_list_length), dtype=np.int32)
+        rows_per_chunk = max(1, CHUNK_ELEMENTS // max(1, pool_size))
+        for first in range(0, number_of_employees, rows_per_chunk):
+            rows = min(rows_per_chunk, number_of_employees - first)
+            pool = _sample_distinct(generator, rows, number_of_jobs, pool_size)
+            keys = generator.random(pool.shape)
+            keys *= 1 - correlation
+            keys += correlation * job_quality[pool]
+            order = np.argsort(-keys, axis=1)[:, :job_list_length]
+            choices[first : first + rows] = np.take_along_axis(pool, order, axis=1)
+    else:
+        employee_quality = None
+        choices = _sample_distinct(generator, number_of_employees, number_of_jobs, job_list_length)
+
+    # every job ranks its applicants by score, best first
+    applied_to = choices.ravel()
+    applicants = np.repeat(np.arange(number_of_employees, dtype=np.int32), job_list_length)
+    keys = generator.random(len(applied_to))
+    if employee_quality is not None:
+        keys *= 1 - correlation
+        keys += correlation * employee_quality[applicants]
+    order = np.lexsort((-keys, applied_to))
+    job_targets = applicants[order]
+    job_offsets = np.zeros(number_of_jobs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(applied_to, minlength=number_of_jobs), out=job_offsets[1:])
+    if employee_list_length is not None:
+        rank_on_list = np.arange(len(job_targets)) - np.repeat(job_offsets[:-1], np.diff(job_offsets))
+        kept = rank_on_list < employee_list_length
+        job_targets = job_targets[kept]
+        job_offsets[1:] = np.cumsum(np.minimum(np.diff(job_offsets), employee_list_length))
+
+    # memoryviews index to plain ints, which keeps the Python engines fast
+    return PreferenceTable(
+        _names("e", number_of_employees),
+        _names("j", number_of_jobs),
+        memoryview(np.arange(number_of_employees + 1, dtype=np.int64) * job_list_length),
+        memoryview(np.ascontiguousarray(applied_to)),
+        memoryview(job_offsets),
+        memoryview(np.ascontiguousarray(job_targets)),
+    )
+
+
+def write_generated_profile(
+    path: str,
+    number_of_jobs: int,
+    number_of_employees: int,
+    job_list_length: int,
+    employee_list_length: int | None = None,
+    correlation: float = 0.0,
+    seed: int | None = None,
+    chunk_elements: int = CHUNK_ELEMENTS,
+) -> None:
+    """
+    Generate a random market (see generate_preference_chunks) straight into a
+    binary profile (see preference_io.open_binary_profile), one chunk at a
+    time, so the market never has to fit in memory.
+    """
+    # imported here, as preference_io is only needed when writing profiles
+    from preference_io import stream_binary_profile
+
+    if employee_list_length is None:
+        employee_list_length = number_of_employees
+    chunks = generate_preference_chunks(
+        number_of_jobs,
+        number_of_employees,
+        job_list_length,
+        employee_list_length,
+        correlation,
+        seed,
+        chunk_elements,
+    )
+
+    def side_targets(number_of_rankers: int) -> Iterator[np.ndarray]:
+        # employee chunks come first, then job chunks: take chunks until this side is complete
+        written = 0
+        while written < number_of_rankers:
+            _, _, choices = next(chunks)
+            written += len(choices)
+            yield choices.ravel()
+
+    def offsets(number_of_rankers: int, list_length: int) -> Iterator[np.ndarray]:
+        for first in range(0, number_of_rankers + 1, chunk_elements):
+            last = min(first + chunk_elements, number_of_rankers + 1)
+            yield np.arange(first, last, dtype=np.int64) * list_length
+
+    def names() -> Iterator[str]:
+        for i in range(1, number_of_employees + 1):
+            yield "e" + str(i)
+        for i in range(1, number_of_jobs + 1):
+            yield "j" + str(i)
+
+    stream_binary_profile(
+        path,
+        number_of_employees,
+        number_of_jobs,
+        number_of_employees * job_list_length,
+        number_of_jobs * employee_list_length,
+        offsets(number_of_employees, job_list_length),
+        side_targets(number_of_employees),
+        offsets(number_of_jobs, employee_list_length),
+        side_targets(number_of_jobs),
+        names(),
+    )
+
+
+def generate_preference_data(
+    number_of_jobs: int,
+    number_of_employees: int,
+    job_list_length: int,
+    employee_list_length: int | None = None,
+    correlation: float = 0.0,
+    seed: int | None = None,
+) -> Tuple[Dict[str, List[str]], dict[str, List[str]]]:
+    """
+    Generate a random market (see generate_preference_chunks) as employee and
+    job preference dictionaries, with employees e1..eN and jobs j1..jM. Every
+    employee ranks job_list_length jobs, and by default every job ranks every
+    employee.
+    """
+    table = generate_preference_table(
+        number_of_jobs,
+        number_of_employees,
+        job_list_length,
+        employee_list_length,
+        correlation,
+        seed,
+    )
+    return table.to_dicts()
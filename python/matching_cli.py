@@ -0,0 +1,219 @@
+"""
+Command-line runner: matches a market read from preference files with DA or
+TTC, or audits a matching for blocking pairs, for use from job schedulers.
+
+The market is read either from a pair of text files (see preference_io):
+    matching da --employees employees.csv --jobs jobs.csv
+or from a binary profile:
+    matching ttc --profile market.bin --output match.csv
+and the matching is written as CSV, one "employee,job" row per employee
+(after an "employee,job" header), the job cell empty when the employee is
+unmatched. TTC rows are written as the trading cycles are found, employees
+left unmatched at the end; DA rows once the algorithm has finished.
+    matching audit --employees employees.csv --jobs jobs.csv --match match.csv
+writes every blocking pair of a matching in the same format, and exits
+with status 1 if there is any. Bad input (unreadable files, a matching
+naming someone outside the market) exits with status 2. A timing summary
+is printed to stderr.
+
+Only the standard library and PreferenceTable are imported up front. The
+algorithms and readers are imported by the command that needs them, and
+NumPy only on the paths that use it (binary profiles, the audit, the
+parallel DA engine, large text profiles), which keeps the startup cost of
+small runs down.
+
+Run from the python/ directory, or as `matching` once installed:
+    python -m matching_cli da --employees employees.csv --jobs jobs.csv
+"""
+
+# standard imports
+import argparse
+import csv
+import sys
+import time
+from typing import Dict, List, TextIO, Tuple
+
+# custom imports
+from algos.preference_table import PreferenceTable, UNMATCHED
+
+# header row of the matching and blocking pair files
+CSV_HEADER = ("employee", "job")
+
+
+def _load_table(args: argparse.Namespace) -> PreferenceTable:
+    """The market given on the command line, from a binary profile or from text files."""
+    if args.profile is not None:
+        if args.employees is not None or args.jobs is not None:
+            raise ValueError("--profile cannot be combined with --employees and --jobs")
+        from preference_io import open_binary_profile
+
+        return open_binary_profile(args.profile)
+    if args.employees is None or args.jobs is None:
+        raise ValueError("either --profile or both --employees and --jobs are required")
+    from preference_io import load_preference_table
+
+    return load_preference_table(args.employees, args.jobs, args.format)
+
+
+def _open_output(path: str | None) -> TextIO:
+    if path is None or path == "-":
+        return sys.stdout
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def _read_match(path: str, table: PreferenceTable) -> Dict[str, str]:
+    """One-sided match (employee -> job, or to themselves when unmatched) of table from a matching CSV."""
+    one_sided_match: Dict[str, str] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        if next(reader, None) != list(CSV_HEADER):
+            raise ValueError(f"{path} must start with the header {','.join(CSV_HEADER)}")
+        for row in reader:
+            if len(row) != 2:
+                raise ValueError(f"{path}: expected an employee and a job on every row, got {row}")
+            employee, job = row
+            if employee not in table.employee_ids:
+                raise ValueError(f"{path}: unknown employee {employee!r}")
+            if job and job not in table.job_ids:
+                raise ValueError(f"{path}: unknown job {job!r} (matched with {employee!r})")
+            one_sided_match[employee] = job or employee
+    return one_sided_match
+
+
+def _run_match(args: argparse.Namespace, timers: Dict[str, float]) -> Tuple[List[str], int]:
+    """Run da or ttc on the market, writing the matching, and return the summary lines and exit status."""
+    start = time.perf_counter()
+    table = _load_table(args)
+    timers["load"] = time.perf_counter() - start
+    employees, jobs = table.employees, table.jobs
+
+    output = _open_output(args.output)
+    try:
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(CSV_HEADER)
+        start = time.perf_counter()
+        if args.command == "da":
+            from algos.deferred_acceptance import da
+
+            result = da(table, engine=args.engine, instrument=args.stats)
+            timers["match"] = time.perf_counter() - start
+            start = time.perf_counter()
+            writer.writerows(
+                (employees[employee], "" if job == UNMATCHED else jobs[job])
+                for employee, job in enumerate(result.employee_match)
+            )
+        else:
+            from algos.top_trading_cycle import ttc
+
+            def write_cycle(event: str, data: Dict) -> None:
+                if event == "cycle":
+                    writer.writerows(
+                        (employees[employee], jobs[job]) for employee, job in zip(data["employees"], data["jobs"])
+                    )
+
+            result = ttc(table, engine=args.engine, instrument=args.stats, observer=write_cycle)
+            timers["match"] = time.perf_counter() - start
+            start = time.perf_counter()
+            writer.writerows(
+                (employees[employee], "")
+                for employee, job in enumerate(result.employee_match)
+                if job == UNMATCHED
+            )
+        output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    timers["write"] = time.perf_counter() - start
+
+    lines = [
+        f"{args.command} ({args.engine}): {table.number_of_employees} employees, "
+        f"{table.number_of_jobs} jobs, {result.number_matched} matched"
+    ]
+    if args.stats:
+        lines.append("  " + ", ".join(f"{event}={count}" for event, count in result.stats.counts.items() if count))
+    return lines, 0
+
+
+def _run_audit(args: argparse.Namespace, timers: Dict[str, float]) -> Tuple[List[str], int]:
+    """Write every blocking pair of the matching in args.match, and return the summary lines and exit status."""
+    start = time.perf_counter()
+    table = _load_table(args)
+    one_sided_match = _read_match(args.match, table)
+    timers["load"] = time.perf_counter() - start
+
+    from algos.da_utils import find_all_blocking_pairs
+
+    start = time.perf_counter()
+    blocking_pairs = find_all_blocking_pairs(one_sided_match, table)
+    timers["audit"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = _open_output(args.output)
+    try:
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(CSV_HEADER)
+        writer.writerows(blocking_pairs)
+        output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    timers["write"] = time.perf_counter() - start
+    summary = (
+        f"audit: {table.number_of_employees} employees, {table.number_of_jobs} jobs, "
+        f"{len(blocking_pairs)} blocking pairs"
+    )
+    return [summary], 1 if blocking_pairs else 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="matching", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, help in (
+        ("da", "match with deferred acceptance (employee proposing)"),
+        ("ttc", "match with top trading cycles"),
+        ("audit", "list the blocking pairs of a matching"),
+    ):
+        subparser = commands.add_parser(command, help=help, description=help)
+        subparser.add_argument("--employees", help="employee preference file (CSV or JSONL)")
+        subparser.add_argument("--jobs", help="job preference file (CSV or JSONL)")
+        subparser.add_argument("--profile", help="binary preference profile, instead of the text files")
+        subparser.add_argument(
+            "--format", choices=["csv", "jsonl"], help="format of the text files (default: from the extension)"
+        )
+        subparser.add_argument("--output", help="write the CSV here instead of stdout")
+        subparser.add_argument("--quiet", action="store_true", help="don't print the summary to stderr")
+        if command == "audit":
+            subparser.add_argument("--match", required=True, help="matching to audit, as written by da or ttc")
+        else:
+            subparser.add_argument("--engine", default="fast", help="engine to match with (default: fast)")
+            subparser.add_argument(
+                "--stats", action="store_true", help="count the algorithm's events, and add them to the summary"
+            )
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    """Entry point of the matching command, returns the exit status."""
+    start = time.perf_counter()
+    parser = _parser()
+    args = parser.parse_args(argv)
+    timers: Dict[str, float] = {}
+    try:
+        if args.command == "audit":
+            lines, status = _run_audit(args, timers)
+        else:
+            lines, status = _run_match(args, timers)
+    except (OSError, ValueError) as error:
+        parser.exit(2, f"{parser.prog} {args.command}: error: {error}\n")
+    timers["total"] = time.perf_counter() - start
+
+    if not args.quiet:
+        lines.append("  " + "  ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timers.items()))
+        print("\n".join(lines), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
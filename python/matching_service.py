@@ -0,0 +1,506 @@
+"""
+Local matching daemon: keeps compiled markets in memory, so that callers
+pay the parse and compile costs of a market once, and matches them in a
+pool of worker processes, so that the event loop stays responsive.
+
+Requests and responses are newline delimited JSON, over a Unix socket or
+TCP on localhost. Every request carries an id that is echoed back, and
+requests on one connection are served concurrently, so responses can come
+back out of order:
+    {"id": 1, "op": "submit", "market_id": "m1", "employee_preferences": {...}, "job_preferences": {...}}
+    {"id": 2, "op": "submit", "market_id": "m2", "profile": "market.bin"}   (see preference_io)
+    {"id": 3, "op": "match", "market_id": "m1", "algorithm": "da", "engine": "fast"}
+    {"id": 4, "op": "drop", "market_id": "m1"}
+    {"id": 5, "op": "metrics"}
+are answered with {"id": 1, "result": ...} or {"id": 1, "error": "message"}.
+
+Run from the python/ directory:
+    python -m matching_service --socket /tmp/matching.sock
+"""
+
+# standard imports
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Deque, Dict, List, Tuple
+
+# third party imports
+import numpy as np
+
+# custom imports
+from algos.batch import ENGINES, _match_shared_table, _share_table
+from algos.preference_table import PreferenceTable
+from preference_io import open_binary_profile
+
+OPERATIONS = ("submit", "match", "drop", "metrics")
+# longest request or response line, markets are sent whole in a single line
+MAX_MESSAGE_BYTES: int = 1 << 30
+# compiled markets kept in memory, the least recently used one is dropped beyond this
+MAX_MARKETS: int = 64
+# latency percentiles are computed over this many most recent requests of each operation
+LATENCY_WINDOW: int = 1024
+# request lines from this long on are decoded a member at a time (see _decode)
+DECODE_CHUNK_BYTES: int = 1 << 16
+
+
+class ServiceMetrics(object):
+    """
+    Request counters and latencies of a MatchingService. requests[op] and
+    errors count every request served (errors counts failed ones),
+    coalesced counts match requests answered by a match already running,
+    and latencies[op] holds the seconds taken by the most recent requests.
+    """
+
+    def __init__(self):
+        self.started: float = time.perf_counter()
+        self.requests: Dict[str, int] = dict.fromkeys(OPERATIONS, 0)
+        self.errors: int = 0
+        self.coalesced: int = 0
+        self.in_flight: int = 0
+        self.latencies: Dict[str, Deque[float]] = {
+            op: deque(maxlen=LATENCY_WINDOW) for op in OPERATIONS
+        }
+
+    def __repr__(self):
+        return f"ServiceMetrics(requests={sum(self.requests.values())}, errors={self.errors})"
+
+    def record(self, op: str, seconds: float, error: bool = False) -> None:
+        self.requests[op] += 1
+        self.latencies[op].append(seconds)
+        if error:
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The metrics as a JSON friendly dictionary, with throughput in requests per second of uptime."""
+        uptime = time.perf_counter() - self.started
+        latency = {}
+        for op, seconds in self.latencies.items():
+            if seconds:
+                p50, p95 = np.percentile(seconds, [50, 95]).tolist()
+                latency[op] = {
+                    "mean": sum(seconds) / len(seconds),
+                    "p50": p50,
+                    "p95": p95,
+                    "max": max(seconds),
+                }
+        return {
+            "uptime": uptime,
+            "requests": dict(self.requests),
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+            "throughput": sum(self.requests.values()) / uptime if uptime else 0.0,
+            "latency": latency,
+        }
+
+
+class _Market(object):
+    """
+    A cached market: its compiled table and, when matching in worker processes, a copy
+    of its preference arrays in shared memory, released once the market is dropped and
+    no match is using it any more.
+    """
+
+    def __init__(self, table: PreferenceTable, shared: bool):
+        self.table: PreferenceTable = table
+        self.shared_memory: SharedMemory | None = None
+        self.table_shape: Tuple[int, int, int, int] | None = None
+        if shared:
+            self.shared_memory, self.table_shape = _share_table(table)
+        self.users: int = 0
+        self.dropped: bool = False
+
+    def release(self) -> None:
+        if self.dropped and self.users == 0 and self.shared_memory is not None:
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+class MatchingService(object):
+    """
+    Matching daemon (see the module docstring for the protocol). Markets
+    submitted are compiled once, off the event loop, and kept by market id
+    (at most max_markets of them, least recently used dropped first).
+    Matches run in a pool of processes worker processes (os.cpu_count() by
+    default) that read the market from shared memory, or in a thread of
+    this process when processes is 0. Concurrent match requests for the
+    same market, algorithm and engine share a single run.
+
+    handle() serves a single request without any socket, start() listens
+    on a Unix socket (path) or on TCP (host, port, an ephemeral port when
+    0), see address for where it ended up.
+    """
+
+    def __init__(self, processes: int | None = None, max_markets: int = MAX_MARKETS):
+        self.processes: int = (os.cpu_count() or 1) if processes is None else processes
+        self.max_markets: int = max_markets
+        self.metrics: ServiceMetrics = ServiceMetrics()
+        self.address: str | Tuple[str, int] | None = None
+        # market id -> task compiling the market, most recently used last
+        self._markets: OrderedDict[str, asyncio.Task] = OrderedDict()
+        # (market, algorithm, engine) -> task running that match
+        self._matches: Dict[Tuple[_Market, str, str], asyncio.Task] = {}
+        self._pool: ProcessPoolExecutor | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    def __repr__(self):
+        return f"MatchingService(address={self.address!r}, markets={len(self._markets)})"
+
+    async def start(self, path: str | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, path, limit=MAX_MESSAGE_BYTES)
+            self.address = path
+        else:
+            self._server = await asyncio.start_server(self._serve, host, port, limit=MAX_MESSAGE_BYTES)
+            self.address = self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop listening, wait for running matches, and release every market and the worker pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await asyncio.gather(*self._matches.values(), return_exceptions=True)
+        for market_id in list(self._markets):
+            await self._drop(market_id)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Serve one request, returning its response (errors are reported in the response)."""
+        op = request.get("op")
+        response: Dict[str, Any] = {"id": request.get("id")}
+        if op not in OPERATIONS:
+            self.metrics.errors += 1
+            response["error"] = f"Unknown operation {op!r}, expected one of {OPERATIONS}"
+            return response
+        start = time.perf_counter()
+        self.metrics.in_flight += 1
+        try:
+            response["result"] = await getattr(self, f"_{op}")(
+                **{key: value for key, value in request.items() if key not in ("id", "op")}
+            )
+        except Exception as error:
+            response["error"] = f"{type(error).__name__}: {error}"
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record(op, time.perf_counter() - start, "error" in response)
+        return response
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # every request on the connection is served by its own task, responses are written as they finish
+        tasks = set()
+
+        async def respond(line: bytes) -> None:
+            try:
+                request = await asyncio.to_thread(_decode, line)
+            except ValueError as error:
+                response = {"id": None, "error": f"Invalid request: {error}"}
+            else:
+                response = await self.handle(request)
+            writer.write(await asyncio.to_thread(_encode, response))
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _submit(
+        self,
+        market_id: str,
+        employee_preferences: Dict[str, List[str]] | None = None,
+        job_preferences: Dict[str, List[str]] | None = None,
+        profile: str | None = None,
+    ) -> Dict[str, Any]:
+        if profile is None and (employee_preferences is None or job_preferences is None):
+            raise ValueError("Submit either employee_preferences and job_preferences, or a profile")
+        start = time.perf_counter()
+        await self._drop(market_id)
+        # matches asked for while the market compiles wait on this task
+        task = asyncio.create_task(
+            asyncio.to_thread(
+                _compile_market, employee_preferences, job_preferences, profile, self.processes > 0
+            )
+        )
+        self._markets[market_id] = task
+        try:
+            market = await task
+        except Exception:
+            if self._markets.get(market_id) is task:
+                del self._markets[market_id]
+            raise
+        while len(self._markets) > self.max_markets:
+            await self._drop(next(iter(self._markets)))
+        return {
+            "market_id": market_id,
+            "employees": market.table.number_of_employees,
+            "jobs": market.table.number_of_jobs,
+            "seconds": time.perf_counter() - start,
+        }
+
+    async def _match(self, market_id: str, algorithm: str = "da", engine: str = "fast") -> Dict[str, Any]:
+        if algorithm not in ENGINES:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(ENGINES)}")
+        if engine not in ENGINES[algorithm]:
+            raise ValueError(
+                f"Unknown {algorithm.upper()} engine {engine!r}, expected one of {sorted(ENGINES[algorithm])}"
+            )
+        if market_id not in self._markets:
+            raise KeyError(f"Unknown market {market_id!r}")
+        self._markets.move_to_end(market_id)
+        market = await self._markets[market_id]
+        if market.dropped:
+            raise KeyError(f"Market {market_id!r} was dropped")
+
+        key = (market, algorithm, engine)
+        if key in self._matches:
+            self.metrics.coalesced += 1
+        else:
+            # the market is in use from now on, so that dropping it keeps its shared memory until the match is done
+            market.users += 1
+            self._matches[key] = asyncio.create_task(self._run_match(market, algorithm, engine))
+            self._matches[key].add_done_callback(lambda _: self._matches.pop(key, None))
+        # shielded, so that a caller going away doesn't cancel the match for the others waiting on it
+        two_sided_match, one_sided_match = await asyncio.shield(self._matches[key])
+        return {"two_sided_match": two_sided_match, "one_sided_match": one_sided_match}
+
+    async def _run_match(
+        self, market: _Market, algorithm: str, engine: str
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        try:
+            if self.processes == 0:
+                employee_match = await asyncio.to_thread(ENGINES[algorithm][engine], market.table)
+            else:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.processes)
+                employee_match, _, _ = await asyncio.get_running_loop().run_in_executor(
+                    self._pool,
+                    _match_shared_table,
+                    market.shared_memory.name,
+                    market.table_shape,
+                    algorithm,
+                    engine,
+                )
+                employee_match = np.frombuffer(employee_match, dtype=np.int64).tolist()
+        finally:
+            market.users -= 1
+            market.release()
+        return await asyncio.to_thread(market.table.decode_matches, employee_match)
+
+    async def _drop(self, market_id: str) -> bool:
+        task = self._markets.pop(market_id, None)
+        if task is None:
+            return False
+        try:
+            market = await task
+        except Exception:
+            return True
+        market.dropped = True
+        market.release()
+        return True
+
+    async def _metrics(self) -> Dict[str, Any]:
+        return self.metrics.snapshot()
+
+
+def _compile_market(
+    employee_preferences: Dict[str, List[str]] | None,
+    job_preferences: Dict[str, List[str]] | None,
+    profile: str | None,
+    shared: bool,
+) -> _Market:
+    if profile is not None:
+        return _Market(open_binary_profile(profile), shared)
+    return _Market(PreferenceTable.from_dicts(employee_preferences, job_preferences), shared)
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_WHITESPACE_CHARACTERS = " \t\n\r"
+
+
+def _decode(line: bytes) -> Any:
+    """
+    json.loads(line), for a worker thread. json.loads holds the GIL until the
+    whole line is decoded, which stalls the event loop on a large submit even
+    from a thread, so long lines are decoded one member of the request (and
+    of its preference dictionaries) at a time: every preference list is still
+    decoded by the C scanner, and the event loop gets the GIL in between.
+    """
+    if len(line) < DECODE_CHUNK_BYTES:
+        return json.loads(line)
+    text = line.decode("utf-8")
+    value, end = _decode_value(text, _WHITESPACE.match(text).end(), 2)
+    end = _WHITESPACE.match(text, end).end()
+    if end != len(text):
+        raise json.JSONDecodeError("Extra data", text, end)
+    return value
+
+
+def _decode_value(text: str, i: int, depth: int) -> Tuple[Any, int]:
+    """The JSON value at text[i] and the position after it, objects down to depth decoded a member at a time."""
+    if depth == 0 or text[i : i + 1] != "{":
+        try:
+            return _DECODER.scan_once(text, i)
+        except StopIteration as error:
+            raise json.JSONDecodeError("Expecting value", text, error.value) from None
+    # as json.decoder.JSONObject, whitespace is only matched where there is some
+    value: Dict[str, Any] = {}
+    scanstring, whitespace, whitespace_characters = json.decoder.scanstring, _WHITESPACE.match, _WHITESPACE_CHARACTERS
+    i += 1
+    if text[i : i + 1] in whitespace_characters:
+        i = whitespace(text, i).end()
+    if text[i : i + 1] == "}":
+        return value, i + 1
+    while True:
+        if text[i : i + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, i)
+        key, i = scanstring(text, i + 1)
+        if text[i : i + 1] != ":":
+            i = whitespace(text, i).end()
+            if text[i : i + 1] != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, i)
+        i += 1
+        if text[i : i + 1] in whitespace_characters:
+            i = whitespace(text, i).end()
+        value[key], i = _decode_value(text, i, depth - 1)
+        if text[i : i + 1] in whitespace_characters:
+            i = whitespace(text, i).end()
+        if text[i : i + 1] == "}":
+            return value, i + 1
+        if text[i : i + 1] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, i)
+        i += 1
+        if text[i : i + 1] in whitespace_characters:
+            i = whitespace(text, i).end()
+
+
+def _encode(response: Dict[str, Any]) -> bytes:
+    return json.dumps(response, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class MatchingClient(object):
+    """
+    Client of a MatchingService, for use from a running event loop (in the
+    same process as the service, or any other). Requests can be sent
+    concurrently over the one connection. Errors reported by the service
+    are raised as ValueError.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader: asyncio.StreamReader = reader
+        self._writer: asyncio.StreamWriter = writer
+        self._ids = itertools.count()
+        # request id -> future waiting for its response
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._receiver: asyncio.Task = asyncio.create_task(self._receive())
+
+    def __repr__(self):
+        return f"MatchingClient(waiting={len(self._waiting)})"
+
+    @classmethod
+    async def connect(
+        cls, address: str | Tuple[str, int]
+    ) -> "MatchingClient":
+        """Connect to a service at address, a Unix socket path or a (host, port) pair."""
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address, limit=MAX_MESSAGE_BYTES)
+        else:
+            reader, writer = await asyncio.open_connection(*address, limit=MAX_MESSAGE_BYTES)
+        return cls(reader, writer)
+
+    async def _receive(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._waiting.pop(response["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the matching service closed"))
+
+    async def request(self, op: str, **fields) -> Any:
+        """Send one request, returning its result."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(_encode({"id": request_id, "op": op, **fields}))
+        await self._writer.drain()
+        response = await future
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def submit(
+        self,
+        market_id: str,
+        employee_preferences: Dict[str, List[str]] | None = None,
+        job_preferences: Dict[str, List[str]] | None = None,
+        profile: str | None = None,
+    ) -> Dict[str, Any]:
+        if profile is not None:
+            return await self.request("submit", market_id=market_id, profile=profile)
+        return await self.request(
+            "submit",
+            market_id=market_id,
+            employee_preferences=employee_preferences,
+            job_preferences=job_preferences,
+        )
+
+    async def match(
+        self, market_id: str, algorithm: str = "da", engine: str = "fast"
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Match a submitted market, returning the two-sided and one-sided matches as da() / ttc() do."""
+        result = await self.request("match", market_id=market_id, algorithm=algorithm, engine=engine)
+        return result["two_sided_match"], result["one_sided_match"]
+
+    async def drop(self, market_id: str) -> bool:
+        return await self.request("drop", market_id=market_id)
+
+    async def metrics(self) -> Dict[str, Any]:
+        return await self.request("metrics")
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+        await asyncio.gather(self._receiver, return_exceptions=True)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    service = MatchingService(args.processes, args.max_markets)
+    await service.start(args.socket, port=args.port)
+    print(f"Matching service listening on {service.address}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", help="Unix socket path to listen on (default: TCP on localhost)")
+    parser.add_argument("--port", type=int, default=0, help="TCP port, an ephemeral one by default")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, 0 to match in threads")
+    parser.add_argument("--max-markets", type=int, default=MAX_MARKETS, help="compiled markets kept in memory")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,99 @@
+from array import array
+from typing import List
+
+# value stored for a missing edge / the end of an in-edge list
+NO_EDGE: int = -1
+
+
+class PointerGraph(object):
+    """
+    Directed graph in which every node has at most one outgoing edge
+    (a functional graph, like the TTC graph), stored in flat int arrays
+    instead of Node objects and edge sets. Nodes are the ints
+    0..number_of_nodes-1, next[node] is the node it points at (or
+    NO_EDGE), and alive is a bitmap of the nodes still in the graph.
+
+    Since every node has a single outgoing edge, it belongs to exactly
+    one in-edge list (that of the node it points at), so the in-edges
+    are kept as intrusive doubly linked lists threaded through three
+    more int arrays: first_in[node] is the first node pointing at node,
+    and next_in/prev_in link the nodes pointing at the same target.
+    That is a few machine words per node, with O(1) edge updates and
+    in-edge lookups proportional to the number of in-edges.
+    """
+
+    __slots__ = ("next", "alive", "first_in", "next_in", "prev_in", "_number_of_nodes")
+
+    def __init__(self, number_of_nodes: int = 0):
+        self.next = array("i", [NO_EDGE]) * number_of_nodes
+        self.alive = bytearray(b"\x01") * number_of_nodes
+        self.first_in = array("i", [NO_EDGE]) * number_of_nodes
+        self.next_in = array("i", [NO_EDGE]) * number_of_nodes
+        self.prev_in = array("i", [NO_EDGE]) * number_of_nodes
+        self._number_of_nodes: int = number_of_nodes
+
+    def __repr__(self):
+        return (
+            "PointerGraph(\n  "
+            + "\n  ".join(
+                f"{node}: {self.next[node]}"
+                for node in range(len(self.alive))
+                if self.alive[node]
+            )
+            + "\n)"
+        )
+
+    def _unlink(self, s: int):
+        # remove s from the in-edge list of the node it points at
+        t = self.next[s]
+        if t == NO_EDGE:
+            return
+        before, after = self.prev_in[s], self.next_in[s]
+        if before == NO_EDGE:
+            self.first_in[t] = after
+        else:
+            self.next_in[before] = after
+        if after != NO_EDGE:
+            self.prev_in[after] = before
+        self.next[s] = NO_EDGE
+
+    def delete_node(self, node: int):
+        # nodes pointing at a deleted node keep their edge, the caller repoints them (see pointed_at_by)
+        if self.alive[node]:
+            self._unlink(node)
+            self.alive[node] = 0
+            self._number_of_nodes -= 1
+
+    def number_of_nodes_in_graph(self) -> int:
+        return self._number_of_nodes
+
+    def get_random_node(self) -> int | None:
+        for node, alive in enumerate(self.alive):
+            if alive:
+                return node
+
+    def add_edge(self, s: int, t: int):
+        # every node has a single outgoing edge, so this replaces any previous edge from s
+        self._unlink(s)
+        self.next[s] = t
+        head = self.first_in[t]
+        self.next_in[s] = head
+        self.prev_in[s] = NO_EDGE
+        if head != NO_EDGE:
+            self.prev_in[head] = s
+        self.first_in[t] = s
+
+    def get_next_node(self, node: int) -> int:
+        return self.next[node]
+
+    def degree_outgoing(self, node: int) -> int:
+        return int(self.next[node] != NO_EDGE)
+
+    def pointed_at_by(self, node: int) -> List[int]:
+        """Return the nodes still in the graph that currently point at node."""
+        sources: List[int] = []
+        s = self.first_in[node]
+        while s != NO_EDGE:
+            sources.append(s)
+            s = self.next_in[s]
+        return sources
@@ -0,0 +1,398 @@
+"""
+Reading and writing preference profiles.
+
+Text files (streamed straight into a PreferenceTable) hold the preference
+lists of one side of the market, one participant per line:
+    CSV:   e1,j2,j1          (name, then preferences in order)
+    JSONL: {"name": "e1", "preferences": ["j2", "j1"]}
+
+Binary profiles hold a whole compiled PreferenceTable in one file that is
+opened with numpy.memmap, so nothing is parsed or copied up front:
+    header      BINARY_HEADER (magic, version, section sizes)
+    sections    employee_offsets int64[E + 1], employee_targets int32[Le],
+                job_offsets int64[J + 1], job_targets int32[Lj],
+                names (utf-8, newline separated: employees then jobs)
+every section starting on an 8 byte boundary, all little-endian.
+"""
+
+# standard imports
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# third party imports
+if TYPE_CHECKING:
+    import numpy as np
+
+# custom imports
+from algos.preference_table import PreferenceTable, compile_preferences
+
+FORMATS = ("csv", "jsonl")
+
+# magic, version, number of employees, number of jobs, employee list entries, job list entries, name bytes
+BINARY_HEADER = struct.Struct("<8sI4xqqqqq")
+BINARY_MAGIC = b"PREFTBL\x00"
+BINARY_VERSION = 1
+# text profiles with at least this many employee list entries have their job ids remapped with
+# NumPy (imported only then), smaller ones in Python, which is quicker than importing NumPy
+NUMPY_REMAP_ENTRIES: int = 1 << 20
+
+# progress(side, lines_read, bytes_read, total_bytes), called after every chunk
+ProgressCallback = Callable[[str, int, int, int], None]
+
+
+def print_progress(side: str, lines_read: int, bytes_read: int, total_bytes: int) -> None:
+    """Progress callback that reports to stderr."""
+    percent = 100 * bytes_read / total_bytes if total_bytes else 100
+    print(
+        f"{side}: {lines_read} lines ({bytes_read / 1e6:.1f} / {total_bytes / 1e6:.1f} MB, {percent:.0f}%)",
+        file=sys.stderr,
+    )
+
+
+def infer_format(path: str, format: str | None = None) -> str:
+    """Return format if given, otherwise infer it from the file extension."""
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip(".").lower()
+    if format not in FORMATS:
+        raise ValueError(
+            f"Unknown preference file format {format!r} for {path}, expected one of {FORMATS}"
+        )
+    return format
+
+
+def _iter_records(path: str, format: str | None = None) -> Iterator[Tuple[str, List[str], int]]:
+    """Stream (name, preference list, bytes read so far) from a preference file, one line at a time."""
+    format = infer_format(path, format)
+    bytes_read = 0
+    with open(path, "rb") as f:
+        if format == "jsonl":
+            for raw in f:
+                bytes_read += len(raw)
+                if raw.strip():
+                    record = json.loads(raw)
+                    yield record["name"], record["preferences"], bytes_read
+        else:
+            lines = (raw.decode("utf-8") for raw in f)
+            for row in csv.reader(lines):
+                bytes_read = f.tell()
+                if row:
+                    # skip empty trailing cells, e.g. from rows padded to the same width
+                    yield row[0], [name for name in row[1:] if name], bytes_read
+
+
+def iter_preference_records(
+    path: str, format: str | None = None
+) -> Iterator[Tuple[str, List[str]]]:
+    """Stream (name, preference list) from a preference file, one line at a time."""
+    for name, preferences, _ in _iter_records(path, format):
+        yield name, preferences
+
+
+def _iter_chunks(
+    path: str,
+    format: str | None,
+    chunk_size: int,
+    side: str,
+    progress: ProgressCallback | None,
+) -> Iterator[List[Tuple[str, List[str], int]]]:
+    # read chunk_size records at a time, reporting progress after every chunk
+    total_bytes = os.path.getsize(path)
+    records = _iter_records(path, format)
+    lines_read = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+        lines_read += len(chunk)
+        if progress is not None:
+            progress(side, lines_read, chunk[-1][2], total_bytes)
+
+
+def load_preference_table(
+    employee_path: str,
+    job_path: str,
+    format: str | None = None,
+    chunk_size: int = 10000,
+    progress: ProgressCallback | None = None,
+) -> PreferenceTable:
+    """
+    Stream the employee and job preference files straight into a compiled
+    PreferenceTable, interning names as they are read, without ever
+    building the preference dictionaries. Files are read chunk_size lines
+    at a time, and progress (see ProgressCallback) is called after every
+    chunk. The result is the same table PreferenceTable.from_dicts builds
+    from the same preferences: employees and jobs are numbered in file
+    order, followed by jobs that only appear on employees' lists, and
+    employees that only appear on jobs' lists are dropped.
+    """
+    employees: List[str] = []
+    employee_ids: Dict[str, int] = {}
+    # jobs are provisionally numbered in the order they are first seen on employees' lists
+    jobs: List[str] = []
+    job_ids: Dict[str, int] = {}
+
+    employee_offsets = array("q", [0])
+    employee_targets = array("i")
+    for chunk in _iter_chunks(employee_path, format, chunk_size, "employees", progress):
+        buffer: List[int] = []
+        for name, preferences, _ in chunk:
+            if name in employee_ids:
+                raise ValueError(f"Employee {name!r} is listed twice in {employee_path}")
+            employee_ids[name] = len(employees)
+            employees.append(name)
+            for job in preferences:
+                job_id = job_ids.get(job)
+                if job_id is None:
+                    job_id = job_ids[job] = len(jobs)
+                    jobs.append(job)
+                buffer.append(job_id)
+            employee_offsets.append(len(employee_targets) + len(buffer))
+        employee_targets.extend(buffer)
+
+    # provisional ids of the jobs in the job file, in file order
+    listed_jobs: List[int] = []
+    job_offsets = array("q", [0])
+    job_targets = array("i")
+    for chunk in _iter_chunks(job_path, format, chunk_size, "jobs", progress):
+        buffer = []
+        for name, preferences, _ in chunk:
+            job_id = job_ids.get(name)
+            if job_id is None:
+                job_id = job_ids[name] = len(jobs)
+                jobs.append(name)
+            listed_jobs.append(job_id)
+            buffer.extend(
+                employee_ids[employee] for employee in preferences if employee in employee_ids
+            )
+            job_offsets.append(len(job_targets) + len(buffer))
+        job_targets.extend(buffer)
+    if len(set(listed_jobs)) != len(listed_jobs):
+        raise ValueError(f"A job is listed twice in {job_path}")
+
+    # renumber jobs: jobs in job file order, then jobs only seen on employees' lists (with empty lists)
+    is_listed = bytearray(len(jobs))
+    for job in listed_jobs:
+        is_listed[job] = 1
+    order = listed_jobs + [job for job in range(len(jobs)) if not is_listed[job]]
+    new_job_id = array("i", bytes(4 * len(jobs)))
+    for new_id, job in enumerate(order):
+        new_job_id[job] = new_id
+    if len(employee_targets) < NUMPY_REMAP_ENTRIES:
+        employee_targets = array("i", map(new_job_id.__getitem__, employee_targets))
+    else:
+        import numpy as np
+
+        # remap the employee side in place, chunk by chunk, so memory stays bounded
+        targets = np.frombuffer(employee_targets, dtype=np.int32)
+        new_job_ids = np.frombuffer(new_job_id, dtype=np.int32)
+        for start in range(0, len(targets), chunk_size):
+            targets[start : start + chunk_size] = new_job_ids[targets[start : start + chunk_size]]
+        del targets
+    jobs = [jobs[job] for job in order]
+    job_offsets.extend([len(job_targets)] * (len(jobs) - len(listed_jobs)))
+
+    return PreferenceTable(
+        employees, jobs, employee_offsets, employee_targets, job_offsets, job_targets
+    )
+
+
+def write_preference_file(
+    path: str,
+    preferences: Dict[str, Sequence[str]] | Iterable[Tuple[str, Sequence[str]]],
+    format: str | None = None,
+) -> None:
+    """Write preference lists (a dictionary, or an iterable of (name, preference list)) to a CSV or JSONL file."""
+    format = infer_format(path, format)
+    records = preferences.items() if isinstance(preferences, dict) else preferences
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if format == "jsonl":
+            for name, choices in records:
+                f.write(json.dumps({"name": name, "preferences": list(choices)}) + "\n")
+        else:
+            writer = csv.writer(f)
+            for name, choices in records:
+                writer.writerow([name, *choices])
+
+
+def _aligned(position: int) -> int:
+    return (position + 7) // 8 * 8
+
+
+def _binary_sections(
+    number_of_employees: int,
+    number_of_jobs: int,
+    employee_entries: int,
+    job_entries: int,
+) -> List[Tuple[int, type, int]]:
+    # (byte offset, dtype, length) of each array section, and the start of the name table
+    import numpy as np
+
+    sections = []
+    position = BINARY_HEADER.size
+    for dtype, length in (
+        (np.int64, number_of_employees + 1),
+        (np.int32, employee_entries),
+        (np.int64, number_of_jobs + 1),
+        (np.int32, job_entries),
+    ):
+        position = _aligned(position)
+        sections.append((position, dtype, length))
+        position += np.dtype(dtype).itemsize * length
+    sections.append((_aligned(position), np.uint8, 0))
+    return sections
+
+
+def write_binary_profile(
+    path: str,
+    employee_preferences: Dict[str, List[str]] | PreferenceTable,
+    job_preferences: Dict[str, List[str]] | None = None,
+) -> None:
+    """
+    Write a preference profile (the preference dictionaries, e.g. from
+    data_generator.generate_preference_data, or a PreferenceTable, e.g.
+    from load_preference_table) as a binary profile that open_binary_profile
+    can memory map. Names may not contain newlines.
+    """
+    import numpy as np
+
+    table = compile_preferences(employee_preferences, job_preferences)
+    stream_binary_profile(
+        path,
+        table.number_of_employees,
+        table.number_of_jobs,
+        len(table.employee_targets),
+        len(table.job_targets),
+        [np.asarray(table.employee_offsets, dtype=np.int64)],
+        [np.asarray(table.employee_targets, dtype=np.int32)],
+        [np.asarray(table.job_offsets, dtype=np.int64)],
+        [np.asarray(table.job_targets, dtype=np.int32)],
+        table.employees + table.jobs,
+    )
+
+
+def stream_binary_profile(
+    path: str,
+    number_of_employees: int,
+    number_of_jobs: int,
+    employee_entries: int,
+    job_entries: int,
+    employee_offsets: Iterable["np.ndarray"],
+    employee_targets: Iterable["np.ndarray"],
+    job_offsets: Iterable["np.ndarray"],
+    job_targets: Iterable["np.ndarray"],
+    names: Iterable[str],
+) -> None:
+    """
+    Write a binary profile section by section, from chunks of each array
+    (concatenated in order) and the names (employees, then jobs), so that
+    profiles larger than memory can be written as they are produced. The
+    sizes of the market and of both sides' preference arrays must be known
+    up front; the chunks are checked against them.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Binary preference profiles are only supported on little-endian machines")
+    import numpy as np
+
+    sections = _binary_sections(number_of_employees, number_of_jobs, employee_entries, job_entries)
+    arrays = [employee_offsets, employee_targets, job_offsets, job_targets]
+
+    with open(path, "wb") as f:
+        f.write(b"\x00" * BINARY_HEADER.size)
+        for (offset, dtype, length), chunks in zip(sections, arrays):
+            f.write(b"\x00" * (offset - f.tell()))
+            written = 0
+            for chunk in chunks:
+                chunk = np.asarray(chunk, dtype=dtype)
+                f.write(chunk.tobytes())
+                written += len(chunk)
+            if written != length:
+                raise ValueError(f"Expected {length} values in a binary profile section, got {written}")
+
+        f.write(b"\x00" * (sections[4][0] - f.tell()))
+        name_length = 0
+        number_of_names = 0
+        for name in names:
+            if "\n" in name:
+                raise ValueError("Names in a binary preference profile may not contain newlines")
+            encoded = (name if number_of_names == 0 else "\n" + name).encode("utf-8")
+            f.write(encoded)
+            name_length += len(encoded)
+            number_of_names += 1
+        if number_of_names != number_of_employees + number_of_jobs:
+            raise ValueError(
+                f"Expected {number_of_employees + number_of_jobs} names in a binary profile, got {number_of_names}"
+            )
+
+        # now that the length of the name table is known, write the header
+        f.seek(0)
+        f.write(
+            BINARY_HEADER.pack(
+                BINARY_MAGIC,
+                BINARY_VERSION,
+                number_of_employees,
+                number_of_jobs,
+                employee_entries,
+                job_entries,
+                name_length,
+            )
+        )
+
+
+def open_binary_profile(path: str) -> PreferenceTable:
+    """
+    Open a binary profile written by write_binary_profile. The preference
+    arrays are zero-copy views of a read-only numpy.memmap of the file, so
+    opening is near-instant and the operating system pages data in lazily
+    as the algorithms touch it; only the name table is decoded up front.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Binary preference profiles are only supported on little-endian machines")
+    import numpy as np
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(data) < BINARY_HEADER.size:
+        raise ValueError(f"{path} is not a binary preference profile")
+    (
+        magic,
+        version,
+        number_of_employees,
+        number_of_jobs,
+        employee_entries,
+        job_entries,
+        name_length,
+    ) = BINARY_HEADER.unpack(data[: BINARY_HEADER.size].tobytes())
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{path} is not a version {BINARY_VERSION} binary preference profile")
+
+    sections = _binary_sections(number_of_employees, number_of_jobs, employee_entries, job_entries)
+    # memoryviews index to plain ints (fast in the Python engines), and np.asarray on them is zero-copy
+    employee_offsets, employee_targets, job_offsets, job_targets = (
+        memoryview(np.frombuffer(data, dtype=dtype, count=length, offset=offset))
+        for offset, dtype, length in sections[:4]
+    )
+    name_offset = sections[4][0]
+    names = (
+        data[name_offset : name_offset + name_length].tobytes().decode("utf-8").split("\n")
+        if number_of_employees + number_of_jobs
+        else []
+    )
+    return PreferenceTable(
+        names[:number_of_employees],
+        names[number_of_employees:],
+        employee_offsets,
+        employee_targets,
+        job_offsets,
+        job_targets,
+    )
+
+
+def binary_profile_to_dicts(path: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Read a binary profile back into the (employee_preferences, job_preferences) dictionary form."""
+    return open_binary_profile(path).to_dicts()
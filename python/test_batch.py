@@ -0,0 +1,78 @@
+# standard imports
+import os
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+
+# custom imports
+import data_generator
+from algos.batch import run_batch
+from algos.deferred_acceptance import da
+from algos.preference_table import PreferenceTable
+from algos.top_trading_cycle import ttc
+
+
+INSTANCES = [
+    data_generator.generate_preference_data(30, 40, 5, seed=seed, employee_list_length=20)
+    for seed in range(6)
+]
+
+
+class TestBatch(TestCase):
+    """Test that batches of instances are matched exactly as they would be one at a time."""
+
+    @parameterized.expand(
+        [
+            ("da", da, 1, 0),
+            ("da", da, 2, 0),
+            ("ttc", ttc, 2, 0),
+            # small instances stay in the calling process, even with a pool
+            ("da", da, 2, 10**9),
+        ]
+    )
+    def test_same_as_one_at_a_time(self, algorithm, match, processes, serial_threshold) -> None:
+        """Check that every instance comes back once, with the matching da() / ttc() returns for it."""
+        instances = [*INSTANCES[:3], PreferenceTable.from_dicts(*INSTANCES[3]), *INSTANCES[4:]]
+        results = list(
+            run_batch(instances, algorithm, processes=processes, serial_threshold=serial_threshold)
+        )
+        self.assertListEqual(sorted(result.index for result in results), list(range(len(INSTANCES))))
+        for result in results:
+            two_sided_match, one_sided_match = match(*INSTANCES[result.index], "fast")
+            self.assertDictEqual(result.two_sided_match, two_sided_match)
+            self.assertDictEqual(result.one_sided_match, one_sided_match)
+            self.assertGreaterEqual(result.seconds, result.match_seconds)
+            if processes == 1 or serial_threshold:
+                self.assertIsNone(result.worker)
+            else:
+                self.assertNotEqual(result.worker, os.getpid())
+
+    def test_instance_shapes(self) -> None:
+        """Check that any pair of dictionaries is an instance, and that anything else raises a TypeError."""
+        instances = [list(INSTANCES[0]), (preferences for preferences in INSTANCES[1])]
+        results = sorted(run_batch(instances, processes=1), key=lambda result: result.index)
+        for result, instance in zip(results, INSTANCES):
+            self.assertDictEqual(result.one_sided_match, da(*instance, "fast")[1])
+        for instance in (INSTANCES[0][0], [INSTANCES[0][0]], 42):
+            with self.assertRaises(TypeError):
+                next(run_batch([instance], processes=1))
+
+    def test_stop_early(self) -> None:
+        """Check that a batch that is not read to the end leaves no shared memory behind."""
+        before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        batch = run_batch(INSTANCES * 4, processes=2, serial_threshold=0)
+        next(batch)
+        batch.close()
+        if os.path.isdir("/dev/shm"):
+            self.assertSetEqual(set(os.listdir("/dev/shm")) - before, set())
+
+    def test_unknown_engine(self) -> None:
+        """Check that an unknown algorithm or engine raises a ValueError before anything is matched."""
+        with self.assertRaises(ValueError):
+            next(run_batch(INSTANCES, "ttc", "parallel"))
+        with self.assertRaises(ValueError):
+            next(run_batch(INSTANCES, "boston"))
+
+
+if __name__ == "__main__":
+    unittest.main()
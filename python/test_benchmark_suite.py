@@ -0,0 +1,68 @@
+# standard imports
+import json
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from typing import Dict
+
+# custom imports
+from benchmarks.suite import find_regressions, load_baseline
+
+
+def result(engine: str, seconds: float) -> Dict:
+    return {
+        "algorithm": "da", "engine": engine, "size": 500, "list_length": 10, "model": "uniform", "seconds": seconds
+    }
+
+
+class TestBenchmarkSuite(TestCase):
+    """Test comparing benchmark results against a saved baseline."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.baseline_path = os.path.join(self.directory.name, "baseline.json")
+        # as written by --output
+        with open(self.baseline_path, "w") as f:
+            json.dump(
+                {
+                    "environment": {},
+                    "arguments": {},
+                    "results": [result("reference", 1.0), result("fast", 0.2), result("parallel", 0.5)],
+                },
+                f,
+            )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_find_regressions(self):
+        baseline = load_baseline(self.baseline_path)
+        self.assertEqual(len(baseline), 3)
+        results = [
+            # 30% slower, beyond the 25% threshold
+            result("reference", 1.3),
+            # 20% slower, within the threshold
+            result("fast", 0.24),
+            # faster
+            result("parallel", 0.1),
+            # not in the baseline, however slow
+            result("numba", 100.0),
+        ]
+        regressions = find_regressions(results, baseline, 0.25)
+        self.assertEqual(regressions, [(results[0], baseline[0])])
+
+        # a tighter threshold catches the smaller slowdown too, a looser one neither
+        self.assertEqual(
+            [before["engine"] for _, before in find_regressions(results, baseline, 0.1)], ["reference", "fast"]
+        )
+        self.assertEqual(find_regressions(results, baseline, 0.5), [])
+
+    def test_cases_are_matched_on_every_field(self):
+        baseline = load_baseline(self.baseline_path)
+        other_model = {**result("reference", 10.0), "model": "correlated"}
+        self.assertEqual(find_regressions([other_model], baseline, 0.25), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
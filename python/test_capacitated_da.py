@@ -0,0 +1,114 @@
+# standard imports
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.capacitated_da import capacitated_da
+from algos.da_utils import find_all_blocking_pairs, is_stable
+from algos.deferred_acceptance import da
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 60, 5),
+    data_generator.generate_preference_data(50, 100, 10),
+    data_generator.generate_preference_data(10, 100, 10),
+    data_generator.generate_preference_data(100, 50, 25),
+    data_generator.generate_preference_data(30, 300, 10, correlation=0.7),
+]
+
+
+class TestCapacitatedDeferredAcceptance(TestCase):
+    """Test many-to-one deferred acceptance and its stability check."""
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_unit_capacities_match_da(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that with one opening per job, capacitated DA returns exactly what da() does."""
+        two_sided_match, one_sided_match = capacitated_da(employee_preferences, job_preferences)
+        self.assertDictEqual(one_sided_match, da(employee_preferences, job_preferences)[1])
+        for job in job_preferences:
+            self.assertLessEqual(len(two_sided_match.get(job, [])), 1)
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_same_as_cloned_jobs(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check the result against da() on the market where every job is cloned once per opening."""
+        capacities = {job: 1 + i % 4 for i, job in enumerate(job_preferences)}
+        two_sided_match, one_sided_match = capacitated_da(
+            employee_preferences, job_preferences, capacities
+        )
+
+        cloned_employee_preferences = {
+            employee: [f"{job}_{k}" for job in jobs for k in range(capacities[job])]
+            for employee, jobs in employee_preferences.items()
+        }
+        cloned_job_preferences = {
+            f"{job}_{k}": employees
+            for job, employees in job_preferences.items()
+            for k in range(capacities[job])
+        }
+        _, cloned_match = da(cloned_employee_preferences, cloned_job_preferences)
+        self.assertDictEqual(
+            one_sided_match,
+            {
+                employee: job if job == employee else job.rsplit("_", 1)[0]
+                for employee, job in cloned_match.items()
+            },
+        )
+
+        for job in job_preferences:
+            self.assertLessEqual(len(two_sided_match.get(job, [])), capacities[job])
+        self.assertListEqual(
+            find_all_blocking_pairs(
+                one_sided_match, employee_preferences, job_preferences, capacities
+            ),
+            [],
+        )
+
+    def test_capacitated_blocking_pairs(self) -> None:
+        """Check that the stability check takes openings into account."""
+        employee_preferences = {"e1": ["j1", "j2"], "e2": ["j1", "j2"], "e3": ["j1", "j2"]}
+        job_preferences = {"j1": ["e3", "e2", "e1"], "j2": ["e1", "e2", "e3"]}
+        capacities = {"j1": 2}
+        two_sided_match, one_sided_match, stats = capacitated_da(
+            employee_preferences, job_preferences, capacities, instrument=True
+        )
+        # e1 and e2 fill j1, e3 replaces e1 (j1's worst), e1 moves on to j2
+        self.assertDictEqual(one_sided_match, {"e1": "j2", "e2": "j1", "e3": "j1"})
+        self.assertListEqual(two_sided_match["j1"], ["e2", "e3"])
+        self.assertEqual((stats.proposals, stats.rejections, stats.bumps), (4, 0, 1))
+        self.assertTrue(
+            is_stable(one_sided_match, employee_preferences, job_preferences, capacities=capacities)
+        )
+
+        # j1 has a free opening that e1 wants, and with a single opening, j1 prefers e3 to e2
+        unstable_match = {"e1": "j2", "e2": "j1", "e3": "j2"}
+        self.assertListEqual(
+            find_all_blocking_pairs(unstable_match, employee_preferences, job_preferences, capacities),
+            [("e1", "j1"), ("e3", "j1")],
+        )
+        self.assertListEqual(
+            find_all_blocking_pairs(unstable_match, employee_preferences, job_preferences),
+            [("e3", "j1")],
+        )
+        self.assertFalse(
+            is_stable(unstable_match, employee_preferences, job_preferences, capacities=capacities)
+        )
+
+    def test_negative_capacity(self) -> None:
+        """Check that a negative capacity raises a ValueError."""
+        with self.assertRaises(ValueError):
+            capacitated_da({"e1": ["j1"]}, {"j1": ["e1"]}, {"j1": -1})
+
+
+if __name__ == "__main__":
+    unittest.main()
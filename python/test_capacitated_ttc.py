@@ -0,0 +1,81 @@
+# standard imports
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.capacitated_ttc import capacitated_ttc
+from algos.top_trading_cycle import ttc
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 60, 5),
+    data_generator.generate_preference_data(50, 100, 10),
+    data_generator.generate_preference_data(10, 100, 10, 30),
+    data_generator.generate_preference_data(100, 50, 25),
+    data_generator.generate_preference_data(30, 300, 10, correlation=0.7),
+]
+
+
+class TestCapacitatedTopTradingCycle(TestCase):
+    """Test school choice style TTC with job openings."""
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_unit_capacities_match_ttc(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that with one opening per job, capacitated TTC returns exactly what ttc() does."""
+        _, one_sided_match = capacitated_ttc(employee_preferences, job_preferences)
+        self.assertDictEqual(one_sided_match, ttc(employee_preferences, job_preferences)[1])
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_same_as_cloned_jobs(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check the result against ttc() on the market where every job is cloned once per opening."""
+        capacities = {job: i % 4 for i, job in enumerate(job_preferences)}
+        two_sided_match, one_sided_match = capacitated_ttc(
+            employee_preferences, job_preferences, capacities
+        )
+
+        cloned_employee_preferences = {
+            employee: [f"{job}_{k}" for job in jobs for k in range(capacities[job])]
+            for employee, jobs in employee_preferences.items()
+        }
+        cloned_job_preferences = {
+            f"{job}_{k}": employees
+            for job, employees in job_preferences.items()
+            for k in range(capacities[job])
+        }
+        _, cloned_match = ttc(cloned_employee_preferences, cloned_job_preferences)
+        self.assertDictEqual(
+            one_sided_match,
+            {
+                employee: job if job == employee else job.rsplit("_", 1)[0]
+                for employee, job in cloned_match.items()
+            },
+        )
+        for job in job_preferences:
+            self.assertLessEqual(len(two_sided_match.get(job, [])), capacities[job])
+
+    def test_openings(self) -> None:
+        """Check that a job stays in the graph until its openings are filled."""
+        employee_preferences = {"e1": ["j1", "j2"], "e2": ["j1", "j2"], "e3": ["j1", "j2"]}
+        job_preferences = {"j1": ["e3", "e2", "e1"], "j2": ["e1", "e2", "e3"]}
+        two_sided_match, one_sided_match, stats = capacitated_ttc(
+            employee_preferences, job_preferences, {"j1": 2}, instrument=True
+        )
+        # j1 points at e3, then e2, who both point at j1; e1 takes j2
+        self.assertDictEqual(one_sided_match, {"e1": "j2", "e2": "j1", "e3": "j1"})
+        self.assertListEqual(two_sided_match["j1"], ["e2", "e3"])
+        self.assertListEqual(stats.cycle_lengths, [1, 1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
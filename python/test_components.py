@@ -0,0 +1,75 @@
+# standard imports
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import Dict, List, Tuple
+
+# custom imports
+import data_generator
+from algos.components import find_components, match_components
+from algos.deferred_acceptance import DA_ENGINES, da
+from algos.preference_table import PreferenceTable
+from algos.top_trading_cycle import TTC_ENGINES, ttc
+from benchmarks.fuzz import random_market
+
+
+def regional_market(regions: int, size: int, list_length: int) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """A market made of regions disconnected sub-markets, interleaved so that no region is numbered contiguously."""
+    markets = [data_generator.generate_preference_data(size, size, list_length, seed=r) for r in range(regions)]
+    employee_preferences: Dict[str, List[str]] = {}
+    job_preferences: Dict[str, List[str]] = {}
+    for i in range(size):
+        for r, (employees, jobs) in enumerate(markets):
+            employee, job = f"e{i + 1}", f"j{i + 1}"
+            employee_preferences[f"r{r}{employee}"] = [f"r{r}{j}" for j in employees[employee]]
+            job_preferences[f"r{r}{job}"] = [f"r{r}{e}" for e in jobs[job]]
+    return employee_preferences, job_preferences
+
+
+class TestComponents(TestCase):
+    """Test matching a market one connected component at a time."""
+
+    def test_find_components(self):
+        table = PreferenceTable.from_dicts(
+            {"e1": ["j2"], "e2": ["j1"], "e3": [], "e4": ["j3"]},
+            {"j1": ["e2"], "j2": ["e4", "e1"], "j3": [], "j4": []},
+        )
+        component, number_of_components = find_components(table)
+        # nodes: e1..e4 are 0..3, j1..j4 are 4..7
+        self.assertEqual(component.tolist(), [0, 1, 2, 0, 1, 0, 0, 3])
+        self.assertEqual(number_of_components, 4)
+
+    @parameterized.expand(
+        [[algorithm, engine] for engine in DA_ENGINES for algorithm in ["da"]]
+        + [[algorithm, engine] for engine in TTC_ENGINES for algorithm in ["ttc"]]
+    )
+    def test_regional_market(self, algorithm: str, engine: str):
+        employee_preferences, job_preferences = regional_market(5, 20, 4)
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        self.assertEqual(find_components(table)[1], 5)
+        expected = {"da": da, "ttc": ttc}[algorithm](table, engine=engine)
+        for processes, serial_threshold in [(1, 0), (2, 0), (2, 10**9)]:
+            result = match_components(
+                table, algorithm=algorithm, engine=engine, processes=processes, serial_threshold=serial_threshold
+            )
+            self.assertEqual(result, expected)
+
+    def test_random_markets(self):
+        """Split and merged runs match whole market runs on the shapes the fuzzing harness generates."""
+        for seed in range(60):
+            market, _ = random_market(seed, max_size=15)
+            for algorithm, match, engines in (("da", da, DA_ENGINES), ("ttc", ttc, TTC_ENGINES)):
+                for engine in engines:
+                    self.assertEqual(
+                        match_components(*market, algorithm=algorithm, engine=engine, processes=1),
+                        match(*market, engine=engine),
+                        f"seed {seed}, {algorithm} {engine}",
+                    )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            match_components({"e1": ["j1"]}, {"j1": ["e1"]}, algorithm="ttc", engine="parallel")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,68 +6,71 @@ from typing import List, Dict
 
 # custom imports
 import data_generator
-from algos.da_utils import find_blocking_pairs
-from algos.deferred_acceptance import da
+from algos.da_utils import find_all_blocking_pairs, find_blocking_pairs, is_stable
+from algos.deferred_acceptance import DA_ENGINES, da
+from algos.parallel_da import parallel_da
+from algos.preference_table import PreferenceTable
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(100, 100, 10),
+    data_generator.generate_preference_data(100, 10, 10),
+    data_generator.generate_preference_data(10, 100, 10),
+    data_generator.generate_preference_data(100, 100, 5),
+    data_generator.generate_preference_data(100, 100, 100),
+    data_generator.generate_preference_data(10, 10, 10),
+    data_generator.generate_preference_data(5, 5, 5),
+    data_generator.generate_preference_data(1000, 500, 50),
+    data_generator.generate_preference_data(100, 1000, 50),
+    data_generator.generate_preference_data(100, 1000, 5),
+    data_generator.generate_preference_data(100, 1000, 25),
+    data_generator.generate_preference_data(500, 500, 25),
+    data_generator.generate_preference_data(50, 50, 25),
+    data_generator.generate_preference_data(5000, 500, 50),
+    data_generator.generate_preference_data(3000, 3000, 20),
+    [
+        {
+            "e1": ["j2", "j3", "j4", "j5", "j6", "j1"],
+            "e2": ["j3", "j4", "j5", "j6", "j1", "j2"],
+            "e3": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e4": ["j5", "j6", "j1", "j2", "j3", "j4"],
+            "e5": ["j4", "j1", "j2", "j3", "j5", "j6"],
+            "e6": ["j6", "j1", "j2", "j3", "j4", "j5"],
+        },
+        {
+            "j1": ["e1"],
+            "j2": ["e2"],
+            "j3": ["e3"],
+            "j4": ["e4"],
+            "j5": ["e5"],
+            "j6": ["e6"],
+        },
+    ],
+    [
+        {
+            "e1": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e2": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e3": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e4": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e5": ["j1", "j2", "j3", "j4", "j5", "j6"],
+            "e6": ["j1", "j2", "j3", "j4", "j5", "j6"],
+        },
+        {
+            "j1": ["e1"],
+            "j2": ["e2"],
+            "j3": ["e3"],
+            "j4": ["e4"],
+            "j5": ["e5"],
+            "j6": ["e6"],
+        },
+    ],
+]
 
 
 class TestDeferredAcceptance(TestCase):
     """Test the implementation of the deferred acceptance (DA) algorithm."""
 
-    @parameterized.expand(
-        [
-            data_generator.generate_preference_data(100, 100, 10),
-            data_generator.generate_preference_data(100, 10, 10),
-            data_generator.generate_preference_data(10, 100, 10),
-            data_generator.generate_preference_data(100, 100, 5),
-            data_generator.generate_preference_data(100, 100, 100),
-            data_generator.generate_preference_data(10, 10, 10),
-            data_generator.generate_preference_data(5, 5, 5),
-            data_generator.generate_preference_data(1000, 500, 50),
-            data_generator.generate_preference_data(100, 1000, 50),
-            data_generator.generate_preference_data(100, 1000, 5),
-            data_generator.generate_preference_data(100, 1000, 25),
-            data_generator.generate_preference_data(500, 500, 25),
-            data_generator.generate_preference_data(50, 50, 25),
-            data_generator.generate_preference_data(5000, 500, 50),
-            data_generator.generate_preference_data(3000, 3000, 20),
-            [
-                {
-                    "e1": ["j2", "j3", "j4", "j5", "j6", "j1"],
-                    "e2": ["j3", "j4", "j5", "j6", "j1", "j2"],
-                    "e3": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e4": ["j5", "j6", "j1", "j2", "j3", "j4"],
-                    "e5": ["j4", "j1", "j2", "j3", "j5", "j6"],
-                    "e6": ["j6", "j1", "j2", "j3", "j4", "j5"],
-                },
-                {
-                    "j1": ["e1"],
-                    "j2": ["e2"],
-                    "j3": ["e3"],
-                    "j4": ["e4"],
-                    "j5": ["e5"],
-                    "j6": ["e6"],
-                },
-            ],
-            [
-                {
-                    "e1": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e2": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e3": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e4": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e5": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                    "e6": ["j1", "j2", "j3", "j4", "j5", "j6"],
-                },
-                {
-                    "j1": ["e1"],
-                    "j2": ["e2"],
-                    "j3": ["e3"],
-                    "j4": ["e4"],
-                    "j5": ["e5"],
-                    "j6": ["e6"],
-                },
-            ],
-        ]
-    )
+    @parameterized.expand(PREFERENCE_DATA)
     def test_blocking_pairs(
         self,
         employee_preferences: Dict[str, List[str]],
@@ -87,6 +90,94 @@ class TestDeferredAcceptance(TestCase):
         )
         print("Success! No blocking pairs detected.")
 
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_stability_audit(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that the vectorized stability audit finds no blocking pairs in the DA matching."""
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        _, one_sided_match = da(table, engine="fast")
+        self.assertListEqual(find_all_blocking_pairs(one_sided_match, table), [])
+        self.assertTrue(is_stable(one_sided_match, table, chunk_size=7))
+
+    def test_all_blocking_pairs_are_reported(self) -> None:
+        """Check that every blocking pair of an unstable matching is reported, including several per employee."""
+        employee_preferences = {
+            "e1": ["j1", "j2", "j3"],
+            "e2": ["j1", "j2", "j3"],
+            "e3": ["j1", "j2", "j3"],
+        }
+        job_preferences = {
+            "j1": ["e3", "e2", "e1"],
+            "j2": ["e3", "e2", "e1"],
+            "j3": ["e3", "e2", "e1"],
+        }
+        # e3 is everyone's favorite, but got their last choice
+        one_sided_match = {"e1": "j1", "e2": "j2", "e3": "j3"}
+        self.assertListEqual(
+            find_all_blocking_pairs(one_sided_match, employee_preferences, job_preferences),
+            [("e2", "j1"), ("e3", "j1"), ("e3", "j2")],
+        )
+        self.assertFalse(is_stable(one_sided_match, employee_preferences, job_preferences))
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_engines_agree(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that every DA engine returns exactly the same matching as the reference engine."""
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        expected = da(table)
+        for engine in DA_ENGINES:
+            self.assertEqual(da(table, engine=engine), expected, engine)
+
+    def test_parallel_da_reports_rounds(self) -> None:
+        """Check that round based DA reports how many rounds of proposals it needed."""
+        two_sided_match, one_sided_match, rounds = parallel_da(
+            {"e1": ["j2", "j1"], "e2": ["j2", "j1"]},
+            {"j1": ["e1", "e2"], "j2": ["e2", "e1"]},
+        )
+        self.assertDictEqual(one_sided_match, {"e1": "j1", "e2": "j2"})
+        # both employees propose to j2 in round 1, and e1 (rejected) proposes to j1 in round 2
+        self.assertEqual(rounds, 2)
+
+    def test_unknown_engine(self) -> None:
+        """Check that asking for an engine that does not exist raises a ValueError."""
+        with self.assertRaises(ValueError):
+            da({"e1": ["j1"]}, {"j1": ["e1"]}, engine="missing")
+
+    def test_instrumentation(self) -> None:
+        """Check the proposal, rejection and bump counts, and the events passed to an observer."""
+        employee_preferences = {"e1": ["j2", "j1"], "e2": ["j2", "j1"], "e3": ["j2"]}
+        job_preferences = {"j1": ["e1", "e2"], "j2": ["e2", "e1", "e3"]}
+        for engine in DA_ENGINES:
+            events = []
+            two_sided_match, one_sided_match, stats = da(
+                employee_preferences,
+                job_preferences,
+                engine,
+                instrument=True,
+                observer=lambda event, data: events.append(event),
+            )
+            self.assertEqual(
+                (two_sided_match, one_sided_match), da(employee_preferences, job_preferences)
+            )
+            self.assertTrue({"compile", "match"} <= set(stats.timers), engine)
+            if engine == "parallel":
+                # e1, e2 and e3 propose to j2 in round 1 (e2 wins), e1 proposes to j1 in round 2
+                self.assertEqual((stats.proposals, stats.rejections, stats.bumps), (4, 2, 0))
+                self.assertEqual(stats.rounds, 2)
+                self.assertListEqual(events, ["round", "round"])
+            else:
+                # e1 gets j2, e2 bumps e1 from j2, e1 gets j1, j2 rejects e3
+                self.assertEqual((stats.proposals, stats.rejections, stats.bumps), (4, 1, 1), engine)
+                self.assertListEqual(
+                    events, ["proposal", "proposal", "bump", "proposal", "proposal", "rejection"]
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
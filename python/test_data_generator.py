@@ -0,0 +1,100 @@
+# standard imports
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+
+# custom imports
+import data_generator
+from algos.da_utils import find_all_blocking_pairs
+from algos.deferred_acceptance import da
+from preference_io import open_binary_profile
+
+
+class TestDataGenerator(TestCase):
+    """Test the synthetic market generator."""
+
+    @parameterized.expand([[0.0, None], [0.0, 7], [0.5, 7], [1.0, 30]])
+    def test_lists_are_valid_rankings(self, correlation: float, employee_list_length) -> None:
+        """Check list lengths, that nobody ranks a counterpart twice, and that seeds reproduce the market."""
+        employee_preferences, job_preferences = data_generator.generate_preference_data(
+            20, 30, 5, employee_list_length, correlation, seed=1
+        )
+        self.assertListEqual(list(employee_preferences), [f"e{i}" for i in range(1, 31)])
+        self.assertListEqual(list(job_preferences), [f"j{i}" for i in range(1, 21)])
+        for jobs in employee_preferences.values():
+            self.assertEqual(len(set(jobs)), 5)
+            self.assertTrue(set(jobs) <= set(job_preferences))
+        for employees in job_preferences.values():
+            self.assertEqual(len(set(employees)), employee_list_length or 30)
+            self.assertTrue(set(employees) <= set(employee_preferences))
+
+        self.assertEqual(
+            data_generator.generate_preference_data(
+                20, 30, 5, employee_list_length, correlation, seed=1
+            ),
+            (employee_preferences, job_preferences),
+        )
+        _, one_sided_match = da(employee_preferences, job_preferences)
+        self.assertListEqual(
+            find_all_blocking_pairs(one_sided_match, employee_preferences, job_preferences), []
+        )
+
+    def test_fully_correlated_preferences_agree(self) -> None:
+        """Check that with correlation 1 every participant on a side submits the same ranking."""
+        employee_preferences, job_preferences = data_generator.generate_preference_data(
+            10, 10, 10, correlation=1.0, seed=2
+        )
+        self.assertEqual(len({tuple(jobs) for jobs in employee_preferences.values()}), 1)
+        self.assertEqual(len({tuple(employees) for employees in job_preferences.values()}), 1)
+
+    def test_write_generated_profile(self) -> None:
+        """Check that streaming a market to a binary profile, in tiny chunks, gives the same market."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "market.bin")
+            data_generator.write_generated_profile(
+                path, 20, 30, 5, 10, correlation=0.3, seed=4, chunk_elements=7
+            )
+            self.assertEqual(
+                open_binary_profile(path).to_dicts(),
+                data_generator.generate_preference_data(20, 30, 5, 10, 0.3, seed=4),
+            )
+
+    @parameterized.expand([[0.0, None], [0.6, None], [0.6, 3]])
+    def test_sparse_market(self, correlation: float, employee_list_length) -> None:
+        """Check that in a sparse market every job ranks (the best of) exactly the employees listing it."""
+        table = data_generator.generate_sparse_preference_table(
+            40, 60, 4, employee_list_length, correlation, seed=5
+        )
+        employee_preferences, job_preferences = table.to_dicts()
+        for jobs in employee_preferences.values():
+            self.assertEqual(len(set(jobs)), 4)
+        for job, employees in job_preferences.items():
+            applicants = {employee for employee, jobs in employee_preferences.items() if job in jobs}
+            self.assertEqual(len(set(employees)), len(employees))
+            self.assertTrue(set(employees) <= applicants)
+            self.assertEqual(len(employees), min(len(applicants), employee_list_length or len(applicants)))
+
+        self.assertEqual(
+            data_generator.generate_sparse_preference_table(
+                40, 60, 4, employee_list_length, correlation, seed=5
+            ).to_dicts(),
+            (employee_preferences, job_preferences),
+        )
+        _, one_sided_match = da(table, engine="fast")
+        self.assertDictEqual(one_sided_match, da(employee_preferences, job_preferences)[1])
+        self.assertListEqual(
+            find_all_blocking_pairs(one_sided_match, employee_preferences, job_preferences), []
+        )
+
+    def test_invalid_list_length(self) -> None:
+        """Check that asking for lists longer than the other side raises a ValueError."""
+        with self.assertRaises(ValueError):
+            data_generator.generate_preference_data(5, 5, 6)
+        with self.assertRaises(ValueError):
+            data_generator.generate_sparse_preference_table(5, 5, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# standard imports
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List
+
+# custom imports
+from algos.deferred_acceptance import DA_ENGINES
+from algos.preference_table import PreferenceTable, UNMATCHED
+from algos.top_trading_cycle import TTC_ENGINES
+from benchmarks.fuzz import ENGINES, check_market, fuzz, random_market
+
+
+def unmatch_last_employee(table: PreferenceTable, stats=None) -> List[int]:
+    """DA that drops the match of the last employee, on markets of 2 jobs or more."""
+    employee_match = DA_ENGINES["reference"](table)
+    if table.number_of_jobs >= 2:
+        employee_match[-1] = UNMATCHED
+    return employee_match
+
+
+def match_everyone_to_their_first_job(table: PreferenceTable, stats=None) -> List[int]:
+    return [
+        table.employee_targets[table.employee_offsets[e]]
+        if table.employee_offsets[e] < table.employee_offsets[e + 1]
+        else UNMATCHED
+        for e in range(table.number_of_employees)
+    ]
+
+
+def crash_on_empty_lists(table: PreferenceTable, stats=None) -> List[int]:
+    if any(table.employee_offsets[e] == table.employee_offsets[e + 1] for e in range(table.number_of_employees)):
+        raise IndexError("empty preference list")
+    return TTC_ENGINES["reference"](table)
+
+
+class TestFuzz(TestCase):
+    """Test the differential fuzzing harness."""
+
+    def test_engines_agree(self):
+        report = fuzz(2.0, seed=1)
+        self.assertGreater(report.markets, 0)
+        self.assertEqual(report.failures, {})
+        for algorithm, engines in ENGINES.items():
+            for engine in engines:
+                self.assertIn((algorithm, engine), report.throughput)
+
+    def test_random_market_is_reproducible(self):
+        self.assertEqual(random_market(7), random_market(7))
+        (employee_preferences, job_preferences), shape = random_market(7, max_size=5)
+        self.assertLessEqual(len(employee_preferences), 5)
+        self.assertLessEqual(shape["jobs"], 5)
+
+    @parameterized.expand(
+        [
+            ["da", unmatch_last_employee, "mismatch", 1, 2],
+            ["da", match_everyone_to_their_first_job, "invalid", 2, 1],
+            ["ttc", crash_on_empty_lists, "error", 1, 0],
+        ]
+    )
+    def test_failures_are_shrunk(
+        self, algorithm: str, engine, kind: str, number_of_employees: int, number_of_jobs: int
+    ):
+        """A broken engine is caught, and its counterexample shrunk to the smallest market that breaks it."""
+        reference = {"da": DA_ENGINES, "ttc": TTC_ENGINES}[algorithm]["reference"]
+        report = fuzz(1.0, seed=2, max_size=12, engines={algorithm: {"reference": reference, "broken": engine}})
+        failure = report.failures[(algorithm, "broken", kind)]
+        table = PreferenceTable.from_dicts(failure.employee_preferences, failure.job_preferences)
+        self.assertEqual(table.number_of_employees, number_of_employees)
+        self.assertEqual(table.number_of_jobs, number_of_jobs)
+        failures = check_market(table.to_dicts(), algorithm, {"reference": reference, "broken": engine})
+        self.assertIn(("broken", kind), [failure[:2] for failure in failures])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# standard imports
+import random
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.deferred_acceptance import da
+from algos.incremental_da import IncrementalDA
+
+
+# every job ranks every employee, the markets where incremental DA matches a cold run exactly
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 60, 5, seed=1),
+    data_generator.generate_preference_data(50, 100, 10, seed=2),
+    data_generator.generate_preference_data(100, 50, 25, seed=3),
+    data_generator.generate_preference_data(30, 300, 10, correlation=0.7, seed=4),
+]
+
+
+class TestIncrementalDeferredAcceptance(TestCase):
+    """Test that repairing a DA matching after a change gives the same result as a cold run."""
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_updates_match_cold_da(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check a random sequence of changes to employees and jobs against da() on the changed market."""
+        employee_preferences = dict(employee_preferences)
+        job_preferences = dict(job_preferences)
+        incremental_da = IncrementalDA(employee_preferences, job_preferences)
+        self.assertDictEqual(incremental_da.two_sided_match, da(employee_preferences, job_preferences)[0])
+
+        rng = random.Random(0)
+        removed_jobs = set()
+        for step in range(30):
+            jobs = sorted(set(job_preferences) - removed_jobs)
+            employees = sorted(employee_preferences)
+            change = step % 5
+            if change == 0:
+                # a new employee, whom every job ranks somewhere
+                employee = f"new{step}"
+                employee_preferences[employee] = rng.sample(jobs, min(5, len(jobs)))
+                for job in job_preferences:
+                    ranking = list(job_preferences[job])
+                    ranking.insert(rng.randint(0, len(ranking)), employee)
+                    job_preferences[job] = ranking
+                changes = incremental_da.update(
+                    {employee: employee_preferences[employee]},
+                    {job: job_preferences[job] for job in jobs},
+                )
+            elif change == 1:
+                employee = rng.choice(employees)
+                del employee_preferences[employee]
+                changes = incremental_da.update(removed_employees=[employee])
+            elif change == 2:
+                employee = rng.choice(employees)
+                employee_preferences[employee] = rng.sample(jobs, min(5, len(jobs)))
+                changes = incremental_da.update({employee: employee_preferences[employee]})
+            elif change == 3:
+                job = rng.choice(jobs)
+                job_preferences[job] = rng.sample(job_preferences[job], len(job_preferences[job]))
+                changes = incremental_da.update(job_preferences={job: job_preferences[job]})
+            else:
+                job = rng.choice(jobs)
+                removed_jobs.add(job)
+                changes = incremental_da.update(removed_jobs=[job])
+
+            expected_two_sided_match, expected_one_sided_match = da(
+                {
+                    employee: [job for job in jobs if job not in removed_jobs]
+                    for employee, jobs in employee_preferences.items()
+                },
+                {
+                    job: [employee for employee in employees if employee in employee_preferences]
+                    for job, employees in job_preferences.items()
+                    if job not in removed_jobs
+                },
+            )
+            self.assertDictEqual(incremental_da.one_sided_match, expected_one_sided_match)
+            self.assertDictEqual(incremental_da.two_sided_match, expected_two_sided_match)
+            for employee, job in changes.items():
+                self.assertEqual(expected_one_sided_match[employee], job)
+
+    def test_removal_reopens_chain(self) -> None:
+        """Check that removing an employee only replays the proposals their removal changes."""
+        employee_preferences = {"e1": ["j1", "j2"], "e2": ["j1", "j2"], "e3": ["j3"]}
+        job_preferences = {"j1": ["e1", "e2"], "j2": ["e1", "e2"], "j3": ["e3"]}
+        incremental_da = IncrementalDA(employee_preferences, job_preferences)
+        self.assertDictEqual(incremental_da.one_sided_match, {"e1": "j1", "e2": "j2", "e3": "j3"})
+
+        # e2 moves up to j1, e3 is left alone
+        changes = incremental_da.update(removed_employees=["e1"])
+        self.assertDictEqual(changes, {"e2": "j1"})
+        self.assertDictEqual(incremental_da.two_sided_match, {"e2": "j1", "j1": "e2", "e3": "j3", "j3": "e3"})
+
+        # e1 comes back, displaces e2 from j1 again
+        changes = incremental_da.update({"e1": ["j1", "j2"]})
+        self.assertDictEqual(changes, {"e1": "j1", "e2": "j2"})
+        self.assertDictEqual(incremental_da.one_sided_match, {"e2": "j2", "e3": "j3", "e1": "j1"})
+
+    def test_job_comes_back(self) -> None:
+        """Check that employees who skipped a removed job propose to it again when it comes back."""
+        employee_preferences = {"e0": ["j0", "j1"], "e1": ["j0", "j1"]}
+        job_preferences = {"j0": ["e0", "e1"], "j1": ["e0", "e1"]}
+        incremental_da = IncrementalDA(employee_preferences, job_preferences)
+        incremental_da.update(removed_jobs=["j0"])
+        self.assertDictEqual(incremental_da.one_sided_match, {"e0": "j1", "e1": "e1"})
+
+        changes = incremental_da.update(job_preferences={"j0": job_preferences["j0"]})
+        self.assertDictEqual(changes, {"e0": "j0", "e1": "j1"})
+        self.assertDictEqual(incremental_da.two_sided_match, da(employee_preferences, job_preferences)[0])
+
+    @parameterized.expand(PREFERENCE_DATA)
+    def test_removed_jobs_come_back(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check removing jobs and bringing them back against da() on the changed market."""
+        incremental_da = IncrementalDA(employee_preferences, job_preferences)
+        rng = random.Random(1)
+        removed_jobs: List[str] = []
+        for step in range(20):
+            if removed_jobs and step % 2:
+                job = removed_jobs.pop(rng.randrange(len(removed_jobs)))
+                incremental_da.update(job_preferences={job: job_preferences[job]})
+            else:
+                job = rng.choice(sorted(set(job_preferences) - set(removed_jobs)))
+                removed_jobs.append(job)
+                incremental_da.update(removed_jobs=[job])
+
+            expected_two_sided_match, _ = da(
+                {
+                    employee: [job for job in jobs if job not in removed_jobs]
+                    for employee, jobs in employee_preferences.items()
+                },
+                {job: employees for job, employees in job_preferences.items() if job not in removed_jobs},
+            )
+            self.assertDictEqual(incremental_da.two_sided_match, expected_two_sided_match)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# standard imports
+import random
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.capacitated_da import capacitated_da, decode_capacitated_matches
+from algos.da_utils import is_stable
+from algos.deferred_acceptance import da
+from algos.lottery import MULTIPLE, SINGLE, TieBreakingLottery
+
+
+def coarsen(job_preferences: Dict[str, List[str]], seed: int) -> Dict[str, List[List[str]]]:
+    """Merge runs of neighbours on every job's list into priority classes of 1 to 4 employees."""
+    rng = random.Random(seed)
+    job_priorities = {}
+    for job, employees in job_preferences.items():
+        classes, position = [], 0
+        while position < len(employees):
+            size = rng.randint(1, 4)
+            classes.append(employees[position : position + size])
+            position += size
+        job_priorities[job] = classes
+    return job_priorities
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 60, 5, seed=1),
+    data_generator.generate_preference_data(50, 100, 10, 30, seed=2),
+    data_generator.generate_preference_data(30, 300, 10, correlation=0.7, seed=3),
+]
+
+
+class TestTieBreakingLottery(TestCase):
+    """Test lottery tie-breaking against DA run on the strict profile of each draw."""
+
+    @parameterized.expand(
+        [
+            (*preference_data, tie_breaking)
+            for preference_data in PREFERENCE_DATA
+            for tie_breaking in (SINGLE, MULTIPLE)
+        ]
+    )
+    def test_draws_respect_priorities(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+        tie_breaking: str,
+    ) -> None:
+        """Check every draw refines the priority classes, and is matched exactly as da() matches it."""
+        job_priorities = coarsen(job_preferences, 0)
+        lottery = TieBreakingLottery(employee_preferences, job_priorities)
+        for seed in range(3):
+            drawn_employee_preferences, drawn_job_preferences = lottery.draw(seed, tie_breaking).to_dicts()
+            self.assertDictEqual(drawn_employee_preferences, employee_preferences)
+            # pairs of employees ordered by the lottery, with single tie-breaking every job orders them alike
+            broken_ties = set()
+            for job, classes in job_priorities.items():
+                position = 0
+                for priority_class in classes:
+                    drawn_class = drawn_job_preferences[job][position : position + len(priority_class)]
+                    self.assertCountEqual(drawn_class, priority_class)
+                    broken_ties.update(zip(drawn_class, drawn_class[1:]))
+                    position += len(priority_class)
+            if tie_breaking == SINGLE:
+                self.assertFalse(any((worse, better) in broken_ties for better, worse in broken_ties))
+
+            _, one_sided_match = decode_capacitated_matches(
+                lottery.table, lottery.match(seed, tie_breaking)
+            )
+            self.assertDictEqual(one_sided_match, da(drawn_employee_preferences, drawn_job_preferences)[1])
+            self.assertTrue(is_stable(one_sided_match, drawn_employee_preferences, drawn_job_preferences))
+
+    def test_strict_priorities(self) -> None:
+        """Check that without ties every draw is the capacitated DA matching of the profile."""
+        employee_preferences, job_preferences = PREFERENCE_DATA[1]
+        capacities = {job: 1 + i % 3 for i, job in enumerate(job_preferences)}
+        lottery = TieBreakingLottery(
+            employee_preferences,
+            {job: [[employee] for employee in employees] for job, employees in job_preferences.items()},
+            capacities,
+        )
+        _, expected = capacitated_da(employee_preferences, job_preferences, capacities)
+        result = lottery.run(range(5), MULTIPLE)
+        probabilities = result.assignment_probabilities()
+        self.assertDictEqual(probabilities, {employee: {job: 1.0} for employee, job in expected.items()})
+
+    def test_assignment_probabilities(self) -> None:
+        """Check the aggregate of many draws, where two employees tie for the one job they both want."""
+        lottery = TieBreakingLottery(
+            {"e1": ["j1", "j2"], "e2": ["j1"], "e3": ["j2"]},
+            {"j1": [["e1", "e2"]], "j2": [["e3"], ["e1"]]},
+        )
+        result = lottery.run(range(400), SINGLE)
+        self.assertEqual(result.draws, 400)
+        probabilities = result.assignment_probabilities()
+        # e1 loses j1 to e2 half of the time, and j2 always goes to e3, who has priority there
+        self.assertAlmostEqual(probabilities["e1"]["j1"], 0.5, delta=0.1)
+        self.assertAlmostEqual(probabilities["e1"]["e1"] + probabilities["e1"]["j1"], 1.0)
+        self.assertAlmostEqual(probabilities["e2"]["j1"] + probabilities["e2"]["e2"], 1.0)
+        self.assertDictEqual(probabilities["e3"], {"j2": 1.0})
+        self.assertListEqual(result.rank_distribution().tolist(), [2.0, 0.0])
+
+        # draws split over worker processes add up to the same counts
+        pooled_result = lottery.run(range(400), SINGLE, processes=2)
+        self.assertListEqual(pooled_result.assignment_counts.tolist(), result.assignment_counts.tolist())
+        self.assertListEqual(pooled_result.unassigned_counts.tolist(), result.unassigned_counts.tolist())
+
+        with self.assertRaises(ValueError):
+            lottery.draw(0, "boston")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# standard imports
+import csv
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.deferred_acceptance import da
+from algos.instrumentation import MatchStats
+from algos.preference_table import UNMATCHED
+from algos.top_trading_cycle import ttc
+
+
+# short lists, so that some participants are left unmatched
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 30, 3, 10, seed=1),
+    data_generator.generate_preference_data(25, 40, 5, 5, seed=2),
+]
+
+
+class TestMatchResult(TestCase):
+    """Test the array backed result of da() and ttc() against the dictionaries it stands for."""
+
+    @parameterized.expand(
+        [(*preference_data, match) for preference_data in PREFERENCE_DATA for match in (da, ttc)]
+    )
+    def test_views_match_dicts(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+        match,
+    ) -> None:
+        """Check the lookups and Mapping views against the dictionaries the result unpacks to."""
+        result = match(employee_preferences, job_preferences)
+        two_sided_match, one_sided_match = result
+        self.assertIs(result[1], one_sided_match)
+        self.assertListEqual(list(result.one_sided.items()), list(one_sided_match.items()))
+        self.assertListEqual(list(result.two_sided.items()), list(two_sided_match.items()))
+        self.assertEqual(len(result.two_sided), len(two_sided_match))
+        self.assertEqual(result.number_matched, sum(e != j for e, j in one_sided_match.items()))
+        self.assertLess(result.number_matched, len(employee_preferences))
+
+        for employee, job in one_sided_match.items():
+            self.assertEqual(result.job(employee), None if job == employee else job)
+        for job in job_preferences:
+            self.assertEqual(result.employee(job), two_sided_match.get(job))
+            self.assertEqual(job in result.two_sided, job in two_sided_match)
+
+        employee_match, job_match = result.to_numpy()
+        for employee, job in enumerate(employee_match.tolist()):
+            if job != UNMATCHED:
+                self.assertEqual(job_match[job], employee)
+        self.assertEqual(int((job_match != UNMATCHED).sum()), result.number_matched)
+
+    def test_csv_export(self) -> None:
+        """Check that the CSV export holds every employee's match, with an empty job when unmatched."""
+        result = da(*PREFERENCE_DATA[1], engine="fast")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "match.csv")
+            result.to_csv(path)
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+        self.assertListEqual(rows[0], ["employee", "job"])
+        self.assertDictEqual(
+            {employee: job or employee for employee, job in rows[1:]}, result.one_sided_match
+        )
+
+    def test_instrumented_result(self) -> None:
+        """Check that an instrumented result still unpacks to the triple, and compares equal to a plain one."""
+        two_sided_match, one_sided_match, stats = da(*PREFERENCE_DATA[0], instrument=True)
+        result = da(*PREFERENCE_DATA[0])
+        self.assertEqual(len(result), 2)
+        self.assertEqual((two_sided_match, one_sided_match), result)
+        self.assertEqual(da(*PREFERENCE_DATA[0], engine="fast"), result)
+        self.assertGreater(stats.counts["proposal"], 0)
+        self.assertIsInstance(ttc(*PREFERENCE_DATA[0], instrument=True).stats, MatchStats)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# standard imports
+import contextlib
+import csv
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import Dict, List
+
+# custom imports
+import data_generator
+import matching_cli
+from algos.da_utils import find_all_blocking_pairs
+from algos.deferred_acceptance import da
+from algos.top_trading_cycle import ttc
+from preference_io import write_binary_profile, write_preference_file
+
+
+class TestMatchingCLI(TestCase):
+    """Test the matching command line runner."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.employee_preferences, self.job_preferences = data_generator.generate_preference_data(
+            30, 40, 8, seed=3
+        )
+        self.employee_path = self.path("employees.csv")
+        self.job_path = self.path("jobs.csv")
+        write_preference_file(self.employee_path, self.employee_preferences)
+        write_preference_file(self.job_path, self.job_preferences)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def run_cli(self, *argv: str) -> int:
+        with contextlib.redirect_stderr(io.StringIO()):
+            return matching_cli.main(list(argv))
+
+    def read_match(self, path: str) -> Dict[str, str]:
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["employee", "job"])
+        return {employee: job or employee for employee, job in rows[1:]}
+
+    @parameterized.expand([["da", "fast"], ["da", "reference"], ["ttc", "fast"], ["ttc", "reference"]])
+    def test_match(self, command: str, engine: str):
+        output = self.path("match.csv")
+        status = self.run_cli(
+            command, "--employees", self.employee_path, "--jobs", self.job_path, "--engine", engine, "--output", output
+        )
+        self.assertEqual(status, 0)
+        algorithm = {"da": da, "ttc": ttc}[command]
+        _, one_sided_match = algorithm(self.employee_preferences, self.job_preferences)
+        self.assertEqual(self.read_match(output), one_sided_match)
+
+    def test_binary_profile_and_stdout(self):
+        profile = self.path("market.bin")
+        write_binary_profile(profile, self.employee_preferences, self.job_preferences)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            status = matching_cli.main(["ttc", "--profile", profile, "--stats"])
+        self.assertEqual(status, 0)
+        rows = list(csv.reader(io.StringIO(stdout.getvalue())))
+        _, one_sided_match = ttc(self.employee_preferences, self.job_preferences)
+        self.assertEqual({employee: job or employee for employee, job in rows[1:]}, one_sided_match)
+        self.assertIn("ttc (fast): 40 employees, 30 jobs", stderr.getvalue())
+        self.assertIn("cycle=", stderr.getvalue())
+
+    def test_audit(self):
+        stable, unstable, blocking_pairs = self.path("da.csv"), self.path("ttc.csv"), self.path("pairs.csv")
+        market = ["--employees", self.employee_path, "--jobs", self.job_path]
+        self.run_cli("da", *market, "--output", stable)
+        self.run_cli("ttc", *market, "--output", unstable)
+        self.assertEqual(self.run_cli("audit", *market, "--match", stable, "--output", blocking_pairs), 0)
+
+        status = self.run_cli("audit", *market, "--match", unstable, "--output", blocking_pairs)
+        expected = find_all_blocking_pairs(self.read_match(unstable), self.employee_preferences, self.job_preferences)
+        with open(blocking_pairs, newline="") as f:
+            self.assertEqual([tuple(row) for row in csv.reader(f)][1:], expected)
+        self.assertEqual(status, 1 if expected else 0)
+
+    def test_errors(self):
+        with self.assertRaises(SystemExit) as error:
+            self.run_cli("da", "--employees", self.employee_path)
+        self.assertEqual(error.exception.code, 2)
+        with self.assertRaises(SystemExit) as error:
+            self.run_cli("da", "--employees", self.employee_path, "--jobs", self.job_path, "--engine", "nope")
+        self.assertEqual(error.exception.code, 2)
+
+    @parameterized.expand([[["e1", "jX"]], [["eX", ""]]])
+    def test_audit_unknown_names(self, row: List[str]):
+        """A matching naming someone outside the market is bad input (status 2), not an unstable matching."""
+        match = self.path("match.csv")
+        with open(match, "w", newline="") as f:
+            csv.writer(f).writerows([["employee", "job"], row])
+        stderr = io.StringIO()
+        with self.assertRaises(SystemExit) as error, contextlib.redirect_stderr(stderr):
+            matching_cli.main(["audit", "--employees", self.employee_path, "--jobs", self.job_path, "--match", match])
+        self.assertEqual(error.exception.code, 2)
+        self.assertEqual(len(stderr.getvalue().splitlines()), 1)
+        self.assertIn("unknown", stderr.getvalue())
+
+    @parameterized.expand([["da"], ["ttc"]])
+    def test_small_runs_do_not_import_numpy(self, command: str):
+        script = (
+            "import sys, matching_cli; status = matching_cli.main(sys.argv[1:]); "
+            "assert 'numpy' not in sys.modules; sys.exit(status)"
+        )
+        output = self.path("match.csv")
+        subprocess.run(
+            [sys.executable, "-c", script, command, "--employees", self.employee_path, "--jobs", self.job_path,
+             "--output", output, "--quiet"],
+            cwd=os.path.dirname(os.path.abspath(matching_cli.__file__)),
+            check=True,
+        )
+        algorithm = {"da": da, "ttc": ttc}[command]
+        _, one_sided_match = algorithm(self.employee_preferences, self.job_preferences)
+        self.assertEqual(self.read_match(output), one_sided_match)
+
+
+if __name__ == "__main__":
+    unittest.main()
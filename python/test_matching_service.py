@@ -0,0 +1,183 @@
+# standard imports
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from parameterized.parameterized import parameterized
+
+# custom imports
+import data_generator
+from algos.deferred_acceptance import da
+from algos.top_trading_cycle import ttc
+from matching_service import DECODE_CHUNK_BYTES, MatchingClient, MatchingService, _decode
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 60, 5, seed=1),
+    data_generator.generate_preference_data(50, 40, 10, 30, seed=2),
+]
+
+
+def submit_request(market_id: str, request_id: int | None = None) -> dict:
+    employee_preferences, job_preferences = PREFERENCE_DATA[0]
+    return {
+        "id": request_id,
+        "op": "submit",
+        "market_id": market_id,
+        "employee_preferences": employee_preferences,
+        "job_preferences": job_preferences,
+    }
+
+
+def large_market(size: int) -> tuple:
+    """A market of size employees and jobs with lists of 10, built directly (data_generator is slow at this size)."""
+    employee_preferences = {f"e{i}": [f"j{(i + k * 7) % size}" for k in range(10)] for i in range(size)}
+    job_preferences = {f"j{i}": [f"e{(i + k * 11) % size}" for k in range(10)] for i in range(size)}
+    return employee_preferences, job_preferences
+
+
+class TestMatchingService(IsolatedAsyncioTestCase):
+    """Test the matching daemon through an in-process client."""
+
+    @parameterized.expand([("unix", 0), ("tcp", 0), ("unix", 2)])
+    async def test_same_as_da_and_ttc(self, transport: str, processes: int) -> None:
+        """Check that matches served for submitted markets are what da() and ttc() return."""
+        service = MatchingService(processes)
+        with tempfile.TemporaryDirectory() as directory:
+            await service.start(os.path.join(directory, "matching.sock") if transport == "unix" else None)
+            client = await MatchingClient.connect(service.address)
+            try:
+                for market_id, preference_data in enumerate(PREFERENCE_DATA):
+                    submitted = await client.submit(str(market_id), *preference_data)
+                    self.assertEqual(submitted["employees"], len(preference_data[0]))
+
+                # concurrent requests over the one connection
+                matches = await asyncio.gather(
+                    *(
+                        client.match(str(market_id), algorithm, engine)
+                        for market_id in range(len(PREFERENCE_DATA))
+                        for algorithm, engine in (("da", "fast"), ("da", "reference"), ("ttc", "fast"))
+                    )
+                )
+                expected = [
+                    match(*preference_data, engine)
+                    for preference_data in PREFERENCE_DATA
+                    for match, engine in ((da, "fast"), (da, "reference"), (ttc, "fast"))
+                ]
+                self.assertListEqual([list(match) for match in matches], [list(match) for match in expected])
+
+                metrics = await client.metrics()
+                self.assertEqual(metrics["requests"]["submit"], 2)
+                self.assertEqual(metrics["requests"]["match"], 6)
+                self.assertEqual(metrics["errors"], 0)
+                self.assertEqual(metrics["in_flight"], 1)
+                self.assertGreater(metrics["latency"]["match"]["max"], 0)
+            finally:
+                await client.close()
+                await service.close()
+
+    async def test_coalesced_requests(self) -> None:
+        """Check that concurrent identical match requests share one run, even while the market compiles."""
+        service = MatchingService(0)
+        try:
+            responses = await asyncio.gather(
+                service.handle(submit_request("m", 0)),
+                *(service.handle({"id": i, "op": "match", "market_id": "m"}) for i in range(1, 6)),
+            )
+            self.assertListEqual([response["id"] for response in responses], list(range(6)))
+            _, one_sided_match = da(*PREFERENCE_DATA[0])
+            for response in responses[1:]:
+                self.assertDictEqual(response["result"]["one_sided_match"], one_sided_match)
+            self.assertEqual(service.metrics.coalesced, 4)
+        finally:
+            await service.close()
+
+    async def test_large_submit_does_not_block(self) -> None:
+        """Check that a metrics request sent after a large submit is answered while the submit is decoded."""
+        employee_preferences, job_preferences = large_market(30000)
+        service = MatchingService(0)
+        with tempfile.TemporaryDirectory() as directory:
+            await service.start(os.path.join(directory, "matching.sock"))
+            client = await MatchingClient.connect(service.address)
+            try:
+                answered = []
+
+                async def request(op: str, **fields) -> dict:
+                    result = await client.request(op, **fields)
+                    answered.append(op)
+                    return result
+
+                _, metrics = await asyncio.gather(
+                    request(
+                        "submit",
+                        market_id="m",
+                        employee_preferences=employee_preferences,
+                        job_preferences=job_preferences,
+                    ),
+                    request("metrics"),
+                )
+                self.assertListEqual(answered, ["metrics", "submit"])
+                # the submit had not even reached the service (it was still being decoded)
+                self.assertEqual(metrics["in_flight"], 1)
+                self.assertEqual(metrics["requests"]["submit"], 0)
+            finally:
+                await client.close()
+                await service.close()
+
+    def test_decode(self) -> None:
+        """Check that long request lines, decoded a member at a time, decode as json.loads does."""
+        padding = " " * DECODE_CHUNK_BYTES
+        request = submit_request("m", 1)
+        for line in (json.dumps(request), json.dumps(request, indent=2) + padding):
+            self.assertEqual(_decode(line.encode("utf-8")), request)
+        for bad in ('{"a": 1,}', '{"a" 1}', '{"a": 1} x', '{"a": [1,]}', '{1: 2}', "["):
+            with self.assertRaises(ValueError) as error:
+                _decode((bad + padding).encode("utf-8"))
+            with self.assertRaises(ValueError) as expected:
+                json.loads(bad + padding)
+            self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_decode_releases_the_gil(self) -> None:
+        """Check that another thread (the event loop's) keeps running while a long line is decoded."""
+        employee_preferences, job_preferences = large_market(30000)
+        line = json.dumps(
+            {"op": "submit", "employee_preferences": employee_preferences, "job_preferences": job_preferences}
+        )
+        decoder = threading.Thread(target=_decode, args=(line.encode("utf-8"),))
+        turns = 0
+        decoder.start()
+        while decoder.is_alive():
+            # every call gives the GIL up, and only comes back once the decoder gives it up in turn
+            time.sleep(0)
+            turns += 1
+        decoder.join()
+        self.assertGreater(turns, 10)
+
+    async def test_errors(self) -> None:
+        """Check that bad requests get an error response, and that least recently used markets are dropped."""
+        service = MatchingService(0, max_markets=1)
+        try:
+            for request in (
+                {"op": "match", "market_id": "m1"},
+                {"op": "boston"},
+                {"op": "submit", "market_id": "m1"},
+            ):
+                self.assertIn("error", await service.handle(request))
+
+            for market_id in ("m1", "m2"):
+                await service.handle(submit_request(market_id))
+            self.assertIn("error", await service.handle({"op": "match", "market_id": "m1"}))
+            self.assertIn("error", await service.handle({"op": "match", "market_id": "m2", "engine": "boston"}))
+            self.assertTrue((await service.handle({"op": "drop", "market_id": "m2"}))["result"])
+            self.assertIn("error", await service.handle({"op": "match", "market_id": "m2"}))
+            self.assertEqual(service.metrics.errors, 6)
+        finally:
+            await service.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+# standard imports
+import os
+import tempfile
+import unittest
+from unittest import TestCase, mock
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+import preference_io
+from algos.da_utils import find_all_blocking_pairs
+from algos.deferred_acceptance import da
+from algos.preference_table import PreferenceTable
+from algos.top_trading_cycle import ttc
+from preference_io import (
+    binary_profile_to_dicts,
+    load_preference_table,
+    open_binary_profile,
+    write_binary_profile,
+    write_preference_file,
+)
+
+
+class TestPreferenceIO(TestCase):
+    """Test reading and writing preference profiles."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write_market(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+        format: str,
+    ):
+        employee_path = os.path.join(self.directory.name, f"employees.{format}")
+        job_path = os.path.join(self.directory.name, f"jobs.{format}")
+        write_preference_file(employee_path, employee_preferences)
+        write_preference_file(job_path, job_preferences)
+        return employee_path, job_path
+
+    @parameterized.expand(
+        [
+            ["csv", *data_generator.generate_preference_data(50, 80, 10)],
+            ["jsonl", *data_generator.generate_preference_data(80, 50, 10)],
+            [
+                "csv",
+                {"e1": ["j3", "j1"], "e2": [], "e3": ["j2"]},
+                {"j2": ["e3", "e9", "e1"], "j1": ["e2"]},
+            ],
+        ]
+    )
+    def test_load_matches_from_dicts(
+        self,
+        format: str,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that streaming files gives the same table (and matchings) as compiling the dictionaries."""
+        employee_path, job_path = self.write_market(
+            employee_preferences, job_preferences, format
+        )
+        progress = []
+        table = load_preference_table(
+            employee_path,
+            job_path,
+            chunk_size=7,
+            progress=lambda *report: progress.append(report),
+        )
+        expected = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+
+        self.assertListEqual(table.employees, expected.employees)
+        self.assertListEqual(table.jobs, expected.jobs)
+        self.assertEqual(table.to_dicts(), expected.to_dicts())
+        self.assertEqual(da(table), da(expected))
+        self.assertEqual(ttc(table), ttc(expected))
+        _, one_sided_match = da(table)
+        self.assertListEqual(find_all_blocking_pairs(one_sided_match, table), [])
+
+        # the last progress report of each file has read the whole file
+        self.assertEqual(progress[-1][0], "jobs")
+        self.assertEqual(progress[-1][2], progress[-1][3])
+
+    @parameterized.expand([[0], [preference_io.NUMPY_REMAP_ENTRIES]])
+    def test_job_renumbering(self, numpy_remap_entries: int) -> None:
+        """Check that job ids are renumbered the same way in Python and with NumPy."""
+        employee_preferences = {"e1": ["j3", "j1", "j4"], "e2": ["j4"], "e3": ["j2", "j3"]}
+        job_preferences = {"j2": ["e3", "e1"], "j1": ["e2", "e1"]}
+        employee_path, job_path = self.write_market(employee_preferences, job_preferences, "csv")
+        with mock.patch.object(preference_io, "NUMPY_REMAP_ENTRIES", numpy_remap_entries):
+            table = load_preference_table(employee_path, job_path)
+        expected = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        self.assertListEqual(table.jobs, expected.jobs)
+        self.assertEqual(list(table.employee_targets), list(expected.employee_targets))
+        self.assertEqual(table.to_dicts(), expected.to_dicts())
+
+    def test_duplicate_participant(self) -> None:
+        """Check that a participant listed twice in a file is rejected."""
+        employee_path = os.path.join(self.directory.name, "employees.jsonl")
+        job_path = os.path.join(self.directory.name, "jobs.jsonl")
+        write_preference_file(employee_path, [("e1", ["j1"]), ("e1", ["j1"])])
+        write_preference_file(job_path, {"j1": ["e1"]})
+        with self.assertRaises(ValueError):
+            load_preference_table(employee_path, job_path)
+
+    @parameterized.expand(
+        [
+            data_generator.generate_preference_data(50, 80, 10),
+            [{"e1": ["j3", "j1"], "e2": []}, {"j2": ["e2", "e9"], "j1": ["e2", "e1"]}],
+            [{}, {}],
+        ]
+    )
+    def test_binary_profile_round_trip(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that a binary profile reads back to the same dictionaries, and that the algorithms run on it."""
+        path = os.path.join(self.directory.name, "profile.bin")
+        write_binary_profile(path, employee_preferences, job_preferences)
+        expected = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+
+        self.assertEqual(binary_profile_to_dicts(path), expected.to_dicts())
+        table = open_binary_profile(path)
+        self.assertListEqual(table.employees, expected.employees)
+        self.assertListEqual(table.jobs, expected.jobs)
+        for engine in ("reference", "fast"):
+            self.assertEqual(da(table, engine=engine), da(expected))
+            self.assertEqual(ttc(table, engine=engine), ttc(expected))
+
+        # writing the memory mapped table again gives an identical file
+        copy = os.path.join(self.directory.name, "copy.bin")
+        write_binary_profile(copy, table)
+        with open(path, "rb") as original, open(copy, "rb") as rewritten:
+            self.assertEqual(original.read(), rewritten.read())
+
+    def test_not_a_binary_profile(self) -> None:
+        """Check that opening a file that is not a binary profile raises a ValueError."""
+        path = os.path.join(self.directory.name, "employees.csv")
+        write_preference_file(path, {"e1": ["j1"] * 20})
+        with self.assertRaises(ValueError):
+            open_binary_profile(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
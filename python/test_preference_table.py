@@ -0,0 +1,76 @@
+# standard imports
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+import data_generator
+from algos.preference_table import PreferenceTable, UNRANKED
+from algos.da_utils import find_blocking_pairs
+from algos.deferred_acceptance import da
+from algos.top_trading_cycle import ttc
+
+
+class TestPreferenceTable(TestCase):
+    """Test the compiled, integer-indexed PreferenceTable."""
+
+    def test_interning_and_ranks(self) -> None:
+        """Check that names are interned in order and rank lookups match list.index."""
+        employee_preferences = {"e1": ["j2", "j1"], "e2": ["j2", "j3"]}
+        job_preferences = {"j1": ["e1", "e2"], "j2": ["e2"]}
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+
+        self.assertListEqual(table.employees, ["e1", "e2"])
+        # j3 only appears on an employee's list, so it is interned after the other jobs
+        self.assertListEqual(table.jobs, ["j1", "j2", "j3"])
+        self.assertListEqual(list(table.employee_preferences(1)), [1, 2])
+        self.assertListEqual(list(table.job_preferences(2)), [])
+
+        self.assertEqual(table.job_ranks[0][1], 1)
+        self.assertEqual(table.job_ranks[1][0], UNRANKED)
+        self.assertEqual(table.employee_ranks[0][1], 0)
+        self.assertTrue(table.prefers(0, 0, 1))
+        self.assertFalse(table.prefers(1, 1, 0))
+
+    def test_round_trip(self) -> None:
+        """Check that decoding a compiled table gives back the original dictionaries."""
+        employee_preferences, job_preferences = data_generator.generate_preference_data(
+            20, 30, 5
+        )
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        self.assertEqual(table.to_dicts(), (employee_preferences, job_preferences))
+
+    @parameterized.expand(
+        [
+            data_generator.generate_preference_data(100, 100, 10),
+            data_generator.generate_preference_data(100, 1000, 5),
+            data_generator.generate_preference_data(1000, 100, 50),
+        ]
+    )
+    def test_algorithms_accept_compiled_table(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that da, ttc and find_blocking_pairs give the same results for dicts and a compiled table."""
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        for algorithm in (da, ttc):
+            two_sided_match, one_sided_match = algorithm(table)
+            self.assertEqual(
+                (two_sided_match, one_sided_match),
+                algorithm(employee_preferences, job_preferences),
+            )
+            self.assertEqual(
+                find_blocking_pairs(one_sided_match, two_sided_match, table),
+                find_blocking_pairs(
+                    one_sided_match,
+                    two_sided_match,
+                    employee_preferences,
+                    job_preferences,
+                ),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# standard imports
+import tempfile
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+
+# custom imports
+import data_generator
+from algos.da_utils import find_all_blocking_pairs
+from algos.deferred_acceptance import da
+from algos.match_result import MatchResult
+from algos.preference_table import PreferenceTable
+from algos.result_cache import ResultCache
+from algos.top_trading_cycle import ttc
+
+
+PREFERENCE_DATA = [
+    data_generator.generate_preference_data(20, 30, 5, seed=1),
+    data_generator.generate_preference_data(30, 20, 5, 10, seed=2),
+    data_generator.generate_preference_data(25, 25, 10, correlation=0.5, seed=3),
+]
+
+
+class TestResultCache(TestCase):
+    """Test the content addressed result cache."""
+
+    @parameterized.expand([("da", da), ("ttc", ttc)])
+    def test_hits_return_the_same_match(self, algorithm, match) -> None:
+        """Check that a profile resubmitted as dictionaries or as a table hits, with the match of a cold run."""
+        cache = ResultCache()
+        for preference_data in PREFERENCE_DATA:
+            self.assertEqual(cache.match(algorithm, *preference_data), match(*preference_data))
+        table = PreferenceTable.from_dicts(*PREFERENCE_DATA[0])
+        self.assertEqual(cache.match(algorithm, table), match(*PREFERENCE_DATA[0]))
+        self.assertEqual(cache.match(algorithm, *PREFERENCE_DATA[1]), match(*PREFERENCE_DATA[1]))
+        self.assertDictEqual(cache.stats, {"hit": 2, "disk_hit": 0, "miss": 3, "eviction": 0})
+
+        # a different engine is a different result, changing a returned match doesn't change the cache
+        _, one_sided_match = cache.match(algorithm, table, engine="fast")
+        one_sided_match.clear()
+        self.assertEqual(cache.match(algorithm, table, engine="fast"), match(*PREFERENCE_DATA[0]))
+        self.assertEqual(cache.stats["miss"], 4)
+
+    def test_hits_share_the_arrays(self) -> None:
+        """Check that a hit is a MatchResult on the caller's table, sharing the cached arrays (no copy)."""
+        cache = ResultCache()
+        table = PreferenceTable.from_dicts(*PREFERENCE_DATA[0])
+        first = cache.match("da", table)
+        other_table = PreferenceTable.from_dicts(*PREFERENCE_DATA[0])
+        second = cache.match("da", other_table)
+        self.assertIsInstance(second, MatchResult)
+        self.assertIs(second.table, other_table)
+        self.assertIs(second.employee_match, first.employee_match)
+        self.assertIs(second.job_match, first.job_match)
+        self.assertEqual(second, da(*PREFERENCE_DATA[0]))
+
+    def test_same_profile_same_digest(self) -> None:
+        """Check that tables compiled from the same profile hash alike however their arrays are stored."""
+        table = data_generator.generate_preference_table(20, 30, 5, seed=4)
+        self.assertEqual(table.digest(), PreferenceTable.from_dicts(*table.to_dicts()).digest())
+        employee_preferences, job_preferences = table.to_dicts()
+        job_preferences["j1"] = job_preferences["j1"][::-1]
+        self.assertNotEqual(
+            table.digest(), PreferenceTable.from_dicts(employee_preferences, job_preferences).digest()
+        )
+
+    def test_participant_order_is_part_of_the_key(self) -> None:
+        """Check that the same market with its keys in another order misses, and gets its own match."""
+        employee_preferences = {"e1": ["j1"], "e2": ["j1"]}
+        reordered = {"e2": ["j1"], "e1": ["j1"]}
+        # j1 leaves e1 unranked, so it keeps whichever of e1 and e2 proposes first
+        job_preferences = {"j1": ["e2"]}
+        cache = ResultCache()
+        self.assertEqual(cache.match("da", employee_preferences, job_preferences)[1], {"e1": "j1", "e2": "e2"})
+        self.assertEqual(cache.match("da", reordered, job_preferences)[1], {"e2": "j1", "e1": "e1"})
+        self.assertEqual(cache.stats["miss"], 2)
+        self.assertNotEqual(
+            PreferenceTable.from_dicts(employee_preferences, job_preferences).digest(),
+            PreferenceTable.from_dicts(reordered, job_preferences).digest(),
+        )
+
+    def test_eviction_and_disk_tier(self) -> None:
+        """Check that least recently used results are evicted, read back from disk, and audited once."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(max_entries=2, directory=directory)
+            for preference_data in PREFERENCE_DATA:
+                cache.match("da", *preference_data)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.stats["eviction"], 1)
+            cache.match("da", *PREFERENCE_DATA[0])
+            self.assertEqual(cache.stats["disk_hit"], 1)
+
+            # a new cache on the same directory, as after a restart
+            cache = ResultCache(max_entries=2, directory=directory)
+            result, blocking_pairs = cache.match("da", *PREFERENCE_DATA[2], audit=True)
+            self.assertEqual(result, da(*PREFERENCE_DATA[2]))
+            self.assertListEqual(
+                blocking_pairs, find_all_blocking_pairs(result.one_sided_match, *PREFERENCE_DATA[2])
+            )
+            cache.clear()
+            self.assertEqual(cache.match("da", *PREFERENCE_DATA[2], audit=True)[1], blocking_pairs)
+            self.assertDictEqual(cache.stats, {"hit": 0, "disk_hit": 2, "miss": 0, "eviction": 0})
+
+        with self.assertRaises(ValueError):
+            cache.match("boston", *PREFERENCE_DATA[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# standard imports
+import random
+import unittest
+from unittest import TestCase
+from parameterized.parameterized import parameterized
+from typing import List, Dict
+
+# custom imports
+from algos.da_utils import is_stable
+from algos.deferred_acceptance import da
+from algos.stable_lattice import RotationPoset
+
+
+def random_market(seed: int, size: int) -> tuple:
+    """A small market where every job ranks exactly the employees that list it."""
+    rng = random.Random(seed)
+    employees = [f"e{i}" for i in range(1, size + 1)]
+    jobs = [f"j{i}" for i in range(1, size + 1)]
+    employee_preferences = {employee: rng.sample(jobs, rng.randint(size - 2, size)) for employee in employees}
+    job_preferences = {}
+    for job in jobs:
+        applicants = [employee for employee in employees if job in employee_preferences[employee]]
+        job_preferences[job] = rng.sample(applicants, len(applicants))
+    return employee_preferences, job_preferences
+
+
+def all_stable_matchings(
+    employee_preferences: Dict[str, List[str]], job_preferences: Dict[str, List[str]]
+) -> List[Dict[str, str]]:
+    """Every stable matching (one-sided), by brute force."""
+    employees = list(employee_preferences)
+    matchings = []
+
+    def extend(match: Dict[str, str], taken: set) -> None:
+        if len(match) == len(employees):
+            if is_stable(match, employee_preferences, job_preferences):
+                matchings.append(dict(match))
+            return
+        employee = employees[len(match)]
+        for job in [employee, *employee_preferences[employee]]:
+            if job == employee or (job not in taken and employee in job_preferences[job]):
+                match[employee] = job
+                extend(match, taken | {job})
+                del match[employee]
+
+    extend({}, set())
+    return matchings
+
+
+class TestStableLattice(TestCase):
+    """Test the rotation poset against brute force enumeration of stable matchings."""
+
+    # markets with 3 or 4 stable matchings each
+    @parameterized.expand([(48, 4), (88, 4), (10, 5), (32, 5), (4, 6), (11, 6)])
+    def test_same_as_brute_force(self, seed: int, size: int) -> None:
+        """Check every stable matching is generated once, and the optimizers against the best of them."""
+        employee_preferences, job_preferences = random_market(seed, size)
+        poset = RotationPoset(employee_preferences, job_preferences)
+        expected = all_stable_matchings(employee_preferences, job_preferences)
+
+        generated = [one_sided_match for _, one_sided_match in poset.stable_matchings()]
+        self.assertEqual(len(generated), len(expected))
+        for one_sided_match in generated:
+            self.assertIn(one_sided_match, expected)
+        self.assertDictEqual(generated[0], da(employee_preferences, job_preferences)[1])
+        self.assertIn(poset.job_optimal_match()[1], expected)
+
+        def ranks(match: Dict[str, str]) -> List[int]:
+            return [
+                rank
+                for employee, job in match.items()
+                if employee != job
+                for rank in (employee_preferences[employee].index(job), job_preferences[job].index(employee))
+            ]
+
+        self.assertEqual(
+            sum(ranks(poset.egalitarian_match()[1])), min(sum(ranks(match)) for match in expected)
+        )
+        self.assertEqual(
+            max(ranks(poset.minimum_regret_match()[1]), default=0),
+            min(max(ranks(match), default=0) for match in expected),
+        )
+
+    def test_latin_square(self) -> None:
+        """Check the three stable matchings of a cyclic market, and its two rotations."""
+        employee_preferences = {"e1": ["j1", "j2", "j3"], "e2": ["j2", "j3", "j1"], "e3": ["j3", "j1", "j2"]}
+        job_preferences = {"j1": ["e2", "e3", "e1"], "j2": ["e3", "e1", "e2"], "j3": ["e1", "e2", "e3"]}
+        _, one_sided_match = da(employee_preferences, job_preferences)
+        poset = RotationPoset(employee_preferences, job_preferences, one_sided_match)
+
+        self.assertListEqual(
+            poset.rotations,
+            [[("e1", "j1"), ("e2", "j2"), ("e3", "j3")], [("e1", "j2"), ("e2", "j3"), ("e3", "j1")]],
+        )
+        self.assertListEqual(poset.predecessors, [set(), {0}])
+        self.assertDictEqual(poset.job_optimal_match()[1], {"e1": "j3", "e2": "j1", "e3": "j2"})
+        self.assertListEqual(
+            [one_sided_match for _, one_sided_match in poset.stable_matchings()],
+            [
+                {"e1": "j1", "e2": "j2", "e3": "j3"},
+                {"e1": "j2", "e2": "j3", "e3": "j1"},
+                {"e1": "j3", "e2": "j1", "e3": "j2"},
+            ],
+        )
+        # everyone gets their second choice, where the optimal matchings leave one side with its last
+        self.assertDictEqual(poset.minimum_regret_match()[1], {"e1": "j2", "e2": "j3", "e3": "j1"})
+        with self.assertRaises(ValueError):
+            poset.match_after([1])
+
+    def test_unranked_match(self) -> None:
+        """Check that a matching with a pair the job does not rank is rejected."""
+        with self.assertRaises(ValueError):
+            RotationPoset({"e1": ["j1"]}, {"j1": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,9 +6,12 @@ from typing import List, Dict
 from collections import defaultdict
 
 # custom imports
+import data_generator
 from algos.da_utils import find_blocking_pairs
-from algos.top_trading_cycle import ttc, update_graph, find_cycle
+from algos.preference_table import PreferenceTable
+from algos.top_trading_cycle import TTC_ENGINES, iter_ttc, ttc, update_graph, find_cycle
 from graph import Graph
+from pointer_graph import NO_EDGE, PointerGraph
 
 
 class TestTopTradingCycle(TestCase):
@@ -258,6 +261,126 @@ class TestTopTradingCycle(TestCase):
         self.assertEqual(job_queue["e1"], 0)
         self.assertEqual(employee_queue["j1"], 1)
 
+    def test_pointer_graph_methods(self) -> None:
+        """Check that the methods in the PointerGraph class function properly."""
+        # e1 = 0, e2 = 1, j1 = 2, j2 = 3, with the same edges as test_basic_graph_methods
+        G = PointerGraph(4)
+        for s, t in [(0, 2), (2, 1), (1, 3), (3, 1)]:
+            G.add_edge(s, t)
+        self.assertEqual(G.number_of_nodes_in_graph(), 4)
+        self.assertEqual(G.get_next_node(0), 2)
+        self.assertCountEqual(G.pointed_at_by(1), [2, 3])
+        self.assertListEqual(G.pointed_at_by(0), [])
+
+        cycle = find_cycle(G)
+        self.assertListEqual(sorted(cycle), [1, 3])
+
+        # deleting the cycle leaves j1 pointing at the deleted e2, until it is repointed
+        for node in cycle:
+            G.delete_node(node)
+        self.assertEqual(G.number_of_nodes_in_graph(), 2)
+        self.assertEqual(G.get_random_node(), 0)
+        self.assertListEqual(G.pointed_at_by(1), [2])
+        self.assertEqual(G.get_next_node(1), NO_EDGE)
+        G.add_edge(2, 0)
+        self.assertListEqual(G.pointed_at_by(1), [])
+        self.assertListEqual(G.pointed_at_by(0), [2])
+        self.assertListEqual(sorted(find_cycle(G)), [0, 2])
+
+    @parameterized.expand(
+        [
+            data_generator.generate_preference_data(100, 100, 10),
+            data_generator.generate_preference_data(100, 10, 10),
+            data_generator.generate_preference_data(10, 100, 10),
+            data_generator.generate_preference_data(500, 500, 25),
+            [
+                {"e1": ["j1", "j2"], "e2": ["j2", "j1"], "e3": [], "e4": ["j3"]},
+                {"j1": ["e2", "e1"], "j2": ["e3"], "j3": []},
+            ],
+        ]
+    )
+    def test_engines_agree(
+        self,
+        employee_preferences: Dict[str, List[str]],
+        job_preferences: Dict[str, List[str]],
+    ) -> None:
+        """Check that every TTC engine returns exactly the same matching as the reference engine."""
+        table = PreferenceTable.from_dicts(employee_preferences, job_preferences)
+        expected = ttc(table)
+        for engine in TTC_ENGINES:
+            self.assertEqual(ttc(table, engine=engine), expected, engine)
+
+    def test_instrumentation(self) -> None:
+        """Check the cycle counts and lengths, and the cycles passed to an observer."""
+        employee_preferences = {"e1": ["j2", "j1"], "e2": ["j1", "j2"], "e3": ["j3"], "e4": []}
+        job_preferences = {"j1": ["e1", "e2"], "j2": ["e2", "e1"], "j3": ["e3"]}
+        for engine in TTC_ENGINES:
+            cycles = []
+
+            def observer(event: str, data: Dict) -> None:
+                if event == "cycle":
+                    cycles.append(sorted(data["employees"]))
+
+            two_sided_match, one_sided_match, stats = ttc(
+                employee_preferences, job_preferences, engine, instrument=True, observer=observer
+            )
+            self.assertEqual(
+                (two_sided_match, one_sided_match), ttc(employee_preferences, job_preferences)
+            )
+            # e1 and e2 trade their priorities at j1 and j2, e3 takes j3 on their own
+            self.assertEqual(stats.cycles, 2, engine)
+            self.assertListEqual(sorted(stats.cycle_lengths), [1, 2], engine)
+            self.assertListEqual(sorted(cycles), [[0, 1], [2]], engine)
+            self.assertTrue({"compile", "match", "find_cycle", "update_graph"} <= set(stats.timers))
+
+    @parameterized.expand([["reference"], ["fast"]])
+    def test_iter_ttc(self, engine: str) -> None:
+        """Check that the streamed trades add up to ttc(), and that iteration stops early when asked to."""
+        employee_preferences, job_preferences = data_generator.generate_preference_data(
+            200, 250, 20, 100, seed=5
+        )
+        cycles = list(iter_ttc(employee_preferences, job_preferences, engine))
+        trades = [trade for cycle in cycles for trade in cycle]
+        one_sided_match = {employee: employee for employee in employee_preferences}
+        one_sided_match.update(trades)
+        self.assertEqual(len(dict(trades)), len(trades))
+        self.assertEqual(one_sided_match, ttc(employee_preferences, job_preferences, engine)[1])
+
+        # stops after the cycle that reaches max_trades
+        for max_trades in (0, 1, 10):
+            streamed = list(iter_ttc(employee_preferences, job_preferences, engine, max_trades=max_trades))
+            number_of_trades = sum(map(len, streamed))
+            self.assertGreaterEqual(number_of_trades, max_trades)
+            self.assertLess(number_of_trades - len(streamed[-1]) if streamed else -1, max_trades)
+            self.assertEqual(streamed, cycles[: len(streamed)])
+        # a spent time budget still lets the first cycle through
+        self.assertEqual(list(iter_ttc(employee_preferences, job_preferences, engine, time_budget=0)), cycles[:1])
+
+    def test_iter_ttc_first_cycle(self) -> None:
+        """Check that the fast engine yields its first trades after reading a handful of preference list entries."""
+
+        class CountingList(list):
+            reads = 0
+
+            def __getitem__(self, i):
+                CountingList.reads += 1
+                return list.__getitem__(self, i)
+
+        table = data_generator.generate_sparse_preference_table(50000, 50000, 5, seed=1)
+        table = PreferenceTable(
+            table.employees,
+            table.jobs,
+            table.employee_offsets,
+            CountingList(table.employee_targets),
+            table.job_offsets,
+            CountingList(table.job_targets),
+        )
+        trades = iter_ttc(table)
+        self.assertTrue(next(trades))
+        trades.close()
+        # a walk from the first employee to a cycle, not a pass over the 500000 entries of the market
+        self.assertLess(CountingList.reads, 1000)
+
 
 if __name__ == "__main__":
     unittest.main()